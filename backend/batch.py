@@ -0,0 +1,61 @@
+"""Leitura em lote por IDs.
+
+`GET /api/<entidade>?ids=3,1,2` e `POST /api/<entidade>/batch` (corpo
+`{"ids": [...]}`, para listas longas) resolvem todos os IDs em uma única
+consulta `IN`, em vez de uma requisição e uma sessão por ID. A resposta
+segue a ordem pedida (IDs repetidos aparecem uma vez) e lista em
+`not_found` os IDs inexistentes ou inativos.
+"""
+from operator import attrgetter
+from typing import Callable, Iterable, List, Sequence, Tuple, Union
+
+from fastapi import HTTPException
+
+from .config import get_settings
+
+settings = get_settings()
+
+IDS_DESCRIPTION = "IDs separados por vírgula: responde {items, not_found} na ordem pedida"
+
+
+def request_ids(ids: Union[str, Sequence[int]]) -> List[int]:
+    """
+    Normaliza os IDs pedidos (texto `1,2,3` ou lista), sem repetições.
+
+    Raises:
+        HTTPException: 400 para ID inválido, lista vazia ou acima de
+            `BATCH_MAX_IDS`
+    """
+    if isinstance(ids, str):
+        try:
+            ids = [int(item) for item in ids.split(",") if item.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids deve ser uma lista de inteiros separados por vírgula")
+    unique = list(dict.fromkeys(ids))
+    if not unique:
+        raise HTTPException(status_code=400, detail="Informe ao menos um ID")
+    if len(unique) > settings.BATCH_MAX_IDS:
+        raise HTTPException(
+            status_code=400, detail=f"Máximo de {settings.BATCH_MAX_IDS} IDs por requisição"
+        )
+    return unique
+
+
+def in_request_order(
+    ids: Sequence[int], found: Iterable, key: Callable = attrgetter("id")
+) -> Tuple[list, List[int]]:
+    """
+    Ordena os registros encontrados conforme os IDs pedidos.
+
+    Args:
+        ids: IDs pedidos (sem repetições)
+        found: Registros retornados pela consulta, em qualquer ordem
+        key: Extrai o ID de um registro
+
+    Returns:
+        (registros na ordem pedida, IDs não encontrados)
+    """
+    by_id = {key(item): item for item in found}
+    items = [by_id[id] for id in ids if id in by_id]
+    not_found = [id for id in ids if id not in by_id]
+    return items, not_found
@@ -0,0 +1,77 @@
+"""Fixtures dos benchmarks: banco SQLite populado na escala escolhida.
+
+A escala vem de `BENCH_SCALE` (10k, 100k ou 1m agendamentos). O banco é
+gerado uma vez por escala em `backend/benchmarks/.data/` e reaproveitado
+nas execuções seguintes.
+"""
+import os
+from pathlib import Path
+
+import pytest
+from sqlalchemy import func
+from sqlmodel import Session, create_engine, select
+
+from backend.database import ensure_schema
+from backend.models import Appointment
+from backend.security import rate_limiter
+from backend.synthetic_data import generate
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+DATA_DIR = Path(__file__).parent / ".data"
+BENCH_PASSWORD = "benchmark123"
+
+
+def _seed(engine, appointments: int) -> None:
+    """Popula o banco com o gerador sintético (determinístico, semente 42)."""
+    rooms = max(20, appointments // 20_000)
+    generate(
+        engine,
+        rooms=rooms,
+        students=max(rooms * 3, appointments // 500),
+        professors=max(rooms, appointments // 5_000),
+        patients=max(500, appointments // 20),
+        appointments=appointments,
+        seed=42,
+        password=BENCH_PASSWORD,
+    )
+
+
+@pytest.fixture(scope="session")
+def bench_scale() -> str:
+    scale = os.environ.get("BENCH_SCALE", "10k").lower()
+    if scale not in SCALES:
+        pytest.exit(f"BENCH_SCALE deve ser um de {', '.join(SCALES)}")
+    return scale
+
+
+@pytest.fixture(scope="session")
+def bench_engine(bench_scale):
+    """Engine do banco da escala (gerado na primeira execução)."""
+    DATA_DIR.mkdir(exist_ok=True)
+    path = DATA_DIR / f"synthetic_{bench_scale}.db"
+    engine = create_engine(f"sqlite:///{path.as_posix()}", connect_args={"check_same_thread": False})
+    seed = not path.exists() or path.stat().st_size == 0
+    ensure_schema(engine)
+    if seed:
+        _seed(engine, SCALES[bench_scale])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="session")
+def busy_slot(bench_engine) -> Appointment:
+    """Agendamento no meio do período (horário ocupado, usado nos conflitos)."""
+    with Session(bench_engine) as session:
+        total = session.exec(select(func.count()).select_from(Appointment)).one()
+        return session.get(Appointment, total // 2)
+
+
+@pytest.fixture(autouse=True)
+def _bench_group(request, benchmark, bench_scale):
+    benchmark.group = bench_scale
+    benchmark.extra_info["scale"] = bench_scale
+
+
+@pytest.fixture
+def no_rate_limit(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "enabled", False)
@@ -0,0 +1,227 @@
+"""Benchmarks dos caminhos críticos de agendamento.
+
+Uso (da raiz do repositório; ver scripts/run_benchmarks.py):
+    BENCH_SCALE=100k python -m pytest backend/benchmarks
+"""
+from datetime import timedelta
+
+import pytest
+from fastapi import BackgroundTasks
+from sqlalchemy import func, update
+from sqlmodel import Session, select
+
+from backend.routers.appointments import list_appointments
+from backend.enums import AppointmentStatus, ReminderChannel
+from backend.models import Appointment, Patient, WebhookSubscription
+from backend.repository import AppointmentRepository, PatientRepository, ReminderRepository, WebhookRepository
+from backend.routers.auth import login
+from backend.scheduler import StatusScheduler, utcnow
+from backend.schemas import LoginRequest
+from backend.service import AppointmentService, RoomService, StudentService
+from backend.utils import has_conflict
+
+from .conftest import BENCH_PASSWORD
+
+pytest.importorskip("pytest_benchmark")
+
+
+def test_check_conflicts(benchmark, bench_engine, busy_slot):
+    def run():
+        with Session(bench_engine) as session:
+            return AppointmentService.check_conflicts(
+                session, busy_slot.start_dt, busy_slot.end_dt,
+                busy_slot.room_id, busy_slot.student_id, busy_slot.supervisor_id,
+            )
+
+    assert benchmark(run)
+
+
+def test_has_conflict(benchmark, bench_engine, busy_slot):
+    def run():
+        with Session(bench_engine) as session:
+            return has_conflict(
+                session, busy_slot.start_dt, busy_slot.end_dt,
+                room_id=busy_slot.room_id, student_id=busy_slot.student_id,
+                supervisor_id=busy_slot.supervisor_id,
+            )
+
+    assert benchmark(run) is True
+
+
+def test_validate_appointment_creation(benchmark, bench_engine, busy_slot):
+    # Horário livre logo após o expediente: percorre todas as validações
+    start = busy_slot.start_dt.replace(hour=19)
+
+    def run():
+        with Session(bench_engine) as session:
+            return AppointmentService.validate_appointment_creation(
+                session, start, start + timedelta(hours=1), busy_slot.room_id,
+                busy_slot.student_id, busy_slot.supervisor_id, busy_slot.patient_id,
+            )
+
+    valid, error = benchmark(run)
+    assert valid or "limite" in (error or "")
+
+
+def test_get_available_rooms(benchmark, bench_engine, busy_slot):
+    def run():
+        with Session(bench_engine) as session:
+            return RoomService.get_available_rooms(session, busy_slot.start_dt, busy_slot.end_dt)
+
+    benchmark(run)
+
+
+def test_list_appointments(benchmark, bench_engine):
+    def run():
+        with Session(bench_engine) as session:
+            return list_appointments(
+                skip=0, limit=100, student_id=None, room_id=None, fields=None, expand=None, ids=None, session=session
+            )
+
+    assert len(benchmark(run)) == 100
+
+
+def test_list_appointments_sparse(benchmark, bench_engine):
+    # Mesma página com só o que a tela de lista usa (uma consulta)
+    def run():
+        with Session(bench_engine) as session:
+            return list_appointments(
+                skip=0, limit=100, student_id=None, room_id=None,
+                fields="start_dt,end_dt,status,room.name,patient.name,student.name,supervisor.name",
+                expand=None, ids=None, session=session,
+            )
+
+    assert benchmark(run).status_code == 200
+
+
+@pytest.mark.parametrize("filters", ["supervisor", "status", "children"])
+def test_search_appointments(benchmark, bench_engine, busy_slot, filters):
+    # Mês ao redor do horário ocupado, uma página de 50 com as contagens
+    start = busy_slot.start_dt - timedelta(days=15)
+    params = {
+        "supervisor": {"supervisor_id": busy_slot.supervisor_id},
+        "status": {"statuses": [AppointmentStatus.SCHEDULED, AppointmentStatus.CANCELLED]},
+        "children": {"children_only": True},
+    }[filters]
+
+    def run():
+        with Session(bench_engine) as session:
+            return AppointmentRepository.search(
+                session, start=start, end=start + timedelta(days=30), limit=50, **params
+            )
+
+    rows, counts = benchmark(run)
+    assert counts
+
+
+def test_get_load_balance(benchmark, bench_engine, busy_slot):
+    def run():
+        with Session(bench_engine) as session:
+            return StudentService.get_load_balance(session, busy_slot.student_id, days=30)
+
+    assert benchmark(run)["total_appointments"] >= 0
+
+
+def test_login(benchmark, bench_engine, no_rate_limit):
+    credentials = LoginRequest(email="estagiario1.s42@sintetico.unipar.br", password=BENCH_PASSWORD)
+
+    def run():
+        with Session(bench_engine) as session:
+            return login(credentials, BackgroundTasks(), session)
+
+    assert benchmark.pedantic(run, rounds=10, warmup_rounds=1)["access_token"]
+
+
+@pytest.mark.parametrize("mode", ["one-by-one", "batch"])
+def test_get_patients_by_ids(benchmark, bench_engine, mode):
+    # 200 pacientes espalhados pela tabela (ex.: nomes de uma agenda)
+    with Session(bench_engine) as session:
+        total = session.exec(select(func.count()).select_from(Patient)).one()
+    ids = list(range(1, total + 1, total // 200))[:200]
+
+    def run():
+        with Session(bench_engine) as session:
+            if mode == "batch":
+                return PatientRepository.get_many(session, ids)
+            return [PatientRepository.get_by_id(session, id) for id in ids]
+
+    assert len(benchmark(run)) == 200
+
+
+def test_update_patient(benchmark, bench_engine):
+    # Leitura da versão (como o GET do cliente) + compare-and-swap em um
+    # UPDATE ... RETURNING, sem refresh
+    def run():
+        with Session(bench_engine) as session:
+            current = session.get(Patient, 1).version
+            return PatientRepository.update(session, 1, {"notes": "benchmark"}, expected_version=current)
+
+    assert benchmark(run).notes == "benchmark"
+
+
+def test_status_transitions(benchmark, bench_engine, busy_slot):
+    # Execução periódica do agendador: a primeira rodada altera o período em
+    # andamento, as seguintes medem a varredura em regime (nada a alterar).
+    # Tudo em uma transação desfeita ao final, sem alterar o banco da escala.
+    now = busy_slot.start_dt + timedelta(minutes=10)
+    with bench_engine.connect() as conn:
+        conn.begin()
+        scheduler = StatusScheduler(conn, interval_seconds=60, batch_size=500, lookback_hours=168)
+        result = benchmark(scheduler.run_once, now)
+        conn.rollback()
+
+    assert result == {"in_progress": 0, "completed": 0}
+
+
+def test_claim_due_reminders(benchmark, bench_engine):
+    # Fila com um lembrete por agendamento futuro (SMS: os pacientes sintéticos
+    # só têm telefone), todos vencidos; cada rodada reserva o próximo lote.
+    # Tudo em uma transação desfeita ao final.
+    with bench_engine.connect() as conn:
+        conn.begin()
+        with Session(conn) as session:
+            first, last = session.exec(select(func.min(Appointment.start_dt), func.max(Appointment.start_dt))).one()
+            queued = ReminderRepository.backfill(
+                session, first - timedelta(days=1), timedelta(hours=24), [ReminderChannel.SMS]
+            )
+            claimed = benchmark.pedantic(
+                ReminderRepository.claim_due, args=(session, last, 200, timedelta(minutes=5)), rounds=20
+            )
+        conn.rollback()
+
+    assert queued > 5000 and len(claimed) == 200
+
+
+def test_claim_due_webhooks(benchmark, bench_engine):
+    # Uma assinatura de todos os eventos e os agendamentos futuros cancelados
+    # em um UPDATE (os gatilhos enfileiram uma entrega por agendamento); cada
+    # rodada reserva o próximo lote. Tudo em uma transação desfeita ao final.
+    with bench_engine.connect() as conn:
+        conn.begin()
+        with Session(conn) as session:
+            session.add(WebhookSubscription(url="http://127.0.0.1:9/hooks", secret="benchmark"))
+            session.flush()
+            session.execute(
+                update(Appointment)
+                .where(Appointment.status == AppointmentStatus.SCHEDULED)
+                .values(status=AppointmentStatus.CANCELLED)
+            )
+            queued = WebhookRepository.count_queued(session)["pending"]
+            # Os gatilhos marcam `next_attempt_at` com o relógio do SQLite,
+            # não com a data de referência dos dados sintéticos
+            now = utcnow() + timedelta(minutes=1)
+            claimed = benchmark.pedantic(
+                WebhookRepository.claim_due, args=(session, now, 100, timedelta(minutes=5)), rounds=20,
+            )
+        conn.rollback()
+
+    assert queued > 5000 and len(claimed) == 100
+
+
+@pytest.mark.parametrize("query", ["silva", "ana", "(44) 9"])
+def test_search_patients(benchmark, bench_engine, query):
+    def run():
+        with Session(bench_engine) as session:
+            return PatientRepository.search(session, query)
+
+    assert benchmark(run)
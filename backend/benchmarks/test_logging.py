@@ -0,0 +1,67 @@
+"""Benchmark do custo de logging no caminho da requisição.
+
+Mede os registros que uma requisição rejeitada emite (o WARNING do handler
+de exceção e a linha de acesso com `duration_ms`) com o handler síncrono e
+com a fila + thread de escrita, em dois destinos: arquivo local e um destino
+lento (0,5ms por escrita, como um pipe de contêiner ou terminal sob pressão).
+Com destino lento, o handler síncrono soma a espera de cada escrita à
+latência da requisição; com a fila, o custo fica no enfileiramento.
+"""
+import io
+import logging
+import queue
+import time
+
+import pytest
+
+from backend.logger import BoundedQueueHandler, DrainingQueueListener, JsonFormatter, logger
+
+pytest.importorskip("pytest_benchmark")
+
+
+SLOW_WRITE_SECONDS = 0.0005
+# Intervalo entre requisições (fora da medição): o destino lento precisa de
+# ~2ms por requisição, então a fila não acumula indefinidamente
+REQUEST_INTERVAL_SECONDS = 0.003
+
+
+class SlowStream(io.StringIO):
+    def write(self, text: str) -> int:
+        time.sleep(SLOW_WRITE_SECONDS)
+        return super().write(text)
+
+
+@pytest.fixture(params=["file-sync", "file-queued", "slow-sync", "slow-queued"])
+def log_handler(request, tmp_path, monkeypatch):
+    sink, mode = request.param.split("-")
+    if sink == "file":
+        output = logging.FileHandler(tmp_path / "app.log", encoding="utf-8")
+    else:
+        output = logging.StreamHandler(SlowStream())
+    output.setFormatter(JsonFormatter())
+    listener = None
+    if mode == "sync":
+        handler = output
+    else:
+        handler = BoundedQueueHandler(queue.Queue(maxsize=10000), block_seconds=0.05)
+        listener = DrainingQueueListener(handler.queue, output)
+        listener.start()
+    monkeypatch.setattr(logger, "handlers", [handler])
+    monkeypatch.setattr(logger, "propagate", False)
+    monkeypatch.setattr(logger, "level", logging.INFO)
+    yield request.param
+    if listener is not None:
+        listener.stop()
+    output.close()
+
+
+def test_request_log_records(benchmark, log_handler):
+    benchmark.extra_info["handler"] = log_handler
+
+    def run():
+        logger.warning("HTTPException: %s - %s [%s %s]", 400, "Conflito de horário detectado: Sala ocupada",
+                       "POST", "/api/appointments")
+        logger.info("%s %s %s %.2fms", "POST", "/api/appointments", 400, 4.2,
+                    extra={"method": "POST", "path": "/api/appointments", "status": 400, "duration_ms": 4.2})
+
+    benchmark.pedantic(run, setup=lambda: time.sleep(REQUEST_INTERVAL_SECONDS), rounds=200)
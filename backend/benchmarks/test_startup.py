@@ -0,0 +1,40 @@
+"""Benchmark de inicialização a frio (novo processo até a aplicação pronta).
+
+Mede importação dos módulos e `lifespan` sobre o banco da escala, como um
+worker reiniciado. Não deve crescer com o tamanho do banco.
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+ROOT = Path(__file__).resolve().parents[2]
+
+STARTUP = (
+    "import asyncio\n"
+    "from backend.main import app\n"
+    "async def main():\n"
+    "    async with app.router.lifespan_context(app):\n"
+    "        pass\n"
+    "asyncio.run(main())\n"
+)
+
+
+def test_cold_start(benchmark, bench_engine):
+    # O agendador de status e o despacho de webhooks rodam em segundo plano
+    # (ver test_status_transitions) e alterariam o banco compartilhado pelos
+    # benchmarks
+    env = dict(
+        os.environ, AGENDA_DB_FILE=bench_engine.url.database, LOG_LEVEL="WARNING",
+        SCHEDULER_ENABLED="false", WEBHOOKS_ENABLED="false",
+    )
+    env.pop("AGENDA_USE_IN_MEMORY_DB", None)
+
+    def run():
+        return subprocess.run([sys.executable, "-c", STARTUP], cwd=ROOT, env=env).returncode
+
+    assert benchmark.pedantic(run, rounds=5, warmup_rounds=1) == 0
@@ -0,0 +1,241 @@
+"""Importação em massa de usuários e pacientes a partir de CSV.
+
+O arquivo é lido linha a linha e processado em lotes:
+
+1. cada linha é validada com os mesmos schemas da API (`UserCreate`,
+   `PatientCreate`);
+2. para usuários, a unicidade dos emails do lote é verificada com uma única
+   consulta `IN` (além dos emails repetidos dentro do próprio arquivo);
+3. as senhas do lote são criptografadas em `security.import_hasher`, um
+   pool limitado só das importações (`BULK_IMPORT_HASH_WORKERS`), para não
+   disputar a fila dos logins;
+4. os registros válidos são inseridos com um único `executemany` por lote.
+
+O resultado é um relatório com o total de linhas, quantas foram criadas e o
+erro de cada linha rejeitada. Cada lote é confirmado ao ser inserido: se o
+pool continuar cheio, a importação para e o relatório lista como erro cada
+linha não importada, para que só elas sejam reenviadas.
+
+Uso pela linha de comando:
+    python -m backend.bulk_import users estagiarios.csv
+    python -m backend.bulk_import patients pacientes.csv
+"""
+import csv
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from .config import get_settings
+from .logger import logger
+from .models import Patient, User
+from .schemas import PatientCreate, UserCreate
+from .password_hasher import HashingBusyError
+from .security import import_hasher
+
+settings = get_settings()
+
+USER_COLUMNS = ("name", "email", "password", "role")
+PATIENT_COLUMNS = ("name", "email", "phone", "birthdate", "notes", "is_child")
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[List]:
+    """Agrupa um iterável em listas de até `size` itens."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _clean_row(row: Dict[str, Optional[str]], columns: Tuple[str, ...]) -> Dict[str, str]:
+    """Mantém apenas as colunas conhecidas e remove valores vazios."""
+    cleaned = {}
+    for column in columns:
+        value = row.get(column)
+        if value is not None and value.strip() != "":
+            cleaned[column] = value.strip()
+    return cleaned
+
+
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+def _read_csv(lines: Iterable[str]) -> Iterator[Tuple[int, Dict[str, Optional[str]]]]:
+    """Lê o CSV em streaming, retornando (número da linha, linha)."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _interrupt(report: dict, pending: List[Tuple[int, str]], chunks: Iterator[List]) -> None:
+    """Registra como não importadas as linhas do lote atual e as restantes do arquivo."""
+    message = "Não importada: servidor ocupado processando senhas, reenvie esta linha"
+    logger.warning("Importação de usuários interrompida: pool de senhas cheio")
+    for line, email in pending:
+        report["errors"].append({"line": line, "email": email, "message": message})
+    for chunk in chunks:
+        for line, row in chunk:
+            report["total"] += 1
+            report["errors"].append({"line": line, "email": row.get("email"), "message": message})
+
+
+def import_users(
+    session: Session,
+    lines: Iterable[str],
+    chunk_size: Optional[int] = None,
+) -> dict:
+    """
+    Importa usuários de um CSV com colunas name,email,password[,role].
+
+    Args:
+        session: Sessão do banco de dados
+        lines: Linhas do arquivo CSV (incluindo cabeçalho)
+        chunk_size: Linhas por lote (padrão: BULK_IMPORT_CHUNK_SIZE)
+
+    Returns:
+        Relatório com total, criados e erros por linha (inclusive as não
+        importadas se o pool de senhas continuar cheio)
+    """
+    chunk_size = chunk_size or settings.BULK_IMPORT_CHUNK_SIZE
+    report = {"total": 0, "created": 0, "errors": []}
+    seen_emails = set()
+    chunks = _chunks(_read_csv(lines), chunk_size)
+
+    for chunk in chunks:
+        valid: List[Tuple[int, UserCreate]] = []
+        for line, row in chunk:
+            report["total"] += 1
+            try:
+                data = UserCreate(**_clean_row(row, USER_COLUMNS))
+            except ValidationError as exc:
+                report["errors"].append({"line": line, "email": row.get("email"), "message": _format_validation_error(exc)})
+                continue
+            email = data.email.lower()
+            if email in seen_emails:
+                report["errors"].append({"line": line, "email": email, "message": "Email repetido no arquivo"})
+                continue
+            seen_emails.add(email)
+            valid.append((line, data))
+
+        if not valid:
+            continue
+
+        # Uma única consulta para todos os emails do lote
+        emails = [data.email.lower() for _, data in valid]
+        existing = set(session.exec(select(User.email).where(User.email.in_(emails))).all())
+        to_create = []
+        for line, data in valid:
+            if data.email.lower() in existing:
+                report["errors"].append({"line": line, "email": data.email.lower(), "message": "Email já cadastrado"})
+            else:
+                to_create.append((line, data))
+
+        if not to_create:
+            continue
+
+        try:
+            hashes = import_hasher.hash_many([data.password for _, data in to_create])
+        except HashingBusyError:
+            _interrupt(report, [(line, data.email.lower()) for line, data in to_create], chunks)
+            break
+        now = datetime.now(timezone.utc)
+        values = [
+            {
+                "name": data.name.strip(),
+                "email": data.email.lower(),
+                "hashed_password": hashed,
+                "role": data.role,
+                "is_active": True,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for (_, data), hashed in zip(to_create, hashes)
+        ]
+        try:
+            session.execute(insert(User), values)
+            session.commit()
+            report["created"] += len(values)
+        except IntegrityError as exc:
+            session.rollback()
+            logger.warning("Lote de usuários rejeitado na importação: %s", exc.orig)
+            for line, data in to_create:
+                report["errors"].append({"line": line, "email": data.email.lower(), "message": "Email já cadastrado"})
+
+    logger.info("Importação de usuários: %d/%d criados", report["created"], report["total"])
+    return report
+
+
+def import_patients(
+    session: Session,
+    lines: Iterable[str],
+    chunk_size: Optional[int] = None,
+) -> dict:
+    """
+    Importa pacientes de um CSV com colunas name[,email,phone,birthdate,notes,is_child].
+
+    Args:
+        session: Sessão do banco de dados
+        lines: Linhas do arquivo CSV (incluindo cabeçalho)
+        chunk_size: Linhas por lote (padrão: BULK_IMPORT_CHUNK_SIZE)
+
+    Returns:
+        Relatório com total, criados e erros por linha
+    """
+    chunk_size = chunk_size or settings.BULK_IMPORT_CHUNK_SIZE
+    report = {"total": 0, "created": 0, "errors": []}
+
+    for chunk in _chunks(_read_csv(lines), chunk_size):
+        now = datetime.now(timezone.utc)
+        values = []
+        for line, row in chunk:
+            report["total"] += 1
+            try:
+                data = PatientCreate(**_clean_row(row, PATIENT_COLUMNS))
+            except ValidationError as exc:
+                report["errors"].append({"line": line, "email": row.get("email"), "message": _format_validation_error(exc)})
+                continue
+            values.append({**data.model_dump(), "name": data.name.strip(), "active": True, "created_at": now, "updated_at": now})
+
+        if values:
+            session.execute(insert(Patient), values)
+            session.commit()
+            report["created"] += len(values)
+
+    logger.info("Importação de pacientes: %d/%d criados", report["created"], report["total"])
+    return report
+
+
+IMPORTERS = {
+    "users": import_users,
+    "patients": import_patients,
+}
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from .database import create_db_and_tables, get_session_context
+
+    parser = argparse.ArgumentParser(description="Importa usuários ou pacientes de um arquivo CSV.")
+    parser.add_argument("entity", choices=sorted(IMPORTERS))
+    parser.add_argument("file", help="Arquivo CSV (UTF-8, com cabeçalho)")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    create_db_and_tables()
+    with open(args.file, encoding="utf-8-sig", newline="") as csv_file:
+        with get_session_context() as session:
+            result = IMPORTERS[args.entity](session, csv_file, chunk_size=args.chunk_size)
+    import_hasher.shutdown()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
@@ -0,0 +1,90 @@
+"""Compressão de respostas HTTP (brotli quando disponível, gzip caso contrário).
+
+O pacote `brotli` é opcional: se não estiver instalado, apenas gzip é
+negociado com o cliente.
+"""
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependência opcional
+    brotli = None
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    """
+    Verifica se o cabeçalho Accept-Encoding aceita a codificação informada.
+
+    Args:
+        accept_encoding: Valor do cabeçalho Accept-Encoding
+        encoding: Codificação desejada (ex: "br", "gzip")
+
+    Returns:
+        True se a codificação é aceita (q > 0)
+    """
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip() != encoding:
+            continue
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+class BrotliResponder(IdentityResponder):
+    """Responder que comprime o corpo da resposta com brotli."""
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 4) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        data = self.compressor.process(body)
+        if more_body:
+            return data + self.compressor.flush()
+        return data + self.compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI que comprime respostas acima de um tamanho mínimo.
+
+    Respostas que já possuem Content-Encoding (ex: arquivos estáticos
+    pré-comprimidos) são repassadas sem alteração.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        if brotli is not None and accepts_encoding(accept_encoding, "br"):
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality)
+        elif accepts_encoding(accept_encoding, "gzip"):
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            await self.app(scope, receive, send)
+            return
+
+        await responder(scope, receive, send)
@@ -1,5 +1,6 @@
 """Configurações centralizadas da aplicação."""
 from functools import lru_cache
+from typing import List
 from pydantic import Field, field_validator, ConfigDict
 from pydantic_settings import BaseSettings
 
@@ -27,6 +28,258 @@ class Settings(BaseSettings):
         ge=1,
         description="Tempo de expiração do token em minutos"
     )
+    REFRESH_TOKEN_EXPIRE_DAYS: int = Field(
+        default=7,
+        ge=1,
+        description="Tempo de expiração do refresh token em dias"
+    )
+    REVOCATION_LIST_CAPACITY: int = Field(
+        default=100000,
+        ge=100,
+        description="Revogações de token suportadas por faixa de expiração (define a memória fixa)"
+    )
+    REVOCATION_LIST_ERROR_RATE: float = Field(
+        default=0.0001,
+        gt=0,
+        lt=1,
+        description="Taxa de falso positivo aceita na lista de revogação"
+    )
+    REVOCATION_STORE_URL: str = Field(
+        default="memory",
+        description="Lista de revogação: memory (por processo) ou sqlite:///caminho.db (compartilhada entre workers)"
+    )
+    
+    # Limitação de taxa (token bucket) em autenticação e criação de usuários
+    RATE_LIMIT_ENABLED: bool = Field(
+        default=True,
+        description="Habilita a limitação de taxa"
+    )
+    RATE_LIMIT_STORE_URL: str = Field(
+        default="memory",
+        description="Armazenamento dos baldes: 'memory' (por processo) ou 'sqlite:///arquivo.db' (compartilhado)"
+    )
+    RATE_LIMIT_MAX_KEYS: int = Field(
+        default=100000,
+        ge=100,
+        description="Máximo de baldes mantidos em memória"
+    )
+    RATE_LIMIT_IP_PER_MINUTE: float = Field(
+        default=30,
+        gt=0,
+        description="Requisições por minuto por IP em login, registro, refresh, criação e importação de usuários e pacientes"
+    )
+    RATE_LIMIT_IP_BURST: int = Field(
+        default=10,
+        ge=1,
+        description="Rajada máxima por IP"
+    )
+    RATE_LIMIT_ACCOUNT_PER_MINUTE: float = Field(
+        default=5,
+        gt=0,
+        description="Tentativas de login por minuto por conta"
+    )
+    RATE_LIMIT_ACCOUNT_BURST: int = Field(
+        default=5,
+        ge=1,
+        description="Rajada máxima de tentativas de login por conta"
+    )
+
+    # Idempotência das rotas de criação (cabeçalho Idempotency-Key)
+    IDEMPOTENCY_ENABLED: bool = Field(
+        default=True,
+        description="Honra o cabeçalho Idempotency-Key nas rotas de criação"
+    )
+    IDEMPOTENCY_STORE_URL: str = Field(
+        default="memory",
+        description="Armazenamento das respostas: 'memory' (por processo) ou 'sqlite:///arquivo.db' (compartilhado)"
+    )
+    IDEMPOTENCY_TTL_SECONDS: int = Field(
+        default=86400,
+        ge=60,
+        description="Tempo em que uma chave repete a resposta original"
+    )
+    IDEMPOTENCY_MAX_KEYS: int = Field(
+        default=50000,
+        ge=100,
+        description="Máximo de respostas mantidas em memória"
+    )
+
+    # Transições automáticas de status dos agendamentos
+    SCHEDULER_ENABLED: bool = Field(
+        default=True,
+        description="Executa em segundo plano as transições de status por horário"
+    )
+    SCHEDULER_INTERVAL_SECONDS: float = Field(
+        default=60,
+        ge=1,
+        description="Intervalo entre execuções (a concessão entre workers dura 3 intervalos)"
+    )
+    SCHEDULER_BATCH_SIZE: int = Field(
+        default=500,
+        ge=1,
+        description="Agendamentos alterados por UPDATE"
+    )
+    SCHEDULER_LOOKBACK_HOURS: float = Field(
+        default=168,
+        gt=0,
+        description="Só considera agendamentos iniciados nesta janela (limita a varredura)"
+    )
+
+    # Lembretes de consulta (fila persistente, enviada em lotes)
+    REMINDERS_ENABLED: bool = Field(
+        default=False,
+        description="Agenda e envia lembretes de consulta aos pacientes"
+    )
+    REMINDER_LEAD_HOURS: float = Field(
+        default=24,
+        gt=0,
+        description="Antecedência do lembrete em relação ao início do agendamento"
+    )
+    REMINDER_INTERVAL_SECONDS: float = Field(
+        default=30,
+        ge=1,
+        description="Intervalo entre verificações da fila de lembretes"
+    )
+    REMINDER_BATCH_SIZE: int = Field(
+        default=200,
+        ge=1,
+        description="Lembretes reservados por lote"
+    )
+    REMINDER_WORKERS: int = Field(
+        default=4,
+        ge=1,
+        description="Threads de envio (cada uma usa uma conexão SMTP por lote)"
+    )
+    REMINDER_MAX_ATTEMPTS: int = Field(
+        default=5,
+        ge=1,
+        description="Tentativas de envio antes de marcar o lembrete como falho"
+    )
+    REMINDER_RETRY_BASE_SECONDS: float = Field(
+        default=60,
+        gt=0,
+        description="Espera antes da 2ª tentativa; dobra a cada falha (máximo 1h)"
+    )
+    REMINDER_EMAIL_FROM: str = Field(
+        default="clinica@unipar.br",
+        description="Remetente dos lembretes por email"
+    )
+    REMINDER_SMS_GATEWAY_URL: str = Field(
+        default="",
+        description="URL do gateway de SMS (POST JSON {to, message}); vazio desativa SMS"
+    )
+    SMTP_HOST: str = Field(
+        default="localhost",
+        description="Servidor SMTP dos lembretes"
+    )
+    SMTP_PORT: int = Field(
+        default=25,
+        ge=1,
+        le=65535,
+        description="Porta do servidor SMTP"
+    )
+    SMTP_USERNAME: str = Field(
+        default="",
+        description="Usuário SMTP (vazio = sem autenticação)"
+    )
+    SMTP_PASSWORD: str = Field(
+        default="",
+        description="Senha SMTP"
+    )
+    SMTP_STARTTLS: bool = Field(
+        default=False,
+        description="Usa STARTTLS na conexão SMTP"
+    )
+
+    # Webhooks (eventos de agendamento para sistemas externos)
+    WEBHOOKS_ENABLED: bool = Field(
+        default=True,
+        description="Despacha a fila de webhooks em segundo plano (os eventos são gravados mesmo desativado)"
+    )
+    WEBHOOK_INTERVAL_SECONDS: float = Field(
+        default=2,
+        gt=0,
+        description="Intervalo entre verificações da fila de webhooks"
+    )
+    WEBHOOK_BATCH_SIZE: int = Field(
+        default=100,
+        ge=1,
+        description="Entregas reservadas por lote"
+    )
+    WEBHOOK_CONCURRENCY: int = Field(
+        default=10,
+        ge=1,
+        description="Requisições de entrega simultâneas"
+    )
+    WEBHOOK_TIMEOUT_SECONDS: float = Field(
+        default=10,
+        gt=0,
+        description="Tempo máximo de cada entrega"
+    )
+    WEBHOOK_MAX_ATTEMPTS: int = Field(
+        default=8,
+        ge=1,
+        description="Tentativas antes de mover a entrega para a fila de mortas (dead)"
+    )
+    WEBHOOK_RETRY_BASE_SECONDS: float = Field(
+        default=30,
+        gt=0,
+        description="Espera antes da 2ª tentativa; dobra a cada falha (máximo 1h)"
+    )
+    WEBHOOK_RETENTION_DAYS: float = Field(
+        default=30,
+        gt=0,
+        description="Entregas concluídas são apagadas após este prazo (as descartadas são mantidas)"
+    )
+
+    # Observabilidade
+    METRICS_ENABLED: bool = Field(
+        default=True,
+        description="Expõe métricas Prometheus em /metrics"
+    )
+    SLOW_QUERY_MS: float = Field(
+        default=100,
+        ge=0,
+        description="Registra comandos SQL acima deste tempo em ms (0 desativa)"
+    )
+    SLOW_QUERY_EXPLAIN: bool = Field(
+        default=True,
+        description="Inclui EXPLAIN QUERY PLAN no log de consultas lentas"
+    )
+    SLOW_QUERY_LOG_PARAMS: bool = Field(
+        default=False,
+        description="Registra os valores dos parâmetros no log de consultas lentas (dados pessoais; só para depuração)"
+    )
+    QUERY_BUDGET: int = Field(
+        default=20,
+        ge=0,
+        description="Máximo de comandos SQL por requisição antes de sinalizar (0 desativa)"
+    )
+    PROFILING_ENABLED: bool = Field(
+        default=False,
+        description="Permite profiling de requisições por administradores (X-Profile)"
+    )
+    PROFILING_SAMPLE_RATE: float = Field(
+        default=0.0,
+        ge=0,
+        le=1,
+        description="Fração das requisições perfiladas automaticamente"
+    )
+    PROFILING_SLOWEST_PER_ROUTE: int = Field(
+        default=5,
+        ge=1,
+        description="Profiles amostrados mantidos por rota (os mais lentos)"
+    )
+    PROFILING_MAX_ON_DEMAND: int = Field(
+        default=20,
+        ge=1,
+        description="Profiles sob demanda mantidos em memória"
+    )
+    PROFILING_SAMPLE_INTERVAL_MS: float = Field(
+        default=2.0,
+        gt=0,
+        description="Intervalo de amostragem do modo sample em ms"
+    )
     
     # Aplicação
     DEBUG: bool = Field(
@@ -37,7 +290,113 @@ class Settings(BaseSettings):
         default="INFO",
         description="Nível de logging (DEBUG, INFO, WARNING, ERROR)"
     )
+    LOG_FORMAT: str = Field(
+        default="json",
+        description="Formato dos logs: json (uma linha por registro) ou text"
+    )
+    LOG_QUEUE_SIZE: int = Field(
+        default=10000,
+        ge=1,
+        description="Capacidade da fila de logs escrita pela thread de logging"
+    )
+    LOG_QUEUE_BLOCK_MS: float = Field(
+        default=50.0,
+        ge=0,
+        description="Espera máxima (ms) por espaço na fila para WARNING ou acima; abaixo disso, descarta"
+    )
+    LOG_REQUESTS: bool = Field(
+        default=True,
+        description="Registrar uma linha por requisição com status e duration_ms"
+    )
+    SEED_ON_STARTUP: bool = Field(
+        default=False,
+        description="Popular dados de demonstração na inicialização (senão: python -m backend.seed_data)"
+    )
     
+    PRINCIPAL_CACHE_TTL_SECONDS: int = Field(
+        default=60,
+        ge=0,
+        description="Tempo máximo (segundos) que um usuário autenticado fica em cache por token (0 desativa)"
+    )
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = Field(
+        default=10000,
+        ge=1,
+        description="Número máximo de tokens no cache de usuários autenticados"
+    )
+    PASSWORD_HASH_ROUNDS: int = Field(
+        default=29000,
+        ge=1000,
+        description="Fator de trabalho (iterações) do pbkdf2_sha256; hashes abaixo dele são atualizados no login"
+    )
+    PASSWORD_HASH_WORKERS: int = Field(
+        default=2,
+        ge=0,
+        description="Processos dedicados à criptografia de senhas (0 = na própria thread)"
+    )
+    PASSWORD_HASH_MAX_PENDING: int = Field(
+        default=16,
+        ge=1,
+        description="Máximo de operações de senha em andamento/fila antes de responder 503"
+    )
+
+    PASSWORD_HASH_NICENESS: int = Field(
+        default=10,
+        ge=0,
+        le=19,
+        description="Redução de prioridade (nice) dos processos de criptografia de senhas"
+    )
+
+    # CORS
+    ALLOWED_ORIGINS: str = Field(
+        default="http://localhost:3000,http://127.0.0.1:3000,http://localhost:8000,http://127.0.0.1:8000",
+        description="Origens permitidas para CORS, separadas por vírgula"
+    )
+    CORS_MAX_AGE: int = Field(
+        default=600,
+        ge=0,
+        description="Tempo (segundos) que o navegador mantém o preflight CORS em cache"
+    )
+
+    # Desempenho / frontend
+    COMPRESSION_MIN_SIZE: int = Field(
+        default=1024,
+        ge=0,
+        description="Tamanho mínimo (bytes) para comprimir respostas com gzip/brotli"
+    )
+    SERVE_FRONTEND: bool = Field(
+        default=True,
+        description="Servir o frontend estático pelo próprio backend"
+    )
+    FRONTEND_PATH: str = Field(
+        default="/app",
+        description="Prefixo de URL onde o frontend é servido pelo backend"
+    )
+
+    # Leitura em lote
+    BATCH_MAX_IDS: int = Field(
+        default=500,
+        ge=1,
+        le=10000,
+        description="Máximo de IDs por leitura em lote (?ids=1,2,3 ou POST /batch)"
+    )
+
+    # Importação em massa
+    BULK_IMPORT_CHUNK_SIZE: int = Field(
+        default=500,
+        ge=1,
+        description="Linhas do CSV processadas e inseridas por lote na importação em massa"
+    )
+    BULK_IMPORT_HASH_WORKERS: int = Field(
+        default=2,
+        ge=0,
+        description="Processos do pool de senhas da importação em massa, separado do pool dos logins (0 = na própria thread)"
+    )
+    BULK_IMPORT_MAX_CONCURRENT: int = Field(
+        default=2,
+        ge=1,
+        description="Importações de usuários hashing senhas ao mesmo tempo; as demais esperam por vaga"
+    )
+
     # Regras de negócio
     MAX_STUDENT_HOURS_PER_DAY: int = Field(
         default=4,
@@ -66,6 +425,13 @@ class Settings(BaseSettings):
             raise ValueError(f"LOG_LEVEL deve ser um de {valid_levels}")
         return v.upper()
 
+    @field_validator("LOG_FORMAT")
+    def validate_log_format(cls, v):
+        """Valida o formato de log."""
+        if v.lower() not in {"json", "text"}:
+            raise ValueError("LOG_FORMAT deve ser json ou text")
+        return v.lower()
+
     @field_validator("DATABASE_URL")
     def validate_database_url(cls, v):
         """Valida se a URL do banco está no formato correto."""
@@ -73,6 +439,11 @@ class Settings(BaseSettings):
             raise ValueError("DATABASE_URL não pode estar vazio")
         return v
 
+    @property
+    def allowed_origins(self) -> List[str]:
+        """Lista de origens CORS permitidas."""
+        return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",") if origin.strip()]
+
 
 @lru_cache()
 def get_settings() -> Settings:
@@ -1,6 +1,8 @@
 """Configuração de testes - suprimir warnings seguros de bibliotecas."""
 import warnings
 
+import pytest
+
 
 def pytest_configure(config):
     """Configurar pytest para suprimir warnings conhecidos de bibliotecas."""
@@ -12,3 +14,10 @@ def pytest_configure(config):
         module=".*sqlmodel.*"
     )
 
+
+
+@pytest.fixture
+def count_queries():
+    """Captura os comandos SQL executados durante o teste (ver query_log)."""
+    from backend.query_log import capture_queries
+    return capture_queries
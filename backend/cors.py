@@ -0,0 +1,114 @@
+"""Middleware CORS em ASGI puro.
+
+Substitui a combinação `CORSMiddleware` + `BaseHTTPMiddleware` usada antes:
+não cria tasks nem streams extras por requisição, não reempacota o corpo da
+resposta e devolve as respostas de preflight a partir de cabeçalhos
+pré-calculados por origem.
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+RawHeaders = List[Tuple[bytes, bytes]]
+
+DEFAULT_ALLOW_METHODS = ("GET", "POST", "PUT", "DELETE", "OPTIONS", "HEAD")
+DEFAULT_ALLOW_HEADERS = (
+    "Content-Type", "Authorization", "X-Requested-With", "Accept",
+    # Concorrência otimista, idempotência, rastreio e profiling
+    "If-Match", "Idempotency-Key", "X-Request-ID", "X-Profile",
+)
+# Cabeçalhos de resposta que o frontend precisa ler
+DEFAULT_EXPOSE_HEADERS = ("ETag", "Retry-After", "Idempotent-Replayed", "X-Request-ID", "X-Profile-Id")
+
+
+def _find_header(headers: Iterable[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    """Retorna o valor de um cabeçalho (nome em minúsculas) da requisição."""
+    for key, value in headers:
+        if key == name:
+            return value
+    return None
+
+
+class CORSMiddleware:
+    """
+    Middleware CORS que ecoa a origem quando ela está na lista permitida.
+
+    Args:
+        app: Aplicação ASGI interna
+        allow_origins: Origens permitidas
+        allow_methods: Métodos anunciados no preflight
+        allow_headers: Cabeçalhos anunciados no preflight
+        expose_headers: Cabeçalhos da resposta visíveis ao navegador
+        allow_credentials: Envia Access-Control-Allow-Credentials
+        max_age: Tempo (segundos) que o navegador pode manter o preflight em cache
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        allow_origins: Iterable[str],
+        allow_methods: Iterable[str] = DEFAULT_ALLOW_METHODS,
+        allow_headers: Iterable[str] = DEFAULT_ALLOW_HEADERS,
+        expose_headers: Iterable[str] = DEFAULT_EXPOSE_HEADERS,
+        allow_credentials: bool = True,
+        max_age: int = 600,
+    ) -> None:
+        self.app = app
+        self.allow_origins = frozenset(origin.encode("latin-1") for origin in allow_origins)
+
+        simple: RawHeaders = [(b"vary", b"Origin")]
+        if allow_credentials:
+            simple.append((b"access-control-allow-credentials", b"true"))
+        expose = ", ".join(expose_headers)
+        if expose:
+            simple.append((b"access-control-expose-headers", expose.encode("latin-1")))
+
+        preflight: RawHeaders = [
+            (b"vary", b"Origin"),
+            (b"access-control-allow-methods", ",".join(allow_methods).encode("latin-1")),
+            (b"access-control-allow-headers", ", ".join(allow_headers).encode("latin-1")),
+            (b"access-control-max-age", str(max_age).encode("latin-1")),
+            (b"content-length", b"0"),
+        ]
+        if allow_credentials:
+            preflight.append((b"access-control-allow-credentials", b"true"))
+
+        # Cabeçalhos prontos por origem: nada é montado durante a requisição
+        self._simple_headers: Dict[bytes, RawHeaders] = {
+            origin: [(b"access-control-allow-origin", origin)] + simple
+            for origin in self.allow_origins
+        }
+        self._preflight_headers: Dict[bytes, RawHeaders] = {
+            origin: [(b"access-control-allow-origin", origin)] + preflight
+            for origin in self.allow_origins
+        }
+        self._rejected_preflight_headers: RawHeaders = [(b"content-length", b"0")]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = _find_header(scope["headers"], b"origin")
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "OPTIONS":
+            # Preflight: responde direto, sem chegar às rotas
+            headers = self._preflight_headers.get(origin, self._rejected_preflight_headers)
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        extra_headers = self._simple_headers.get(origin)
+        if extra_headers is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cors(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + extra_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
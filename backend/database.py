@@ -5,34 +5,155 @@ Suporta alternar para um banco em memória quando a variável de ambiente
 o sistema localmente quando o arquivo de DB está bloqueado por outro
 processo (ex.: durante testes ou quando outro processo mantém uma
 conexão aberta).
+
+`AGENDA_DB_FILE` aponta para outro arquivo SQLite (ex.: um banco gerado por
+`synthetic_data` para testes de carga).
 """
 import os
+from sqlalchemy import event
 from sqlmodel import create_engine, SQLModel, Session
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 from pathlib import Path
 from contextlib import contextmanager
 
+from . import search  # noqa: F401 - índices FTS5 criados junto com create_all
+from . import outbox  # noqa: F401 - gatilhos de webhooks criados junto com create_all
+
 USE_IN_MEMORY = os.environ.get("AGENDA_USE_IN_MEMORY_DB") == "1"
 
 if USE_IN_MEMORY:
     DB_FILE = Path("<in-memory>")
     DATABASE_URL = "sqlite:///:memory:"
 else:
-    DB_FILE = Path(__file__).parent / "agendamentotcc.db"
+    DB_FILE = Path(os.environ.get("AGENDA_DB_FILE") or Path(__file__).parent / "agendamentotcc.db")
     DATABASE_URL = f"sqlite:///{DB_FILE.as_posix()}"
 
-# Criar engine com configurações otimizadas para SQLite
-engine = create_engine(
-    DATABASE_URL,
-    echo=False,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
+# Criar engine com configurações otimizadas para SQLite. O banco em memória
+# só existe na conexão que o criou, então é compartilhado (StaticPool); com
+# arquivo, cada thread usa a sua conexão do pool e as transações não se
+# misturam.
+if USE_IN_MEMORY:
+    engine = create_engine(
+        DATABASE_URL,
+        echo=False,
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+else:
+    engine = create_engine(
+        DATABASE_URL,
+        echo=False,
+        connect_args={"check_same_thread": False},
+    )
+
+# Engine das tarefas em segundo plano (agendador, lembretes, webhooks):
+# conexões próprias, abertas a cada execução, para que os commits e rollbacks
+# delas nunca caiam na transação de uma requisição. Em memória não há como
+# separar e a engine da aplicação é reaproveitada.
+if USE_IN_MEMORY:
+    task_engine = engine
+else:
+    task_engine = create_engine(
+        DATABASE_URL,
+        echo=False,
+        connect_args={"check_same_thread": False},
+        poolclass=NullPool,
+    )
+
+# Versão do esquema gravada em `PRAGMA user_version`. Incremente ao mudar
+# tabelas/índices para que a próxima inicialização aplique `create_all`.
+SCHEMA_VERSION = 7
+
+# Índices substituídos por versões compostas (e o de `is_deleted`, que quase
+# nunca filtra nada mas atraía o planejador); removidos na atualização
+OBSOLETE_INDEXES = (
+    "ix_appointment_is_deleted",
+    "ix_appointment_room_id",
+    "ix_appointment_patient_id",
+    "ix_appointment_student_id",
+    "ix_appointment_supervisor_id",
+    "ix_appointment_status",
 )
 
+
+class SchemaVersionError(RuntimeError):
+    """Banco criado por uma versão mais nova da aplicação."""
+
+
 def create_db_and_tables():
     """Criar banco de dados e tabelas."""
     SQLModel.metadata.create_all(engine)
 
+
+@event.listens_for(SQLModel.metadata, "after_drop")
+def _reset_schema_version(target, connection, **kw):
+    # drop_all apaga as tabelas; a próxima ensure_schema deve recriá-las
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("PRAGMA user_version = 0")
+
+
+def _add_missing_columns(conn) -> None:
+    """Adiciona (ALTER TABLE) colunas novas a tabelas já existentes."""
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {row[1] for row in conn.exec_driver_sql(f'PRAGMA table_info("{table.name}")')}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column.type.compile(conn.dialect)}'
+            if column.server_default is not None:
+                default = getattr(column.server_default.arg, "text", column.server_default.arg)
+                ddl += f" DEFAULT {default}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+            conn.exec_driver_sql(ddl)
+
+
+def ensure_schema(target_engine=None) -> int:
+    """
+    Garante o esquema atual com o menor custo possível na inicialização.
+
+    Se `PRAGMA user_version` já é `SCHEMA_VERSION`, nenhuma DDL é executada
+    (uma única leitura). Caso contrário, cria as tabelas, colunas e índices
+    ausentes e remove `OBSOLETE_INDEXES` sob `BEGIN IMMEDIATE` — com vários workers,
+    apenas um aplica e os demais encontram a versão atualizada.
+
+    Args:
+        target_engine: Engine a verificar (padrão: engine da aplicação)
+
+    Returns:
+        Versão encontrada antes da verificação (0 para banco novo)
+
+    Raises:
+        SchemaVersionError: Se o banco tiver versão maior que a da aplicação
+    """
+    target_engine = target_engine or engine
+    if target_engine.dialect.name != "sqlite":
+        SQLModel.metadata.create_all(target_engine)
+        return SCHEMA_VERSION
+
+    with target_engine.connect() as conn:
+        found = conn.exec_driver_sql("PRAGMA user_version").scalar()
+    if found == SCHEMA_VERSION:
+        return found
+    if found > SCHEMA_VERSION:
+        raise SchemaVersionError(
+            f"Banco na versão {found}, aplicação suporta até {SCHEMA_VERSION}"
+        )
+
+    with target_engine.begin() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        if conn.exec_driver_sql("PRAGMA user_version").scalar() != SCHEMA_VERSION:
+            SQLModel.metadata.create_all(conn)
+            # create_all só cria colunas e índices junto com tabelas novas
+            _add_missing_columns(conn)
+            for table in SQLModel.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.create(conn, checkfirst=True)
+            for index in OBSOLETE_INDEXES:
+                conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index}")
+            conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return found
+
 def get_session():
     """Obter sessão do banco de dados."""
     with Session(engine) as session:
@@ -20,6 +20,30 @@ class AppointmentStatus(str, Enum):
     NO_SHOW = "no_show"
 
 
+class ReminderChannel(str, Enum):
+    """Canal de envio de um lembrete."""
+    EMAIL = "email"
+    SMS = "sms"
+
+
+class ReminderStatus(str, Enum):
+    """Situação de um lembrete na fila de envio."""
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class WebhookDeliveryStatus(str, Enum):
+    """Situação de uma entrega de webhook na fila (outbox)."""
+    PENDING = "pending"
+    SENDING = "sending"
+    DELIVERED = "delivered"
+    DEAD = "dead"
+    CANCELLED = "cancelled"
+
+
 def time_overlaps(start1: datetime, end1: datetime, start2: datetime, end2: datetime) -> bool:
     """
     Verifica se dois períodos de tempo se sobrepõem.
@@ -0,0 +1,38 @@
+"""ETag e If-Match para controle de concorrência otimista.
+
+Cada registro tem `version`, incrementada a cada atualização. GET e PUT
+devolvem `ETag: "<versão>"`; um PUT com `If-Match` só é aplicado se o
+registro ainda estiver nessa versão (compare-and-swap em
+`BaseRepository.update`) e responde 412 com o ETag atual caso contrário.
+Sem `If-Match` (ou com `*`) a atualização não é condicionada.
+"""
+import re
+from typing import Optional
+
+from fastapi import HTTPException
+
+_ENTITY_TAG = re.compile(r'\s*"(\d+)"\s*')
+
+
+def etag(version: int) -> str:
+    """Valor do cabeçalho ETag para uma versão."""
+    return f'"{version}"'
+
+
+def if_match_version(if_match: Optional[str]) -> Optional[int]:
+    """
+    Versão esperada a partir do cabeçalho If-Match.
+
+    Returns:
+        Versão, ou None sem cabeçalho ou com `*`
+
+    Raises:
+        HTTPException: 412 para ETag que não corresponde a uma versão
+            (inclusive ETags fracos, que If-Match nunca aceita)
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+    match = _ENTITY_TAG.fullmatch(if_match)
+    if not match:
+        raise HTTPException(status_code=412, detail="If-Match não corresponde a uma versão do registro")
+    return int(match.group(1))
@@ -0,0 +1,198 @@
+"""Serialização em streaming de agendamentos (CSV, NDJSON e iCalendar).
+
+Cada função recebe um iterável de linhas (ver
+`AppointmentRepository.iter_export_rows`) e produz blocos de texto prontos
+para uma `StreamingResponse`. As linhas são agrupadas em lotes para reduzir o
+número de envios, mantendo o uso de memória constante.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Iterable, Iterator
+
+EXPORT_COLUMNS = [
+    "id",
+    "start_dt",
+    "end_dt",
+    "status",
+    "room_id",
+    "room_name",
+    "patient_id",
+    "patient_name",
+    "student_id",
+    "student_name",
+    "supervisor_id",
+    "supervisor_name",
+    "notes",
+]
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "ics": "text/calendar; charset=utf-8",
+}
+
+ROWS_PER_CHUNK = 500
+
+
+def _as_utc(dt: datetime) -> datetime:
+    """Datas sem fuso (como as lidas do SQLite) são tratadas como UTC."""
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+
+def _isoformat_utc(dt: datetime) -> str:
+    if dt.tzinfo is None:
+        return dt.isoformat() + "+00:00"
+    return dt.astimezone(timezone.utc).isoformat()
+
+
+_START_DT = EXPORT_COLUMNS.index("start_dt")
+_END_DT = EXPORT_COLUMNS.index("end_dt")
+_STATUS = EXPORT_COLUMNS.index("status")
+
+
+def _row_values(row) -> list:
+    """Converte uma linha (na ordem de EXPORT_COLUMNS) em valores serializáveis."""
+    values = list(row)
+    values[_START_DT] = _isoformat_utc(values[_START_DT])
+    values[_END_DT] = _isoformat_utc(values[_END_DT])
+    values[_STATUS] = getattr(values[_STATUS], "value", values[_STATUS])
+    return values
+
+
+def iter_csv(rows: Iterable) -> Iterator[str]:
+    """
+    Gera o CSV (com cabeçalho) em blocos.
+
+    Args:
+        rows: Linhas de exportação
+
+    Yields:
+        Blocos de texto CSV
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    count = 0
+    for row in rows:
+        writer.writerow(_row_values(row))
+        count += 1
+        if count % ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_ndjson(rows: Iterable) -> Iterator[str]:
+    """
+    Gera um objeto JSON por linha em blocos.
+
+    Args:
+        rows: Linhas de exportação
+
+    Yields:
+        Blocos de texto NDJSON
+    """
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(EXPORT_COLUMNS, _row_values(row))), ensure_ascii=False))
+        if len(lines) == ROWS_PER_CHUNK:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def _ical_escape(text) -> str:
+    """Escapa texto conforme RFC 5545."""
+    if text is None:
+        return ""
+    return (
+        str(text)
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def _ical_fold(line: str) -> str:
+    """Quebra linhas maiores que 75 octetos (RFC 5545, seção 3.1)."""
+    if len(line.encode("utf-8")) <= 75:
+        return line + "\r\n"
+    parts = []
+    current = ""
+    size = 0
+    for char in line:
+        char_size = len(char.encode("utf-8"))
+        if size + char_size > 75:
+            parts.append(current)
+            current = " "
+            size = 1
+        current += char
+        size += char_size
+    parts.append(current)
+    return "\r\n".join(parts) + "\r\n"
+
+
+def _ical_datetime(dt: datetime) -> str:
+    return _as_utc(dt).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _ical_event(row, stamp: str) -> str:
+    status = getattr(row.status, "value", row.status)
+    summary = f"Atendimento - {row.patient_name}" if row.patient_name else "Atendimento"
+    description = f"Estagiário: {row.student_name or '-'}\nSupervisor: {row.supervisor_name or '-'}"
+    if row.notes:
+        description += f"\n{row.notes}"
+    lines = [
+        "BEGIN:VEVENT",
+        f"UID:appointment-{row.id}@agendamento",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{_ical_datetime(row.start_dt)}",
+        f"DTEND:{_ical_datetime(row.end_dt)}",
+        f"SUMMARY:{_ical_escape(summary)}",
+        f"LOCATION:{_ical_escape(row.room_name)}",
+        f"DESCRIPTION:{_ical_escape(description)}",
+        f"STATUS:{'CANCELLED' if status == 'cancelled' else 'CONFIRMED'}",
+        "END:VEVENT",
+    ]
+    return "".join(_ical_fold(line) for line in lines)
+
+
+def iter_ical(rows: Iterable) -> Iterator[str]:
+    """
+    Gera um calendário iCalendar (VCALENDAR) em blocos.
+
+    Args:
+        rows: Linhas de exportação
+
+    Yields:
+        Blocos de texto iCalendar
+    """
+    stamp = _ical_datetime(datetime.now(timezone.utc))
+    chunk = [
+        "BEGIN:VCALENDAR\r\n",
+        "VERSION:2.0\r\n",
+        "PRODID:-//UNIPAR Cianorte//Agendamento Psicologia//PT-BR\r\n",
+        "CALSCALE:GREGORIAN\r\n",
+    ]
+    for row in rows:
+        chunk.append(_ical_event(row, stamp))
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield "".join(chunk)
+            chunk = []
+    chunk.append("END:VCALENDAR\r\n")
+    yield "".join(chunk)
+
+
+EXPORT_WRITERS = {
+    "csv": iter_csv,
+    "ndjson": iter_ndjson,
+    "ics": iter_ical,
+}
@@ -0,0 +1,136 @@
+"""Seleção de campos (`fields=`) e expansão de relações (`expand=`).
+
+Com `fields=id,start_dt,status` a consulta lê só essas colunas; com
+`expand=room,student` as relações pedidas vêm aninhadas no mesmo SELECT
+(LEFT JOIN), sem consultas extras por item. Campos de uma relação podem ser
+escolhidos com ponto (`fields=id,room.name`), o que também a expande.
+
+O `id` da entidade e de cada relação expandida sempre é retornado. As
+colunas das relações seguem os modelos de resposta (`RoomResponse`,
+`UserResponse`...), então campos sensíveis como a senha nunca são expostos.
+"""
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+
+from .models import Appointment, Patient, Room, User
+from .schemas import PatientResponse, RoomResponse, UserResponse
+
+
+class FieldSelectionError(ValueError):
+    """Campo ou relação desconhecidos em `fields=`/`expand=`."""
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return list(dict.fromkeys(item.strip() for item in (value or "").split(",") if item.strip()))
+
+
+class Fieldset:
+    """
+    Campos selecionáveis de uma entidade e relações expansíveis.
+
+    Args:
+        model: Modelo da tabela principal
+        fields: Colunas que podem ser pedidas em `fields=`
+        relations: Nome da relação -> (modelo relacionado, coluna de chave
+            estrangeira no modelo principal, colunas expostas)
+    """
+
+    def __init__(self, model, fields: Tuple[str, ...], relations: Dict[str, tuple]):
+        self.model = model
+        self.fields = fields
+        self.relations = relations
+
+    def parse(self, fields: Optional[str], expand: Optional[str]) -> Tuple[List[str], Dict[str, List[str]]]:
+        """
+        Interpreta os parâmetros da requisição.
+
+        Args:
+            fields: Lista separada por vírgulas (None = todas as colunas)
+            expand: Relações separadas por vírgulas
+
+        Returns:
+            (colunas da entidade, relação -> colunas da relação)
+
+        Raises:
+            FieldSelectionError: Se um campo ou relação não existir
+        """
+        expanded: Dict[str, List[str]] = {}
+        for name in _split(expand):
+            if name not in self.relations:
+                raise FieldSelectionError(f"Relação desconhecida: {name}")
+            expanded[name] = []
+
+        requested = _split(fields)
+        base = ["id"] if requested else list(self.fields)
+        for name in requested:
+            relation, _, column = name.partition(".")
+            if column:
+                if relation not in self.relations or column not in self.relations[relation][2]:
+                    raise FieldSelectionError(f"Campo desconhecido: {name}")
+                expanded.setdefault(relation, []).append(column)
+            elif name not in self.fields:
+                raise FieldSelectionError(f"Campo desconhecido: {name}")
+            elif name not in base:
+                base.append(name)
+
+        for relation, columns in expanded.items():
+            available = self.relations[relation][2]
+            expanded[relation] = ["id"] + [c for c in columns if c != "id"] if columns else list(available)
+        return base, expanded
+
+    def select(self, fields: Optional[str], expand: Optional[str]) -> Tuple[object, Callable]:
+        """
+        Monta o SELECT com as colunas e LEFT JOINs pedidos.
+
+        Args:
+            fields: Valor de `fields=`
+            expand: Valor de `expand=`
+
+        Returns:
+            (consulta para completar com WHERE/ORDER BY/LIMIT, função que
+            converte cada linha no dicionário da resposta)
+
+        Raises:
+            FieldSelectionError: Se um campo ou relação não existir
+        """
+        base, expanded = self.parse(fields, expand)
+        columns = [getattr(self.model, name).label(name) for name in base]
+        joins = []
+        for relation, related_columns in expanded.items():
+            related_model, foreign_key, _ = self.relations[relation]
+            target = aliased(related_model, name=f"expand_{relation}")
+            columns += [getattr(target, name).label(f"{relation}__{name}") for name in related_columns]
+            joins.append((target, target.id == getattr(self.model, foreign_key)))
+
+        stmt = select(*columns).select_from(self.model)
+        for target, on in joins:
+            stmt = stmt.outerjoin(target, on)
+
+        def to_item(row) -> dict:
+            values = row._mapping
+            item = {name: values[name] for name in base}
+            for relation, related_columns in expanded.items():
+                if values[f"{relation}__id"] is None:
+                    item[relation] = None
+                else:
+                    item[relation] = {name: values[f"{relation}__{name}"] for name in related_columns}
+            return item
+
+        return stmt, to_item
+
+
+APPOINTMENT_FIELDSET = Fieldset(
+    Appointment,
+    fields=(
+        "id", "start_dt", "end_dt", "status", "notes", "room_id", "patient_id",
+        "student_id", "supervisor_id", "created_at", "updated_at", "version",
+    ),
+    relations={
+        "room": (Room, "room_id", tuple(RoomResponse.model_fields)),
+        "patient": (Patient, "patient_id", tuple(PatientResponse.model_fields)),
+        "student": (User, "student_id", tuple(UserResponse.model_fields)),
+        "supervisor": (User, "supervisor_id", tuple(UserResponse.model_fields)),
+    },
+)
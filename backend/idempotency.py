@@ -0,0 +1,423 @@
+"""Idempotência das rotas de criação (cabeçalho `Idempotency-Key`).
+
+Com Wi-Fi instável o frontend repete `POST`s cuja resposta se perdeu, e cada
+repetição criaria um registro novo. Quando a requisição traz
+`Idempotency-Key`, `IdempotencyMiddleware` reserva a chave antes de chamar a
+rota e guarda a resposta ao final; repetições com a mesma chave recebem a
+resposta original (com `Idempotent-Replayed: true`) sem passar de novo pela
+validação, pelo hash de senha ou pelo banco.
+
+- Mesma chave com outro corpo: 422 (a chave não pode ser reutilizada).
+- Mesma chave enquanto a primeira ainda executa: 409 (tente de novo).
+- Respostas 5xx e 429 não são guardadas: a repetição executa a rota.
+
+A chave vale por rota e por credencial (cabeçalho Authorization). Cada
+entrada guarda só resumos de 16 bytes da chave e do corpo, o status, os
+cabeçalhos `Content-Type`, `ETag` e `Location` e o corpo da resposta, e
+expira após `IDEMPOTENCY_TTL_SECONDS`.
+
+O armazenamento é plugável, como em `rate_limit.py`:
+
+- `MemoryIdempotencyStore`: por processo, com tamanho máximo.
+- `SQLiteIdempotencyStore`: arquivo SQLite compartilhado entre workers do
+  mesmo host, reservado em transação `BEGIN IMMEDIATE`.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import get_settings
+from .logger import logger
+
+settings = get_settings()
+
+KEY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+STORED_HEADERS = (b"content-type", b"etag", b"location")
+MAX_KEY_LENGTH = 255
+# Uma reserva abandonada (worker encerrado no meio da requisição) libera a
+# chave após este tempo
+LOCK_SECONDS = 60.0
+
+
+class IdempotencyInProgress(Exception):
+    """Outra requisição com a mesma chave ainda está em execução."""
+
+
+class IdempotencyKeyReused(Exception):
+    """Chave já usada com um corpo de requisição diferente."""
+
+
+class StoredResponse(NamedTuple):
+    """Resposta guardada para repetição."""
+
+    status: int
+    headers: Tuple[Tuple[bytes, bytes], ...]
+    body: bytes
+
+
+def _digest(*parts: bytes) -> bytes:
+    hasher = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        hasher.update(len(part).to_bytes(4, "big"))
+        hasher.update(part)
+    return hasher.digest()
+
+
+class IdempotencyStore(ABC):
+    """Interface de armazenamento das chaves e respostas."""
+
+    @abstractmethod
+    def reserve(self, key: bytes, fingerprint: bytes, now: float) -> Optional[StoredResponse]:
+        """
+        Reserva a chave para uma nova execução ou retorna a resposta guardada.
+
+        Args:
+            key: Resumo da chave (rota + credencial + Idempotency-Key)
+            fingerprint: Resumo do corpo da requisição
+            now: Instante atual (time.time())
+
+        Returns:
+            None se a chave foi reservada; senão, a resposta original
+
+        Raises:
+            IdempotencyInProgress: Se a chave estiver reservada
+            IdempotencyKeyReused: Se a chave foi usada com outro corpo
+        """
+
+    @abstractmethod
+    def complete(self, key: bytes, response: StoredResponse, now: float) -> None:
+        """Guarda a resposta de uma chave reservada."""
+
+    @abstractmethod
+    def release(self, key: bytes) -> None:
+        """Libera uma reserva sem guardar resposta."""
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Remove todas as chaves."""
+
+    @abstractmethod
+    def size(self) -> int:
+        """Quantidade de chaves armazenadas."""
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """
+    Respostas em memória do processo.
+
+    Cada entrada é (resumo do corpo, expiração, resposta ou None enquanto
+    reservada). A ordem do `OrderedDict` é a de gravação: entradas antigas
+    são descartadas quando expiram ou quando `max_keys` é excedido.
+
+    Args:
+        ttl_seconds: Validade de uma resposta guardada
+        max_keys: Número máximo de chaves mantidas
+    """
+
+    def __init__(self, ttl_seconds: float, max_keys: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        self._entries: "OrderedDict[bytes, Tuple[bytes, float, Optional[StoredResponse]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def reserve(self, key: bytes, fingerprint: bytes, now: float) -> Optional[StoredResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                if entry[0] != fingerprint:
+                    raise IdempotencyKeyReused()
+                if entry[2] is None:
+                    raise IdempotencyInProgress()
+                return entry[2]
+            self._entries.pop(key, None)
+            self._entries[key] = (fingerprint, now + LOCK_SECONDS, None)
+            self._expire(now)
+            return None
+
+    def complete(self, key: bytes, response: StoredResponse, now: float) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = (entry[0], now + self.ttl_seconds, response)
+
+    def release(self, key: bytes) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _expire(self, now: float) -> None:
+        entries = self._entries
+        while entries:
+            oldest = next(iter(entries))
+            if entries[oldest][1] > now and len(entries) <= self.max_keys:
+                break
+            del entries[oldest]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteIdempotencyStore(IdempotencyStore):
+    """
+    Respostas em um arquivo SQLite compartilhado entre processos.
+
+    Args:
+        path: Caminho do arquivo do banco
+        ttl_seconds: Validade de uma resposta guardada
+        purge_every: A cada quantas reservas remover chaves expiradas
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, purge_every: int = 1000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._operations = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+                "key BLOB PRIMARY KEY, fingerprint BLOB NOT NULL, expires_at REAL NOT NULL, "
+                "status INTEGER, headers TEXT, body BLOB)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_idempotency_keys_expires_at "
+                "ON idempotency_keys (expires_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def reserve(self, key: bytes, fingerprint: bytes, now: float) -> Optional[StoredResponse]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT fingerprint, status, headers, body FROM idempotency_keys "
+                "WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, expires_at) VALUES (?, ?, ?)",
+                    (key, fingerprint, now + LOCK_SECONDS),
+                )
+                self._operations += 1
+                if self._operations % self.purge_every == 0:
+                    conn.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        if row[0] != fingerprint:
+            raise IdempotencyKeyReused()
+        if row[1] is None:
+            raise IdempotencyInProgress()
+        headers = tuple((name.encode("latin-1"), value.encode("latin-1")) for name, value in json.loads(row[2]))
+        return StoredResponse(row[1], headers, row[3])
+
+    def complete(self, key: bytes, response: StoredResponse, now: float) -> None:
+        headers = json.dumps([(name.decode("latin-1"), value.decode("latin-1")) for name, value in response.headers])
+        self._connect().execute(
+            "UPDATE idempotency_keys SET status = ?, headers = ?, body = ?, expires_at = ? WHERE key = ?",
+            (response.status, headers, response.body, now + self.ttl_seconds, key),
+        )
+
+    def release(self, key: bytes) -> None:
+        self._connect().execute("DELETE FROM idempotency_keys WHERE key = ? AND status IS NULL", (key,))
+
+    def reset(self) -> None:
+        self._connect().execute("DELETE FROM idempotency_keys")
+
+    def size(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM idempotency_keys").fetchone()[0]
+
+
+def build_store(url: str, ttl_seconds: float, max_keys: int) -> IdempotencyStore:
+    """
+    Cria o armazenamento a partir da URL configurada.
+
+    Args:
+        url: "memory" ou "sqlite:///caminho/arquivo.db"
+        ttl_seconds: Validade de uma resposta guardada
+        max_keys: Limite de chaves do armazenamento em memória
+
+    Returns:
+        Armazenamento de respostas
+    """
+    if not url or url == "memory":
+        return MemoryIdempotencyStore(ttl_seconds, max_keys)
+    if url.startswith("sqlite:///"):
+        return SQLiteIdempotencyStore(url[len("sqlite:///"):], ttl_seconds)
+    raise ValueError(f"IDEMPOTENCY_STORE_URL não suportada: {url}")
+
+
+idempotency_store = build_store(
+    settings.IDEMPOTENCY_STORE_URL, settings.IDEMPOTENCY_TTL_SECONDS, settings.IDEMPOTENCY_MAX_KEYS
+)
+
+_counts_lock = threading.Lock()
+_counts = {"stored": 0, "replayed": 0, "in_progress": 0, "key_reused": 0}
+
+
+def _count(name: str) -> None:
+    with _counts_lock:
+        _counts[name] += 1
+
+
+def idempotency_metrics() -> dict:
+    """Retorna respostas guardadas, repetidas e recusadas."""
+    with _counts_lock:
+        counts = dict(_counts)
+    return {"store": type(idempotency_store).__name__, "keys": idempotency_store.size(), **counts}
+
+
+def _should_store(status: int) -> bool:
+    """Erros transitórios (5xx, 429) não são guardados: a repetição executa a rota."""
+    return status < 500 and status != 429
+
+
+async def _send_json(send: Send, status: int, message: str, headers: Iterable = ()) -> None:
+    body = json.dumps({"success": False, "message": message, "detail": message}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """
+    Middleware ASGI que aplica `Idempotency-Key` aos `POST` das rotas dadas.
+
+    Requisições sem o cabeçalho (ou fora das rotas) passam direto, sem custo.
+
+    Args:
+        app: Aplicação ASGI interna
+        store: Armazenamento das chaves e respostas
+        paths: Caminhos das rotas de criação
+    """
+
+    def __init__(self, app: ASGIApp, store: IdempotencyStore, paths: Iterable[str]):
+        self.app = app
+        self.store = store
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(KEY_HEADER)
+        if idempotency_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not 0 < len(idempotency_key) <= MAX_KEY_LENGTH:
+            await _send_json(send, 400, f"Idempotency-Key deve ter de 1 a {MAX_KEY_LENGTH} caracteres")
+            return
+
+        # O corpo é lido por inteiro para compor o resumo e depois reentregue
+        chunks: List[bytes] = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                return
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+
+        key = _digest(scope["path"].encode("utf-8"), headers.get(b"authorization", b""), idempotency_key)
+        fingerprint = _digest(scope.get("query_string", b""), body)
+        # O armazenamento pode esperar pelo SQLite (BEGIN IMMEDIATE): fora do
+        # event loop, no threadpool
+        try:
+            stored = await run_in_threadpool(self.store.reserve, key, fingerprint, time.time())
+        except IdempotencyInProgress:
+            _count("in_progress")
+            await _send_json(
+                send, 409, "Requisição com esta Idempotency-Key ainda em andamento", [(b"retry-after", b"1")]
+            )
+            return
+        except IdempotencyKeyReused:
+            _count("key_reused")
+            await _send_json(send, 422, "Idempotency-Key já usada com outro corpo de requisição")
+            return
+
+        if stored is not None:
+            _count("replayed")
+            logger.info("Resposta repetida por Idempotency-Key [POST %s]", scope["path"])
+            await send({
+                "type": "http.response.start",
+                "status": stored.status,
+                "headers": [
+                    *stored.headers,
+                    (b"content-length", str(len(stored.body)).encode("latin-1")),
+                    (REPLAYED_HEADER, b"true"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": stored.body})
+            return
+
+        delivered = False
+
+        async def replay_body() -> Message:
+            nonlocal delivered
+            if delivered:
+                return await receive()
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        status = 0
+        response_headers: Tuple[Tuple[bytes, bytes], ...] = ()
+        response_body: List[bytes] = []
+        complete = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status, response_headers, complete
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers = tuple(
+                    (name.lower(), value) for name, value in message.get("headers", [])
+                    if name.lower() in STORED_HEADERS
+                )
+            elif message["type"] == "http.response.body" and _should_store(status):
+                response_body.append(message.get("body", b""))
+                complete = not message.get("more_body", False)
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, send_wrapper)
+        finally:
+            if complete:
+                await run_in_threadpool(
+                    self.store.complete,
+                    key, StoredResponse(status, response_headers, b"".join(response_body)), time.time(),
+                )
+                _count("stored")
+            else:
+                await run_in_threadpool(self.store.release, key)
@@ -1,14 +1,242 @@
+"""Logging da aplicação: fila limitada, thread de escrita e saída JSON.
+
+O logger raiz recebe um `QueueHandler`; a escrita em disco/terminal roda em
+uma thread (`QueueListener`), fora do caminho da requisição. A mensagem só é
+formatada nessa thread — use argumentos no estilo `%` nos caminhos quentes
+(`logger.debug("Criado %s: %s", nome, id)`) para que registros filtrados
+pelo nível não custem a interpolação.
+
+Fila cheia (`LOG_QUEUE_SIZE`):
+
+- registros abaixo de WARNING são descartados (contados em `dropped`);
+- WARNING ou acima aguardam até `LOG_QUEUE_BLOCK_MS` por espaço
+  (contrapressão) e só então são descartados.
+
+Com `LOG_FORMAT=json`, cada linha é um objeto com horário, nível, logger,
+mensagem, `request_id` da requisição em andamento e os campos passados em
+`extra=` (ex.: `duration_ms`). `RequestContextMiddleware` define o
+identificador (cabeçalho `X-Request-ID` recebido ou gerado), devolve-o na
+resposta e registra a duração de cada requisição.
+"""
+import atexit
+import datetime as dt
+import decimal
+import enum
+import json
 import logging
+import queue
+import sys
+import time
+import uuid
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
 from .config import get_settings
 
 # Obter configurações via import relativo (funciona quando pacote é importado)
 settings = get_settings()
 
-# Configurar logging
-logging.basicConfig(
-    level=settings.LOG_LEVEL,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+REQUEST_ID_HEADER = b"x-request-id"
+MAX_REQUEST_ID_LENGTH = 128
+
+# Atributos padrão de LogRecord (o restante veio de `extra=`)
+_RESERVED = frozenset(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id"}
+# Argumentos seguros para formatar depois, em outra thread
+_LAZY_SAFE = (str, int, float, bool, type(None), decimal.Decimal, dt.date, dt.time, dt.timedelta, uuid.UUID, enum.Enum)
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registro, com os campos de `extra=`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": dt.datetime.fromtimestamp(record.created, dt.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    `QueueHandler` com fila limitada, descarte e formatação adiada.
+
+    Args:
+        log_queue: Fila limitada compartilhada com o `QueueListener`
+        block_seconds: Espera máxima por espaço para WARNING ou acima
+    """
+
+    def __init__(self, log_queue: queue.Queue, block_seconds: float):
+        super().__init__(log_queue)
+        self.block_seconds = block_seconds
+        self.dropped = 0
+        self.blocked = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Só o contexto da requisição é capturado aqui; a interpolação fica
+        # para a thread de escrita, exceto com argumentos mutáveis/ORM.
+        record.request_id = request_id_var.get()
+        if record.args and not all(isinstance(arg, _LAZY_SAFE) for arg in _iter_args(record.args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if record.levelno >= logging.WARNING and self.block_seconds > 0:
+            self.blocked += 1
+            try:
+                self.queue.put(record, timeout=self.block_seconds)
+                return
+            except queue.Full:
+                pass
+        self.dropped += 1
+
+    def metrics(self) -> dict:
+        """Retorna ocupação da fila e registros descartados."""
+        return {
+            "queued": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "dropped": self.dropped,
+            "blocked": self.blocked,
+        }
+
+
+class DrainingQueueListener(QueueListener):
+    """`QueueListener` que aguarda espaço para o sentinela ao parar (fila cheia)."""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+def _iter_args(args):
+    return args.values() if isinstance(args, dict) else args
+
+
+class _RequestIdFilter(logging.Filter):
+    """Completa `request_id` em registros que não passaram pela fila."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        return True
+
+
+def build_formatter(log_format: str) -> logging.Formatter:
+    return JsonFormatter() if log_format == "json" else logging.Formatter(TEXT_FORMAT)
+
+
+def configure_logging(level: str, log_format: str, queue_size: int, block_ms: float, stream=None):
+    """
+    Instala a fila no logger raiz (se ele ainda não tiver handlers).
+
+    Args:
+        level: Nível do logger raiz
+        log_format: "json" ou "text"
+        queue_size: Capacidade da fila
+        block_ms: Espera máxima por espaço para WARNING ou acima
+        stream: Destino (padrão: stderr)
+
+    Returns:
+        (handler da fila, listener) ou (None, None) se já configurado
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+    if root.handlers:
+        return None, None
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(build_formatter(log_format))
+    output.addFilter(_RequestIdFilter())
+    handler = BoundedQueueHandler(queue.Queue(maxsize=queue_size), block_ms / 1000.0)
+    listener = DrainingQueueListener(handler.queue, output, respect_handler_level=True)
+    listener.start()
+    root.addHandler(handler)
+    atexit.register(listener.stop)
+    return handler, listener
+
+
+queue_handler, queue_listener = configure_logging(
+    settings.LOG_LEVEL, settings.LOG_FORMAT, settings.LOG_QUEUE_SIZE, settings.LOG_QUEUE_BLOCK_MS,
 )
 
 logger = logging.getLogger(__name__)
 
+
+def logging_metrics() -> dict:
+    """Métricas da fila de logging (vazias se outro handler foi configurado)."""
+    return queue_handler.metrics() if queue_handler is not None else {}
+
+
+class RequestContextMiddleware:
+    """
+    Middleware ASGI que identifica cada requisição nos logs.
+
+    Usa o `X-Request-ID` recebido (até 128 caracteres) ou gera um novo,
+    devolve-o na resposta e, com `log_requests`, registra método, rota,
+    status e `duration_ms` ao final.
+
+    Args:
+        app: Aplicação ASGI interna
+        log_requests: Registra uma linha por requisição (INFO)
+    """
+
+    def __init__(self, app: ASGIApp, log_requests: bool = True):
+        self.app = app
+        self.log_requests = log_requests
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")[:MAX_REQUEST_ID_LENGTH] or None
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER, request_id.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if self.log_requests and logger.isEnabledFor(logging.INFO):
+                duration_ms = round((time.perf_counter() - start) * 1000, 2)
+                logger.info(
+                    "%s %s %s %.2fms", scope["method"], scope["path"], status_code, duration_ms,
+                    extra={"method": scope["method"], "path": scope["path"],
+                           "status": status_code, "duration_ms": duration_ms},
+                )
+            request_id_var.reset(token)
@@ -2,17 +2,32 @@
 API de Agendamento - Clínica de Psicologia UNIPAR Cianorte.
 """
 
+import time
+
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
-from starlette.middleware.base import BaseHTTPMiddleware
 
-from backend.database import create_db_and_tables
+from backend.database import USE_IN_MEMORY, ensure_schema
 from backend.seed_data import seed_database
-from backend.logger import logger
-from backend.routers import auth, rooms, patients, users, appointments
+from backend.logger import RequestContextMiddleware, logger, logging_metrics, queue_handler
+from backend.routers import auth, rooms, patients, users, appointments, admin, webhooks
 from backend.config import get_settings
+from backend.compression import CompressionMiddleware
+from backend.cors import DEFAULT_ALLOW_HEADERS, DEFAULT_EXPOSE_HEADERS, CORSMiddleware
+from backend.query_log import QueryBudgetMiddleware
+from backend.profiling import ProfilingMiddleware, instrument_endpoints, profile_store
+from backend.metrics import CONTENT_TYPE_LATEST, MetricsMiddleware, register_stats, render
+from backend.static_assets import FrontendApp, FRONTEND_DIR
+from backend.password_hasher import HashingBusyError
+from backend.rate_limit import RateLimitExceeded, retry_after_header
+from backend.repository import StaleVersionError
+from backend.idempotency import IdempotencyMiddleware, idempotency_metrics, idempotency_store
+from backend.scheduler import status_scheduler
+from backend.reminders import reminder_dispatcher
+from backend.webhooks import webhook_dispatcher
+from backend.etag import etag
+from backend.security import import_hasher, password_hasher, principal_cache, revocation_list, rate_limiter
 
 settings = get_settings()
 
@@ -20,59 +35,99 @@ settings = get_settings()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Inicializando aplicação...")
-    create_db_and_tables()
-    try:
-        seed_database()
-    except Exception as e:
-        logger.warning(f"Falha ao popular banco na inicializacao: {e}")
+    start = time.perf_counter()
+    ensure_schema()
+    # Banco em memória começa vazio a cada processo; nos demais casos o seed
+    # é um comando explícito (python -m backend.seed_data)
+    if settings.SEED_ON_STARTUP or USE_IN_MEMORY:
+        try:
+            seed_database()
+        except Exception as e:
+            logger.warning(f"Falha ao popular banco na inicializacao: {e}")
+    if settings.SCHEDULER_ENABLED:
+        status_scheduler.start()
+    if settings.REMINDERS_ENABLED:
+        reminder_dispatcher.start()
+    if settings.WEBHOOKS_ENABLED:
+        webhook_dispatcher.start()
+    logger.info("Aplicação pronta em %.1fms", (time.perf_counter() - start) * 1000)
     yield
     logger.info("Encerrando aplicação...")
+    status_scheduler.stop()
+    reminder_dispatcher.stop()
+    webhook_dispatcher.stop()
+    password_hasher.shutdown()
+    import_hasher.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
 
-ALLOWED_ORIGINS = [
-    "http://localhost:3000",
-    "http://127.0.0.1:3000",
-    "http://localhost:8000",
-    "http://127.0.0.1:8000",
-]
+# Rotas de criação em que um POST repetido criaria outro registro
+CREATE_ROUTES = (
+    "/api/auth/register",
+    "/api/rooms",
+    "/api/patients",
+    "/api/patients/import",
+    "/api/users",
+    "/api/users/import",
+    "/api/appointments",
+    "/api/webhooks",
+)
+
+# Idempotency-Key nas rotas de criação. Adicionado primeiro, mais próximo das
+# rotas, para guardar o corpo ainda sem compressão.
+if settings.IDEMPOTENCY_ENABLED:
+    app.add_middleware(IdempotencyMiddleware, store=idempotency_store, paths=CREATE_ROUTES)
+
+# Compressão gzip/brotli para respostas acima do tamanho mínimo configurado.
+# Adicionada logo no início para ficar perto das rotas e receber o corpo
+# completo da resposta.
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
 
-# Primeiro, adicionar CORSMiddleware padrão
+# CORS em ASGI puro: ecoa a origem quando permitida e responde preflight
+# diretamente com Access-Control-Max-Age.
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=ALLOWED_ORIGINS,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_origins=settings.allowed_origins,
+    allow_headers=DEFAULT_ALLOW_HEADERS,
+    expose_headers=DEFAULT_EXPOSE_HEADERS,
+    max_age=settings.CORS_MAX_AGE,
 )
 
-# Depois, adicionar um middleware ASGI que garante que o header
-# Access-Control-Allow-Origin seja definido EXATAMENTE como a origem
-# quando esta estiver na lista ALLOWED_ORIGINS.
-class CORSFixerMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        # Responder preflight de forma explícita
-        if request.method == "OPTIONS":
-            origin = request.headers.get("origin")
-            headers = {}
-            if origin and origin in ALLOWED_ORIGINS:
-                headers = {
-                    "Access-Control-Allow-Origin": origin,
-                    "Access-Control-Allow-Methods": "GET,POST,PUT,DELETE,OPTIONS,HEAD",
-                    "Access-Control-Allow-Headers": "Content-Type, Authorization, X-Requested-With, Accept",
-                    "Access-Control-Allow-Credentials": "true",
-                }
-            return Response(status_code=200, headers=headers)
-
-        response = await call_next(request)
-        origin = request.headers.get("origin")
-        if origin and origin in ALLOWED_ORIGINS:
-            response.headers["Access-Control-Allow-Origin"] = origin
-            response.headers["Access-Control-Allow-Credentials"] = "true"
-        return response
-
-app.add_middleware(CORSFixerMiddleware)
+# Contagem de comandos SQL por requisição (sinaliza N+1 acima do orçamento)
+app.add_middleware(QueryBudgetMiddleware, budget=settings.QUERY_BUDGET)
+
+# Profiling sob demanda (X-Profile) e amostrado; desativado não tem custo
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=profile_store,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        sample_interval_ms=settings.PROFILING_SAMPLE_INTERVAL_MS,
+    )
+
+# Métricas por rota; adicionado por último para medir a pilha inteira
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    register_stats("password_hashing", password_hasher.metrics)
+    register_stats("import_hashing", import_hasher.metrics)
+    register_stats("principal_cache", principal_cache.metrics)
+    register_stats("token_revocation", revocation_list.metrics)
+    register_stats("rate_limit", rate_limiter.metrics)
+    if settings.IDEMPOTENCY_ENABLED:
+        register_stats("idempotency", idempotency_metrics)
+    if settings.SCHEDULER_ENABLED:
+        register_stats("scheduler", status_scheduler.metrics)
+    if settings.REMINDERS_ENABLED:
+        register_stats("reminders", reminder_dispatcher.metrics)
+    if settings.WEBHOOKS_ENABLED:
+        register_stats("webhooks", webhook_dispatcher.metrics)
+    if queue_handler is not None:
+        register_stats("logging", logging_metrics)
+
+# Identificador da requisição nos logs (X-Request-ID) e linha de acesso com
+# a duração; o mais externo, para cobrir os demais middlewares
+app.add_middleware(RequestContextMiddleware, log_requests=settings.LOG_REQUESTS)
 
 # Registrar routers
 app.include_router(auth.router)
@@ -80,22 +135,76 @@ app.include_router(rooms.router)
 app.include_router(patients.router)
 app.include_router(users.router)
 app.include_router(appointments.router)
+app.include_router(admin.router)
+app.include_router(webhooks.router)
+
+if settings.PROFILING_ENABLED:
+    # Perfila também a thread do threadpool que executa endpoints síncronos
+    instrument_endpoints(app)
 
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok", "message": "Servidor rodando normalmente"}
+    return {
+        "status": "ok",
+        "message": "Servidor rodando normalmente",
+        "password_hashing": password_hasher.metrics(),
+        "import_hashing": import_hasher.metrics(),
+        "principal_cache": principal_cache.metrics(),
+        "token_revocation": revocation_list.metrics(),
+        "rate_limit": rate_limiter.metrics(),
+        "idempotency": idempotency_metrics(),
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Métricas no formato Prometheus."""
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(render(), media_type=CONTENT_TYPE_LATEST)
+
+
+# Frontend estático (versionado e pré-comprimido). Montado por último para
+# não encobrir as rotas da API.
+if settings.SERVE_FRONTEND and FRONTEND_DIR.is_dir():
+    app.mount(settings.FRONTEND_PATH, FrontendApp(FRONTEND_DIR), name="frontend")
 
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    logger.warning(f"HTTPException: {exc.status_code} - {exc.detail} [{request.method} {request.url.path}]")
+    logger.warning("HTTPException: %s - %s [%s %s]", exc.status_code, exc.detail, request.method, request.url.path)
     return JSONResponse(status_code=exc.status_code, content={"success": False, "message": exc.detail, "detail": exc.detail})
 
 
+@app.exception_handler(HashingBusyError)
+async def hashing_busy_handler(request: Request, exc: HashingBusyError):
+    logger.warning("Fila de senhas cheia [%s %s]", request.method, request.url.path)
+    return JSONResponse(status_code=503, content={"success": False, "message": str(exc)}, headers={"Retry-After": "1"})
+
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
+    return JSONResponse(
+        status_code=429,
+        content={"success": False, "message": str(exc)},
+        headers={"Retry-After": retry_after_header(exc.retry_after)},
+    )
+
+
+@app.exception_handler(StaleVersionError)
+async def stale_version_handler(request: Request, exc: StaleVersionError):
+    logger.info("Atualização com versão desatualizada: %s [%s %s]", exc, request.method, request.url.path)
+    return JSONResponse(
+        status_code=412,
+        content={"success": False, "message": "Registro alterado por outra requisição; recarregue e tente novamente"},
+        headers={"ETag": etag(exc.current_version)},
+    )
+
+
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
-    logger.error(f"Erro não tratado: {str(exc)} [{request.method} {request.url.path}]", exc_info=True)
+    logger.error("Erro não tratado: %s [%s %s]", exc, request.method, request.url.path, exc_info=True)
     return JSONResponse(status_code=500, content={"success": False, "message": "Erro interno do servidor."})
 
 
@@ -0,0 +1,270 @@
+"""Métricas Prometheus da aplicação (`GET /metrics`).
+
+Coleta, com custo de poucos microssegundos por requisição:
+
+- latência e contagem de requisições por rota (o template, ex.
+  `/api/users/{user_id}`, nunca o caminho bruto) e requisições em andamento;
+- consultas SQL por método de repositório (quantidade e duração), via
+  eventos do SQLAlchemy e o método ativo em uma `ContextVar`;
+- conexões do pool em uso;
+- latência de `AppointmentService.check_conflicts`;
+- duração das execuções do agendador e registros alterados por transição;
+- estatísticas já mantidas pelos componentes (cache de principals, pool de
+  criptografia, limitador, revogação), lidas apenas no momento da coleta.
+
+As métricas são por processo. Com vários workers, cada um deve ser coletado
+separadamente (ou usar o modo multiprocesso do `prometheus_client`).
+"""
+import functools
+import inspect
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    ProcessCollector,
+    CONTENT_TYPE_LATEST,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+registry = CollectorRegistry()
+ProcessCollector(registry=registry)
+
+HTTP_METHODS = frozenset(("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"))
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+REQUESTS = Counter(
+    "agenda_http_requests_total", "Requisições HTTP",
+    ["method", "route", "status"], registry=registry,
+)
+REQUEST_LATENCY = Histogram(
+    "agenda_http_request_duration_seconds", "Latência das requisições HTTP",
+    ["method", "route"], buckets=LATENCY_BUCKETS, registry=registry,
+)
+IN_FLIGHT = Gauge(
+    "agenda_http_requests_in_flight", "Requisições HTTP em andamento", registry=registry,
+)
+DB_QUERIES = Counter(
+    "agenda_db_queries_total", "Consultas SQL executadas por operação",
+    ["operation"], registry=registry,
+)
+DB_QUERY_LATENCY = Histogram(
+    "agenda_db_query_duration_seconds", "Duração das consultas SQL por operação",
+    ["operation"], buckets=QUERY_BUCKETS, registry=registry,
+)
+DB_CONNECTIONS_IN_USE = Gauge(
+    "agenda_db_pool_connections_in_use", "Conexões do pool em uso", registry=registry,
+)
+DB_CONNECTION_CHECKOUTS = Counter(
+    "agenda_db_pool_checkouts_total", "Conexões retiradas do pool", registry=registry,
+)
+CONFLICT_CHECK_LATENCY = Histogram(
+    "agenda_conflict_check_duration_seconds", "Latência da verificação de conflitos de agendamento",
+    buckets=QUERY_BUCKETS, registry=registry,
+)
+SCHEDULER_RUN_LATENCY = Histogram(
+    "agenda_scheduler_run_duration_seconds", "Duração das execuções de tarefas periódicas",
+    ["job"], buckets=LATENCY_BUCKETS, registry=registry,
+)
+SCHEDULER_ROWS = Counter(
+    "agenda_scheduler_rows_total", "Registros alterados por tarefas periódicas",
+    ["job", "transition"], registry=registry,
+)
+
+# Filhos já rotulados: `labels()` valida e trava a cada chamada
+_children: Dict[tuple, object] = {}
+
+
+def _child(metric, *labels):
+    key = (metric, labels)
+    child = _children.get(key)
+    if child is None:
+        child = _children[key] = metric.labels(*labels)
+    return child
+
+
+# Método de repositório em execução (rótulo das consultas SQL)
+current_operation: ContextVar[str] = ContextVar("current_operation", default="other")
+
+
+def track_operation(label: str, func: Callable) -> Callable:
+    """Envolve `func` para que suas consultas SQL sejam atribuídas a `label`."""
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            iterator = func(*args, **kwargs)
+            while True:
+                # Cada passo pode rodar em outra thread/contexto (streaming)
+                token = current_operation.set(label)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    current_operation.reset(token)
+                yield item
+        return generator_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        token = current_operation.set(label)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            current_operation.reset(token)
+    return wrapper
+
+
+def instrument_repository(cls):
+    """
+    Decorador de classe: rotula as consultas de cada método público.
+
+    Métodos herdados (ex.: `BaseRepository.get_by_id`) são reenvolvidos na
+    subclasse, para que o rótulo seja `UserRepository.get_by_id`.
+    """
+    for name in dir(cls):
+        if name.startswith("_"):
+            continue
+        attr = inspect.getattr_static(cls, name)
+        label = f"{cls.__name__}.{name}"
+        if isinstance(attr, staticmethod):
+            setattr(cls, name, staticmethod(track_operation(label, attr.__func__)))
+        elif isinstance(attr, classmethod):
+            setattr(cls, name, classmethod(track_operation(label, attr.__func__)))
+    return cls
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_metrics_start", None)
+    if start is None:
+        return
+    operation = current_operation.get()
+    _child(DB_QUERIES, operation).inc()
+    _child(DB_QUERY_LATENCY, operation).observe(time.perf_counter() - start)
+
+
+@event.listens_for(Pool, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_CONNECTIONS_IN_USE.inc()
+    DB_CONNECTION_CHECKOUTS.inc()
+
+
+@event.listens_for(Pool, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    DB_CONNECTIONS_IN_USE.dec()
+
+
+class StatsCollector:
+    """
+    Exporta como gauges os dicionários de `metrics()` dos componentes.
+
+    Valores numéricos viram `agenda_<componente>_<chave>`; dicionários
+    aninhados por nome (ex.: regras do limitador) viram um rótulo `name`.
+
+    Args:
+        component: Nome do componente (prefixo das métricas)
+        source: Função que retorna o dicionário de métricas
+    """
+
+    def __init__(self, component: str, source: Callable[[], dict]):
+        self.component = component
+        self.source = source
+
+    def collect(self) -> Iterable[GaugeMetricFamily]:
+        prefix = f"agenda_{self.component}"
+        labelled: Dict[str, GaugeMetricFamily] = {}
+        for key, value in self.source().items():
+            if isinstance(value, bool):
+                yield GaugeMetricFamily(f"{prefix}_{key}", f"{self.component}: {key}", value=int(value))
+            elif isinstance(value, (int, float)):
+                yield GaugeMetricFamily(f"{prefix}_{key}", f"{self.component}: {key}", value=value)
+            elif isinstance(value, dict):
+                for name, fields in value.items():
+                    if not isinstance(fields, dict):
+                        continue
+                    for field, number in fields.items():
+                        if isinstance(number, (int, float)):
+                            metric = f"{prefix}_{key}_{field}"
+                            if metric not in labelled:
+                                labelled[metric] = GaugeMetricFamily(
+                                    metric, f"{self.component}: {key} {field}", labels=["name"]
+                                )
+                            labelled[metric].add_metric([name], number)
+        yield from labelled.values()
+
+
+def register_stats(component: str, source: Callable[[], dict]) -> None:
+    """Registra um componente cujas estatísticas são lidas a cada coleta."""
+    registry.register(StatsCollector(component, source))
+
+
+def render() -> bytes:
+    """Texto no formato de exposição do Prometheus."""
+    return generate_latest(registry)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mede latência, status e concorrência por rota.
+
+    O rótulo `route` é o template da rota resolvida pelo roteador; para
+    aplicações montadas (ex.: frontend) é o prefixo seguido de `/{path}` e
+    para requisições sem rota, `unmatched`.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        root_path = scope.get("root_path", "")
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            route = route_label(scope, root_path)
+            method = scope["method"] if scope["method"] in HTTP_METHODS else "OTHER"
+            _child(REQUEST_LATENCY, method, route).observe(elapsed)
+            _child(REQUESTS, method, route, str(status_code)).inc()
+
+
+def route_label(scope: Scope, root_path: str) -> str:
+    """Template da rota que atendeu a requisição (após a chamada da aplicação)."""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope and scope.get("root_path", "") != root_path:
+        return scope["root_path"][len(root_path):] + "/{path}"
+    return "unmatched"
+
@@ -1,9 +1,10 @@
 """Modelos de dados da aplicação usando SQLModel."""
 from datetime import datetime, timezone
 from typing import Optional, List
+from sqlalchemy import Index, UniqueConstraint
 from sqlmodel import SQLModel, Field, Relationship
 from pydantic import field_validator
-from backend.enums import UserRole, AppointmentStatus
+from backend.enums import UserRole, AppointmentStatus, ReminderChannel, ReminderStatus, WebhookDeliveryStatus
 
 
 class Room(SQLModel, table=True):
@@ -18,6 +19,7 @@ class Room(SQLModel, table=True):
         active: Indica se a sala está ativa
         created_at: Data de criação
         updated_at: Data da última atualização
+        version: Versão do registro (controle de concorrência otimista, ETag)
     """
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True, unique=True, min_length=1, max_length=100)
@@ -26,6 +28,7 @@ class Room(SQLModel, table=True):
     active: bool = Field(default=True, index=True)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
     
     appointments: List["Appointment"] = Relationship(back_populates="room")
 
@@ -51,6 +54,7 @@ class Patient(SQLModel, table=True):
         active: Indica se o paciente está ativo
         created_at: Data de criação
         updated_at: Data da última atualização
+        version: Versão do registro (controle de concorrência otimista, ETag)
     """
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True, min_length=1, max_length=200)
@@ -62,6 +66,7 @@ class Patient(SQLModel, table=True):
     active: bool = Field(default=True, index=True)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
     
     appointments: List["Appointment"] = Relationship(back_populates="patient")
 
@@ -86,6 +91,7 @@ class User(SQLModel, table=True):
         is_active: Indica se o usuário está ativo
         created_at: Data de criação
         updated_at: Data da última atualização
+        version: Versão do registro (controle de concorrência otimista, ETag)
     """
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True, min_length=1, max_length=200)
@@ -95,6 +101,7 @@ class User(SQLModel, table=True):
     is_active: bool = Field(default=True, index=True)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
 
     @field_validator("name")
     def name_must_not_be_empty(cls, v):
@@ -124,24 +131,38 @@ class Appointment(SQLModel, table=True):
         is_deleted: Indica soft delete
         created_at: Data de criação
         updated_at: Data da última atualização
+        version: Versão do registro (controle de concorrência otimista, ETag)
         room_id: ID da sala
         patient_id: ID do paciente
         student_id: ID do estagiário
         supervisor_id: ID do supervisor
+
+    Os filtros por sala, paciente, estagiário, supervisor e status usam
+    índices compostos (coluna, start_dt): a igualdade (ou lista IN) e o
+    período são resolvidos no mesmo índice, já na ordem de `start_dt`.
     """
+    __table_args__ = (
+        Index("ix_appointment_room_start", "room_id", "start_dt"),
+        Index("ix_appointment_patient_start", "patient_id", "start_dt"),
+        Index("ix_appointment_student_start", "student_id", "start_dt"),
+        Index("ix_appointment_supervisor_start", "supervisor_id", "start_dt"),
+        Index("ix_appointment_status_start", "status", "start_dt"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     start_dt: datetime = Field(index=True)
     end_dt: datetime = Field(index=True)
-    status: AppointmentStatus = Field(default=AppointmentStatus.SCHEDULED, index=True)
+    status: AppointmentStatus = Field(default=AppointmentStatus.SCHEDULED)
     notes: Optional[str] = Field(default=None, max_length=1000)
-    is_deleted: bool = Field(default=False, index=True)
+    is_deleted: bool = Field(default=False)
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    version: int = Field(default=1, sa_column_kwargs={"server_default": "1"})
 
-    room_id: Optional[int] = Field(default=None, foreign_key="room.id", index=True)
-    patient_id: Optional[int] = Field(default=None, foreign_key="patient.id", index=True)
-    student_id: Optional[int] = Field(default=None, foreign_key="user.id", index=True)
-    supervisor_id: Optional[int] = Field(default=None, foreign_key="user.id", index=True)
+    room_id: Optional[int] = Field(default=None, foreign_key="room.id")
+    patient_id: Optional[int] = Field(default=None, foreign_key="patient.id")
+    student_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    supervisor_id: Optional[int] = Field(default=None, foreign_key="user.id")
 
     room: Optional[Room] = Relationship(back_populates="appointments")
     patient: Optional[Patient] = Relationship(back_populates="appointments")
@@ -154,3 +175,119 @@ class Appointment(SQLModel, table=True):
         return v
 
 
+class Reminder(SQLModel, table=True):
+    """
+    Lembrete de consulta na fila de envio (outbox).
+
+    Um por agendamento e canal. O destinatário é lido do paciente no momento
+    do envio; o despacho só percorre o índice (status, next_attempt_at), sem
+    varrer os agendamentos.
+
+    Attributes:
+        id: Identificador único
+        appointment_id: ID do agendamento
+        channel: Canal (email, sms)
+        due_at: Quando enviar (início do agendamento menos a antecedência)
+        status: Situação na fila
+        attempts: Tentativas de envio feitas
+        next_attempt_at: Próxima tentativa (ou fim da reserva, se enviando)
+        last_error: Erro da última tentativa
+        sent_at: Data do envio
+        created_at: Data de criação
+        updated_at: Data da última atualização
+    """
+    __table_args__ = (
+        UniqueConstraint("appointment_id", "channel", name="uq_reminder_appointment_channel"),
+        Index("ix_reminder_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    appointment_id: int = Field(foreign_key="appointment.id")
+    channel: ReminderChannel
+    due_at: datetime
+    status: ReminderStatus = Field(default=ReminderStatus.PENDING)
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime
+    last_error: Optional[str] = Field(default=None, max_length=500)
+    sent_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class SchedulerLease(SQLModel, table=True):
+    """
+    Concessão de uma tarefa periódica entre workers.
+
+    Apenas o worker que detém a concessão executa a tarefa; ele a renova a
+    cada execução e, se parar, outro assume quando `expires_at` passa.
+
+    Attributes:
+        name: Nome da tarefa
+        owner: Worker que detém a concessão (host:pid:aleatório)
+        expires_at: Fim da concessão
+    """
+    name: str = Field(primary_key=True, max_length=50)
+    owner: str = Field(max_length=100)
+    expires_at: datetime
+
+
+class WebhookSubscription(SQLModel, table=True):
+    """
+    Assinatura de webhook de um sistema externo.
+
+    Attributes:
+        id: Identificador único
+        url: Endpoint que recebe os eventos (POST JSON)
+        secret: Chave da assinatura HMAC-SHA256 das entregas
+        events: Eventos assinados, separados por vírgula ("*" = todos)
+        description: Descrição (ex.: nome do sistema)
+        active: Indica se recebe novos eventos
+        created_at: Data de criação
+        updated_at: Data da última atualização
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    url: str = Field(max_length=500)
+    secret: str = Field(max_length=100)
+    events: str = Field(default="*", max_length=500)
+    description: Optional[str] = Field(default=None, max_length=200)
+    active: bool = Field(default=True)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class WebhookDelivery(SQLModel, table=True):
+    """
+    Entrega de um evento a uma assinatura (outbox transacional).
+
+    As linhas são gravadas por gatilhos (`outbox.py`) na mesma transação da
+    alteração do agendamento, já com o corpo do evento; o despacho só
+    percorre o índice (status, next_attempt_at).
+
+    Attributes:
+        id: Identificador único (também o ID do evento para o receptor)
+        subscription_id: ID da assinatura
+        event: Nome do evento (ex.: appointment.booked)
+        payload: Dados do evento em JSON
+        status: Situação na fila (`dead` após esgotar as tentativas)
+        attempts: Tentativas de entrega feitas
+        next_attempt_at: Próxima tentativa (ou fim da reserva, se enviando)
+        last_error: Erro da última tentativa
+        response_status: Status HTTP da última resposta
+        delivered_at: Data da entrega
+        created_at: Data do evento
+    """
+    __table_args__ = (
+        Index("ix_webhookdelivery_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    subscription_id: int = Field(foreign_key="webhooksubscription.id")
+    event: str = Field(max_length=50)
+    payload: str
+    status: WebhookDeliveryStatus = Field(default=WebhookDeliveryStatus.PENDING)
+    attempts: int = Field(default=0)
+    next_attempt_at: datetime
+    last_error: Optional[str] = Field(default=None, max_length=500)
+    response_status: Optional[int] = None
+    delivered_at: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
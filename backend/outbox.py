@@ -0,0 +1,86 @@
+"""Eventos de agendamento gravados na fila de webhooks (outbox transacional).
+
+Gatilhos na tabela `appointment` inserem, na mesma transação da alteração,
+uma linha em `webhookdelivery` para cada assinatura ativa do evento. Assim
+toda escrita gera seus eventos — rotas, transições do agendador e
+atualizações em lote —, nenhum evento é gravado sem a alteração (ou
+perdido com ela confirmada) e a requisição não faz nenhuma chamada de rede:
+sem assinaturas, o custo é uma busca vazia na tabela de assinaturas.
+
+Eventos:
+
+- `appointment.booked`: agendamento criado;
+- `appointment.cancelled`: status passou a `cancelled`;
+- `appointment.completed`: status passou a `completed`;
+- `appointment.deleted`: agendamento removido (soft delete).
+
+Os gatilhos são (re)criados junto com `SQLModel.metadata.create_all`.
+"""
+from sqlalchemy import event
+from sqlmodel import SQLModel
+
+from .enums import AppointmentStatus, WebhookDeliveryStatus
+
+# Evento -> (momento do gatilho, condição sobre a linha)
+EVENTS = {
+    "appointment.booked": ("AFTER INSERT", "NOT new.is_deleted"),
+    "appointment.cancelled": (
+        "AFTER UPDATE OF status",
+        f"new.status = '{AppointmentStatus.CANCELLED.name}' AND old.status != '{AppointmentStatus.CANCELLED.name}'",
+    ),
+    "appointment.completed": (
+        "AFTER UPDATE OF status",
+        f"new.status = '{AppointmentStatus.COMPLETED.name}' AND old.status != '{AppointmentStatus.COMPLETED.name}'",
+    ),
+    "appointment.deleted": ("AFTER UPDATE OF is_deleted", "new.is_deleted AND NOT old.is_deleted"),
+}
+
+# Mesmo formato gravado pelo SQLAlchemy (microssegundos), comparável às
+# datas passadas como parâmetro
+_NOW = "strftime('%Y-%m-%d %H:%M:%f', 'now') || '000'"
+
+
+def _iso(column: str) -> str:
+    """Data gravada em ISO 8601, como na API (sem microssegundos zerados)."""
+    return f"replace(replace({column}, '.000000', ''), ' ', 'T')"
+
+
+_PAYLOAD = (
+    "json_object("
+    "'id', new.id, "
+    f"'start_dt', {_iso('new.start_dt')}, "
+    f"'end_dt', {_iso('new.end_dt')}, "
+    "'status', lower(new.status), "
+    "'room_id', new.room_id, "
+    "'patient_id', new.patient_id, "
+    "'student_id', new.student_id, "
+    "'supervisor_id', new.supervisor_id)"
+)
+
+
+def trigger_name(event_name: str) -> str:
+    return "webhook_" + event_name.replace(".", "_")
+
+
+def trigger_ddl(event_name: str) -> str:
+    """Gatilho que enfileira `event_name` para as assinaturas ativas."""
+    timing, condition = EVENTS[event_name]
+    return (
+        f"CREATE TRIGGER {trigger_name(event_name)} {timing} ON appointment "
+        f"WHEN {condition} BEGIN "
+        "INSERT INTO webhookdelivery (subscription_id, event, payload, status, attempts, next_attempt_at, created_at) "
+        f"SELECT id, '{event_name}', {_PAYLOAD}, '{WebhookDeliveryStatus.PENDING.name}', 0, {_NOW}, {_NOW} "
+        "FROM webhooksubscription "
+        f"WHERE active AND (events = '*' OR instr(',' || events || ',', ',{event_name},') > 0); "
+        "END"
+    )
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def _create_triggers(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    # Recriados para que uma atualização de esquema aplique a versão atual
+    for event_name in EVENTS:
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger_name(event_name)}")
+        connection.exec_driver_sql(trigger_ddl(event_name))
@@ -0,0 +1,234 @@
+"""Criptografia de senhas em um pool de processos limitado.
+
+O pbkdf2 consome CPU por dezenas de milissegundos. Executado na thread da
+requisição, um pico de logins ocupa o threadpool do servidor e atrasa
+leituras que nada têm a ver com autenticação. Aqui o trabalho vai para um
+`ProcessPoolExecutor` dedicado e o número de operações pendentes é limitado:
+quando a fila está cheia a operação é recusada imediatamente
+(`HashingBusyError`) em vez de prender mais threads.
+
+A importação em massa (`hash_many`) usa o mesmo pool em lotes pequenos, com
+no máximo um lote por processo em andamento: logins concorrentes entram na
+fila entre os lotes e importações simultâneas não multiplicam processos.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from passlib.context import CryptContext
+
+from .logger import logger
+
+
+class HashingBusyError(Exception):
+    """Fila de criptografia de senhas cheia."""
+
+
+def build_context(rounds: int) -> CryptContext:
+    """
+    Cria o contexto de hashing com o fator de trabalho informado.
+
+    Hashes com menos rounds que `rounds` são considerados desatualizados
+    (`needs_update`) e podem ser regerados no próximo login.
+
+    Args:
+        rounds: Número de iterações do pbkdf2_sha256
+
+    Returns:
+        Contexto do passlib
+    """
+    return CryptContext(
+        schemes=["pbkdf2_sha256"],
+        deprecated="auto",
+        pbkdf2_sha256__default_rounds=rounds,
+        pbkdf2_sha256__min_rounds=rounds,
+    )
+
+
+# Contextos por fator de trabalho, reaproveitados dentro de cada processo
+_contexts: Dict[int, CryptContext] = {}
+
+
+def _context_for(rounds: int) -> CryptContext:
+    context = _contexts.get(rounds)
+    if context is None:
+        context = _contexts[rounds] = build_context(rounds)
+    return context
+
+
+def _lower_worker_priority(niceness: int) -> None:
+    """Reduz a prioridade do worker para não disputar CPU com as requisições."""
+    if niceness and hasattr(os, "nice"):
+        os.nice(niceness)
+
+
+def hash_with_rounds(password: str, rounds: int) -> str:
+    """Gera o hash da senha no processo atual (usado pelos workers)."""
+    return _context_for(rounds).hash(password)
+
+
+def hash_many_with_rounds(passwords: Sequence[str], rounds: int) -> List[str]:
+    """Gera os hashes de um lote de senhas no processo atual (usado pelos workers)."""
+    context = _context_for(rounds)
+    return [context.hash(password) for password in passwords]
+
+
+def verify_with_rounds(password: str, hashed_password: str, rounds: int) -> bool:
+    """Verifica a senha no processo atual (usado pelos workers)."""
+    return _context_for(rounds).verify(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    Executor limitado para hash e verificação de senhas.
+
+    Args:
+        rounds: Fator de trabalho do pbkdf2_sha256
+        workers: Processos do pool (0 executa na própria thread)
+        max_pending: Máximo de operações em andamento ou na fila
+        niceness: Incremento de `nice` aplicado aos processos do pool
+    """
+
+    def __init__(self, rounds: int, workers: int, max_pending: int, niceness: int = 0):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.niceness = niceness
+        self.context = build_context(rounds)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_seconds = 0.0
+        self._max_seconds = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=_lower_worker_priority,
+                    initargs=(self.niceness,),
+                )
+                logger.info("Pool de criptografia iniciado com %d processos", self.workers)
+            return self._executor
+
+    def _acquire(self, timeout: Optional[float] = None) -> float:
+        """Ocupa uma vaga da fila (sem esperar, ou até `timeout`); retorna o início."""
+        acquired = self._slots.acquire(timeout=timeout) if timeout else self._slots.acquire(blocking=False)
+        if not acquired:
+            with self._lock:
+                self._rejected += 1
+            raise HashingBusyError("Servidor ocupado processando senhas. Tente novamente.")
+        with self._lock:
+            self._pending += 1
+        return time.perf_counter()
+
+    def _release(self, start: float) -> None:
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+            self._total_seconds += elapsed
+            self._max_seconds = max(self._max_seconds, elapsed)
+        self._slots.release()
+
+    def _run(self, func: Callable, *args, timeout: Optional[float] = None):
+        start = self._acquire(timeout)
+        try:
+            if self.workers == 0:
+                return func(*args)
+            return self._get_executor().submit(func, *args).result()
+        finally:
+            self._release(start)
+
+    def hash(self, password: str) -> str:
+        """Gera o hash da senha no pool."""
+        return self._run(hash_with_rounds, password, self.rounds)
+
+    def hash_many(self, passwords: Sequence[str], chunk_size: int = 16, timeout: float = 30) -> List[str]:
+        """
+        Gera os hashes de várias senhas (importação em massa) no pool.
+
+        Cada lote de `chunk_size` senhas ocupa uma vaga da fila; há no
+        máximo `workers` lotes em andamento. Com a fila cheia, espera até
+        `timeout` segundos por vaga em vez de recusar de imediato.
+
+        Returns:
+            Hashes na ordem das senhas
+
+        Raises:
+            HashingBusyError: Se não houver vaga dentro de `timeout`
+        """
+        chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+        if self.workers == 0:
+            return [
+                hashed
+                for chunk in chunks
+                for hashed in self._run(hash_many_with_rounds, chunk, self.rounds, timeout=timeout)
+            ]
+
+        hashes: List[str] = []
+        in_flight: Deque[Tuple[Future, float]] = deque()
+
+        def collect() -> None:
+            future, start = in_flight.popleft()
+            try:
+                hashes.extend(future.result())
+            finally:
+                self._release(start)
+
+        try:
+            for chunk in chunks:
+                if len(in_flight) >= self.workers:
+                    collect()
+                start = self._acquire(timeout)
+                try:
+                    future = self._get_executor().submit(hash_many_with_rounds, chunk, self.rounds)
+                except BaseException:
+                    self._release(start)
+                    raise
+                in_flight.append((future, start))
+            while in_flight:
+                collect()
+        finally:
+            # Erro no meio: libera as vagas dos lotes ainda em andamento
+            for future, start in in_flight:
+                future.cancel()
+                self._release(start)
+        return hashes
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """Verifica a senha no pool."""
+        return self._run(verify_with_rounds, password, hashed_password, self.rounds)
+
+    def needs_update(self, hashed_password: str) -> bool:
+        """Indica se o hash usa um fator de trabalho inferior ao atual."""
+        return self.context.needs_update(hashed_password)
+
+    def metrics(self) -> dict:
+        """Retorna métricas de fila e duração das operações."""
+        with self._lock:
+            completed = self._completed
+            return {
+                "workers": self.workers,
+                "rounds": self.rounds,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "completed": completed,
+                "rejected": self._rejected,
+                "avg_ms": round(self._total_seconds / completed * 1000, 2) if completed else 0.0,
+                "max_ms": round(self._max_seconds * 1000, 2),
+            }
+
+    def shutdown(self) -> None:
+        """Encerra o pool de processos, se iniciado."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
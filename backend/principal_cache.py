@@ -0,0 +1,126 @@
+"""Cache em memória dos usuários autenticados (principals) por token.
+
+Um token já validado não precisa ter a assinatura verificada de novo nem o
+usuário recarregado do banco a cada requisição. As entradas expiram no que
+vier primeiro: a expiração do próprio token ou o TTL configurado, e são
+removidas quando o papel, o status ou o email do usuário mudam. As claims
+do token ficam junto do usuário para que a revogação (logout, família
+reusada) seja conferida também nos acertos do cache.
+
+O cache é por processo; com vários workers o TTL limita por quanto tempo uma
+alteração feita em outro worker pode não ser percebida.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+from .models import User
+
+
+class PrincipalCache:
+    """
+    Cache LRU com TTL de usuários autenticados, indexado pelo token.
+
+    Args:
+        ttl_seconds: Tempo máximo de vida de uma entrada
+        max_entries: Número máximo de tokens mantidos
+    """
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, dict, dict]]" = OrderedDict()
+        self._tokens_by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, token: str) -> Optional[Tuple[User, dict]]:
+        """
+        Retorna uma cópia do usuário associado ao token, se ainda válido.
+
+        Args:
+            token: JWT recebido na requisição
+
+        Returns:
+            (usuário não associado a nenhuma sessão, claims do token) ou None
+        """
+        if self.ttl_seconds <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._remove(token)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self._hits += 1
+            data, payload = entry[1], entry[2]
+        return User(**data), payload
+
+    def put(self, token: str, user: User, payload: dict) -> None:
+        """
+        Armazena o usuário autenticado pelo token.
+
+        Args:
+            token: JWT já validado
+            user: Usuário carregado do banco
+            payload: Claims decodificadas do token
+        """
+        if self.ttl_seconds <= 0:
+            return
+        ttl = self.ttl_seconds
+        token_exp = payload.get("exp")
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+        if ttl <= 0:
+            return
+        data = user.model_dump()
+        with self._lock:
+            self._remove(token)
+            self._entries[token] = (time.monotonic() + ttl, data, payload)
+            self._tokens_by_user.setdefault(data["id"], set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_token(self, token: str) -> None:
+        """Remove a entrada de um token."""
+        with self._lock:
+            self._remove(token)
+
+    def invalidate_user(self, user_id: int) -> None:
+        """Remove todas as entradas de um usuário."""
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(token)
+
+    def clear(self) -> None:
+        """Remove todas as entradas."""
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def metrics(self) -> dict:
+        """Retorna tamanho e taxa de acerto do cache."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _remove(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        user_id = entry[1]["id"]
+        tokens = self._tokens_by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user_id]
@@ -0,0 +1,408 @@
+"""Profiling sob demanda de requisições.
+
+Desativado por padrão (`PROFILING_ENABLED`): sem o middleware e sem os
+endpoints envolvidos não há nenhum custo por requisição.
+
+Quando ativado:
+
+- um administrador pode pedir o profile de uma requisição com o cabeçalho
+  `X-Profile: cprofile|sample` (ou `?profile=cprofile|sample`). O resultado
+  fica guardado e o id volta no cabeçalho `X-Profile-Id`;
+- com `PROFILING_SAMPLE_RATE > 0`, uma fração das requisições é perfilada
+  com cProfile e os `PROFILING_SLOWEST_PER_ROUTE` perfis mais lentos de cada
+  rota são mantidos.
+
+Modos:
+
+- `cprofile`: determinístico, exportado no formato do `pstats` (.prof) ou
+  como texto;
+- `sample`: amostragem de pilhas a cada `PROFILING_SAMPLE_INTERVAL_MS`,
+  exportada em JSON do speedscope (https://www.speedscope.app).
+
+Endpoints síncronos rodam no threadpool; `instrument_endpoints` envolve cada
+um para que a thread do worker também seja perfilada. Apenas um profile
+roda por vez; pedidos simultâneos seguem sem profiling.
+"""
+import cProfile
+import functools
+import heapq
+import inspect
+import io
+import itertools
+import json
+import marshal
+import pstats
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi import FastAPI, HTTPException
+from fastapi.routing import APIRoute
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import get_settings
+from .database import engine as default_engine
+from .enums import UserRole
+from .logger import logger
+from .metrics import route_label
+from .security import resolve_principal
+
+settings = get_settings()
+
+CPROFILE = "cprofile"
+SAMPLE = "sample"
+MODES = (CPROFILE, SAMPLE)
+PROFILE_ID_HEADER = b"x-profile-id"
+
+# Profile em andamento (propagado às threads do threadpool pelo contexto)
+_active_session: ContextVar[Optional["ProfileSession"]] = ContextVar("active_profile", default=None)
+
+
+class StackSampler(threading.Thread):
+    """
+    Amostra periodicamente as pilhas das threads registradas.
+
+    Args:
+        interval: Intervalo entre amostras em segundos
+    """
+
+    def __init__(self, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.idents: set = set()
+        self.stacks: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            for ident in list(self.idents):
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[tuple(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class ProfileSession:
+    """Profile de uma requisição, possivelmente em mais de uma thread."""
+
+    def __init__(self, mode: str, sample_interval: float):
+        self.mode = mode
+        self.sample_interval = sample_interval
+        self._profilers: List[cProfile.Profile] = []
+        self._sampler = StackSampler(sample_interval) if mode == SAMPLE else None
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._sampler is not None:
+            self._sampler.start()
+
+    def attach(self) -> Callable[[], None]:
+        """Passa a perfilar a thread atual; retorna a função que encerra."""
+        if self._sampler is not None:
+            ident = threading.get_ident()
+            self._sampler.idents.add(ident)
+            return lambda: self._sampler.idents.discard(ident)
+        profiler = cProfile.Profile()
+        with self._lock:
+            self._profilers.append(profiler)
+        profiler.enable()
+        return profiler.disable
+
+    def finish(self, name: str) -> bytes:
+        """Encerra o profile e serializa no formato do modo."""
+        if self._sampler is not None:
+            self._sampler.stop()
+            return speedscope_json(name, self._sampler.stacks, self.sample_interval)
+        stats = pstats.Stats(self._profilers[0])
+        for profiler in self._profilers[1:]:
+            stats.add(profiler)
+        return marshal.dumps(stats.stats)
+
+
+def speedscope_json(name: str, stacks: Counter, interval: float) -> bytes:
+    """Converte pilhas amostradas para o formato de arquivo do speedscope."""
+    frames: List[dict] = []
+    index: Dict[Tuple[str, str, int], int] = {}
+    samples, weights = [], []
+    interval_ms = interval * 1000
+    for stack, count in stacks.items():
+        sample = []
+        for frame in stack:
+            position = index.get(frame)
+            if position is None:
+                position = index[frame] = len(frames)
+                frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            sample.append(position)
+        samples.append(sample)
+        weights.append(count * interval_ms)
+    document = {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+        "exporter": "agendamento-backend",
+    }
+    return json.dumps(document).encode("utf-8")
+
+
+def pstats_text(data: bytes, limit: int = 40) -> str:
+    """Resumo em texto (ordenado por tempo acumulado) de um profile cProfile."""
+
+    class _Loaded:
+        def create_stats(self):
+            pass
+
+    loaded = _Loaded()
+    loaded.stats = marshal.loads(data)
+    output = io.StringIO()
+    pstats.Stats(loaded, stream=output).sort_stats("cumulative").print_stats(limit)
+    return output.getvalue()
+
+
+class ProfileRecord:
+    """Profile armazenado."""
+
+    __slots__ = ("id", "method", "route", "path", "mode", "trigger", "duration_ms", "created_at", "data")
+
+    def __init__(self, method, route, path, mode, trigger, duration_ms, data, profile_id=None):
+        self.id = profile_id or uuid.uuid4().hex[:12]
+        self.method = method
+        self.route = route
+        self.path = path
+        self.mode = mode
+        self.trigger = trigger
+        self.duration_ms = duration_ms
+        self.created_at = datetime.now(timezone.utc)
+        self.data = data
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "route": self.route,
+            "path": self.path,
+            "mode": self.mode,
+            "trigger": self.trigger,
+            "duration_ms": round(self.duration_ms, 2),
+            "created_at": self.created_at.isoformat(),
+        }
+
+
+class ProfileStore:
+    """
+    Profiles mantidos em memória.
+
+    Args:
+        slowest_per_route: Profiles amostrados mantidos por rota (os mais lentos)
+        max_on_demand: Profiles sob demanda mantidos (os mais recentes)
+    """
+
+    def __init__(self, slowest_per_route: int, max_on_demand: int):
+        self.slowest_per_route = slowest_per_route
+        self._on_demand: deque = deque(maxlen=max_on_demand)
+        self._slowest: Dict[str, List[Tuple[float, int, ProfileRecord]]] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def add_on_demand(self, record: ProfileRecord) -> None:
+        with self._lock:
+            self._on_demand.append(record)
+
+    def offer_sampled(self, record: ProfileRecord) -> None:
+        """Mantém o profile se estiver entre os mais lentos da rota."""
+        key = f"{record.method} {record.route}"
+        entry = (record.duration_ms, next(self._counter), record)
+        with self._lock:
+            heap = self._slowest.setdefault(key, [])
+            if len(heap) < self.slowest_per_route:
+                heapq.heappush(heap, entry)
+            elif entry[0] > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+
+    def _records(self) -> List[ProfileRecord]:
+        records = list(self._on_demand)
+        for heap in self._slowest.values():
+            records.extend(entry[2] for entry in heap)
+        return records
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            records = self._records()
+        return [record.summary() for record in sorted(records, key=lambda r: r.duration_ms, reverse=True)]
+
+    def get(self, profile_id: str) -> Optional[ProfileRecord]:
+        with self._lock:
+            for record in self._records():
+                if record.id == profile_id:
+                    return record
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._on_demand.clear()
+            self._slowest.clear()
+
+
+profile_store = ProfileStore(
+    slowest_per_route=settings.PROFILING_SLOWEST_PER_ROUTE,
+    max_on_demand=settings.PROFILING_MAX_ON_DEMAND,
+)
+
+
+def _header(scope: Scope, name: bytes) -> Optional[str]:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def requested_mode(scope: Scope) -> Optional[str]:
+    """Modo pedido na requisição (cabeçalho ou query string), se válido."""
+    mode = _header(scope, b"x-profile")
+    if mode is None and b"profile=" in scope.get("query_string", b""):
+        mode = parse_qs(scope["query_string"].decode("latin-1")).get("profile", [None])[0]
+    return mode if mode in MODES else None
+
+
+def is_admin(scope: Scope, engine) -> bool:
+    """Se o token Bearer da requisição é de um administrador (papel atual do usuário, como em `require_admin`)."""
+    authorization = _header(scope, b"authorization") or ""
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        with Session(engine) as session:
+            user = resolve_principal(session, token)
+    except HTTPException:
+        return False
+    return user.role == UserRole.ADMIN
+
+
+class ProfilingMiddleware:
+    """
+    Middleware ASGI que perfila requisições pedidas ou amostradas.
+
+    Args:
+        app: Aplicação ASGI interna
+        store: Onde os profiles são guardados
+        sample_rate: Fração das requisições perfiladas automaticamente
+        sample_interval_ms: Intervalo do modo `sample`
+        engine: Engine usada para conferir o papel de quem pede o profile
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: ProfileStore,
+        sample_rate: float = 0.0,
+        sample_interval_ms: float = 2.0,
+        engine=None,
+    ):
+        self.app = app
+        self.store = store
+        self.engine = engine or default_engine
+        self.sample_rate = sample_rate
+        self.sample_interval = sample_interval_ms / 1000.0
+        self._busy = threading.Lock()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = requested_mode(scope)
+        if mode is not None and not await run_in_threadpool(is_admin, scope, self.engine):
+            mode = None
+        trigger = "on_demand"
+        if mode is None and self.sample_rate and random.random() < self.sample_rate:
+            mode, trigger = CPROFILE, "sampled"
+        if mode is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        root_path = scope.get("root_path", "")
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and trigger == "on_demand":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER, profile_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        session = ProfileSession(mode, self.sample_interval)
+        token = _active_session.set(session)
+        session.start()
+        detach = session.attach()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            detach()
+            duration_ms = (time.perf_counter() - start) * 1000
+            _active_session.reset(token)
+            route = route_label(scope, root_path)
+            try:
+                data = session.finish(f"{scope['method']} {scope['path']}")
+            finally:
+                self._busy.release()
+            record = ProfileRecord(
+                scope["method"], route, scope["path"], mode, trigger, duration_ms, data, profile_id
+            )
+            if trigger == "on_demand":
+                self.store.add_on_demand(record)
+                logger.info("Profile %s (%s) de %s %s: %.1fms", profile_id, mode, scope["method"], scope["path"], duration_ms)
+            else:
+                self.store.offer_sampled(record)
+
+
+def _profiled_endpoint(func: Callable) -> Callable:
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        session = _active_session.get()
+        if session is None:
+            return func(*args, **kwargs)
+        detach = session.attach()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            detach()
+    wrapper.__profiled__ = True
+    return wrapper
+
+
+def instrument_endpoints(app: FastAPI) -> None:
+    """Envolve endpoints síncronos para perfilar também a thread do threadpool."""
+    for route in app.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        call = route.dependant.call
+        if getattr(call, "__profiled__", False) or inspect.iscoroutinefunction(call):
+            continue
+        # Lido a cada requisição por fastapi.routing.run_endpoint_function
+        route.dependant.call = _profiled_endpoint(call)
@@ -0,0 +1,204 @@
+"""Log de consultas lentas e orçamento de consultas por requisição.
+
+Os eventos do SQLAlchemy medem cada comando SQL e o atribuem à requisição
+em andamento (uma `ContextVar` preenchida por `QueryBudgetMiddleware`):
+
+- comandos acima de `SLOW_QUERY_MS` são registrados com a quantidade e os
+  tipos dos parâmetros (os valores só com `SLOW_QUERY_LOG_PARAMS`, pois
+  incluem dados pessoais e hashes de senha) e, no SQLite, com a saída de
+  `EXPLAIN QUERY PLAN`;
+- requisições que executam mais de `QUERY_BUDGET` comandos (típico de N+1)
+  recebem o cabeçalho `X-Query-Budget-Exceeded` e geram um aviso no log.
+
+Nos testes, `capture_queries()` registra os comandos executados por
+qualquer thread enquanto o bloco estiver ativo::
+
+    with capture_queries() as queries:
+        client.get("/api/rooms")
+    assert queries.count == 1
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import get_settings
+from .logger import logger
+from .metrics import current_operation
+
+settings = get_settings()
+
+BUDGET_HEADER = b"x-query-budget-exceeded"
+MAX_PARAMS_LENGTH = 500
+
+
+class QueryStats:
+    """
+    Comandos SQL executados em uma requisição ou bloco de teste.
+
+    Args:
+        label: Identificação (ex.: "GET /api/appointments")
+        keep_statements: Guarda o texto e a duração de cada comando
+    """
+
+    __slots__ = ("label", "count", "seconds", "statements")
+
+    def __init__(self, label: str = "", keep_statements: bool = False):
+        self.label = label
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Optional[List[Tuple[str, float]]] = [] if keep_statements else None
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.count += 1
+        self.seconds += elapsed
+        if self.statements is not None:
+            self.statements.append((statement, elapsed))
+
+
+class QueryLogger:
+    """
+    Configuração do log de consultas lentas.
+
+    Args:
+        slow_query_ms: Limite (ms) para registrar um comando (0 desativa)
+        explain: Inclui `EXPLAIN QUERY PLAN` no registro (SQLite)
+        log_parameters: Registra os valores dos parâmetros (depuração)
+    """
+
+    def __init__(self, slow_query_ms: float, explain: bool, log_parameters: bool = False):
+        self.slow_query_seconds = slow_query_ms / 1000.0
+        self.explain = explain
+        self.log_parameters = log_parameters
+
+    def log_slow(self, conn, cursor, statement: str, parameters, elapsed: float, executemany: bool) -> None:
+        request = _request_stats.get()
+        origin = request.label if request is not None else "fora de requisição"
+        if self.log_parameters:
+            params = repr(parameters)
+            if len(params) > MAX_PARAMS_LENGTH:
+                params = params[:MAX_PARAMS_LENGTH] + "..."
+        else:
+            params = describe_parameters(parameters, executemany)
+        plan = ""
+        if self.explain and not executemany and conn.dialect.name == "sqlite":
+            plan = _explain_sqlite(cursor, statement, parameters)
+        logger.warning(
+            f"Consulta lenta ({elapsed * 1000:.2f}ms) [{origin} | {current_operation.get()}]: "
+            f"{statement} | parâmetros={params}{plan}"
+        )
+
+
+def _describe(values) -> str:
+    values = list(values.values() if isinstance(values, dict) else values or ())
+    types = Counter(type(value).__name__ for value in values)
+    return f"{len(values)} [" + ", ".join(
+        name if count == 1 else f"{name}x{count}" for name, count in types.items()
+    ) + "]"
+
+
+def describe_parameters(parameters, executemany: bool) -> str:
+    """Quantidade e tipos dos parâmetros, sem os valores (ex.: `3 [int, strx2]`)."""
+    if executemany:
+        rows = list(parameters or ())
+        return f"{len(rows)} linhas de " + (_describe(rows[0]) if rows else "0 []")
+    return _describe(parameters)
+
+
+def _explain_sqlite(cursor, statement: str, parameters) -> str:
+    """Plano de execução pelo cursor DBAPI (não dispara os eventos do SQLAlchemy)."""
+    if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+        return ""
+    try:
+        rows = cursor.connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ()).fetchall()
+    except Exception as e:
+        return f" | plano indisponível: {e}"
+    return " | plano: " + "; ".join(str(row[-1]) for row in rows)
+
+
+query_logger = QueryLogger(settings.SLOW_QUERY_MS, settings.SLOW_QUERY_EXPLAIN, settings.SLOW_QUERY_LOG_PARAMS)
+
+# Requisição em andamento e capturas ativas (testes)
+_request_stats: ContextVar[Optional[QueryStats]] = ContextVar("request_query_stats", default=None)
+_captures: List[QueryStats] = []
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_log_start = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_query_log_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed)
+    for capture in _captures:
+        capture.record(statement, elapsed)
+    threshold = query_logger.slow_query_seconds
+    if threshold and elapsed >= threshold:
+        query_logger.log_slow(conn, cursor, statement, parameters, elapsed, executemany)
+
+
+@contextmanager
+def capture_queries() -> Iterator[QueryStats]:
+    """Registra todos os comandos SQL executados enquanto o bloco estiver ativo."""
+    stats = QueryStats("captura", keep_statements=True)
+    _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        _captures.remove(stats)
+
+
+class QueryBudgetMiddleware:
+    """
+    Middleware ASGI que conta os comandos SQL de cada requisição.
+
+    Acima do orçamento, adiciona `X-Query-Budget-Exceeded: count=N; budget=M`
+    à resposta e registra um aviso com a contagem e o tempo total em SQL.
+
+    Args:
+        app: Aplicação ASGI interna
+        budget: Máximo de comandos por requisição (0 apenas conta)
+    """
+
+    def __init__(self, app: ASGIApp, budget: int):
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(f"{scope['method']} {scope['path']}")
+        token = _request_stats.set(stats)
+        budget = self.budget
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and budget and stats.count > budget:
+                headers = list(message.get("headers", []))
+                headers.append((BUDGET_HEADER, f"count={stats.count}; budget={budget}".encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            if budget and stats.count > budget:
+                logger.warning(
+                    f"Orçamento de consultas excedido [{stats.label}]: "
+                    f"{stats.count} comandos (limite {budget}), {stats.seconds * 1000:.1f}ms em SQL"
+                )
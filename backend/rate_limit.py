@@ -0,0 +1,307 @@
+"""Limitação de taxa (token bucket) para autenticação e escrita.
+
+Login, registro e criação de usuários calculam hashes de senha caros; sem
+limite, um único cliente consegue saturar a CPU. Cada regra define um balde
+por chave (IP ou conta): o balde comporta `burst` requisições e é
+reabastecido continuamente a `per_minute` fichas por minuto. Sem fichas, a
+requisição é recusada com 429 e `Retry-After`.
+
+O armazenamento dos baldes é plugável:
+
+- `MemoryRateLimitStore`: por processo, LRU com tamanho máximo; baldes que
+  já voltaram a ficar cheios são descartados (equivalem a um balde novo).
+- `SQLiteRateLimitStore`: arquivo SQLite compartilhado entre workers do
+  mesmo host, atualizado em transação `BEGIN IMMEDIATE`.
+
+Outros backends (ex.: Redis) só precisam implementar `RateLimitStore.consume`.
+"""
+import math
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from fastapi import Request
+
+from .logger import logger
+
+
+class RateLimitExceeded(Exception):
+    """Requisição acima do limite configurado."""
+
+    def __init__(self, rule: str, retry_after: float):
+        super().__init__(f"Limite de requisições excedido ({rule})")
+        self.rule = rule
+        self.retry_after = retry_after
+
+
+class RateLimitRule(NamedTuple):
+    """Regra de limitação: capacidade do balde e reabastecimento."""
+
+    name: str
+    per_minute: float
+    burst: int
+
+    @property
+    def rate(self) -> float:
+        """Fichas por segundo."""
+        return self.per_minute / 60.0
+
+
+def refill(tokens: float, updated: float, now: float, rule: RateLimitRule) -> float:
+    """Fichas disponíveis em `now` para um balde atualizado em `updated`."""
+    return min(float(rule.burst), tokens + (now - updated) * rule.rate)
+
+
+class RateLimitStore(ABC):
+    """Interface de armazenamento dos baldes."""
+
+    @abstractmethod
+    def consume(self, key: str, rule: RateLimitRule, now: float) -> float:
+        """
+        Consome uma ficha do balde da chave.
+
+        Args:
+            key: Chave do balde (regra + IP ou conta)
+            rule: Regra aplicada
+            now: Instante atual (time.time())
+
+        Returns:
+            0 se permitido; senão, segundos até haver uma ficha
+        """
+
+    @abstractmethod
+    def reset(self) -> None:
+        """Remove todos os baldes."""
+
+    @abstractmethod
+    def size(self) -> int:
+        """Quantidade de baldes armazenados."""
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """
+    Baldes em memória do processo.
+
+    Cada entrada guarda apenas (fichas, atualização, instante em que fica
+    cheio). A ordem do `OrderedDict` é a de último acesso: entradas antigas
+    são descartadas quando cheias ou quando `max_keys` é excedido.
+
+    Args:
+        max_keys: Número máximo de baldes mantidos
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, rule: RateLimitRule, now: float) -> float:
+        with self._lock:
+            entry = self._buckets.pop(key, None)
+            tokens = float(rule.burst) if entry is None else refill(entry[0], entry[1], now, rule)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rule.rate
+            full_at = now + (rule.burst - tokens) / rule.rate
+            self._buckets[key] = (tokens, now, full_at)
+            self._expire(now)
+            return retry_after
+
+    def _expire(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            oldest = next(iter(buckets))
+            if buckets[oldest][2] > now and len(buckets) <= self.max_keys:
+                break
+            del buckets[oldest]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+
+class SQLiteRateLimitStore(RateLimitStore):
+    """
+    Baldes em um arquivo SQLite compartilhado entre processos.
+
+    Args:
+        path: Caminho do arquivo do banco
+        purge_every: A cada quantas operações remover baldes já cheios
+    """
+
+    def __init__(self, path: str, purge_every: int = 1000):
+        self.path = path
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._operations = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+                "updated REAL NOT NULL, full_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_full_at "
+                "ON rate_limit_buckets (full_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def consume(self, key: str, rule: RateLimitRule, now: float) -> float:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_limit_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens = float(rule.burst) if row is None else refill(row[0], row[1], now, rule)
+            retry_after = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / rule.rate
+            full_at = now + (rule.burst - tokens) / rule.rate
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit_buckets (key, tokens, updated, full_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, tokens, now, full_at),
+            )
+            self._operations += 1
+            if self._operations % self.purge_every == 0:
+                conn.execute("DELETE FROM rate_limit_buckets WHERE full_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return retry_after
+
+    def reset(self) -> None:
+        self._connect().execute("DELETE FROM rate_limit_buckets")
+
+    def size(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM rate_limit_buckets").fetchone()[0]
+
+
+def build_store(url: str, max_keys: int) -> RateLimitStore:
+    """
+    Cria o armazenamento a partir da URL configurada.
+
+    Args:
+        url: "memory" ou "sqlite:///caminho/arquivo.db"
+        max_keys: Limite de baldes do armazenamento em memória
+
+    Returns:
+        Armazenamento de baldes
+    """
+    if not url or url == "memory":
+        return MemoryRateLimitStore(max_keys)
+    if url.startswith("sqlite:///"):
+        return SQLiteRateLimitStore(url[len("sqlite:///"):])
+    raise ValueError(f"RATE_LIMIT_STORE_URL não suportada: {url}")
+
+
+class RateLimiter:
+    """
+    Aplica regras de limitação sobre um armazenamento de baldes.
+
+    Args:
+        store: Armazenamento dos baldes
+        rules: Regras por nome
+        enabled: Se False, todas as requisições são permitidas
+    """
+
+    def __init__(self, store: RateLimitStore, rules: Dict[str, RateLimitRule], enabled: bool = True):
+        self.store = store
+        self.rules = rules
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._allowed: Dict[str, int] = {name: 0 for name in rules}
+        self._limited: Dict[str, int] = {name: 0 for name in rules}
+
+    def hit(self, rule_name: str, key: str) -> None:
+        """
+        Consome uma ficha da regra para a chave.
+
+        Raises:
+            RateLimitExceeded: Se o balde estiver vazio
+        """
+        if not self.enabled:
+            return
+        rule = self.rules[rule_name]
+        retry_after = self.store.consume(f"{rule_name}:{key}", rule, time.time())
+        with self._lock:
+            if retry_after:
+                self._limited[rule_name] += 1
+            else:
+                self._allowed[rule_name] += 1
+        if retry_after:
+            logger.warning("Limite de requisições excedido: %s (%s)", rule_name, key)
+            raise RateLimitExceeded(rule_name, retry_after)
+
+    def reset(self) -> None:
+        """Esvazia os baldes e zera as métricas."""
+        self.store.reset()
+        with self._lock:
+            self._allowed = {name: 0 for name in self.rules}
+            self._limited = {name: 0 for name in self.rules}
+
+    def metrics(self) -> dict:
+        """Retorna requisições permitidas/recusadas por regra."""
+        with self._lock:
+            rules = {
+                name: {"allowed": self._allowed[name], "limited": self._limited[name]}
+                for name in self.rules
+            }
+        return {
+            "enabled": self.enabled,
+            "store": type(self.store).__name__,
+            "buckets": self.store.size(),
+            "rules": rules,
+        }
+
+
+def client_ip(request: Request) -> str:
+    """IP do cliente (use `--proxy-headers` no uvicorn atrás de proxy)."""
+    return request.client.host if request.client else "unknown"
+
+
+def retry_after_header(retry_after: float) -> str:
+    """Valor do cabeçalho Retry-After em segundos inteiros."""
+    return str(max(1, math.ceil(retry_after)))
+
+
+def limit_by_ip(limiter: RateLimiter, rule_name: str):
+    """
+    Cria dependência FastAPI que limita a rota por IP.
+
+    Args:
+        limiter: Limitador compartilhado
+        rule_name: Nome da regra
+
+    Returns:
+        Função de dependência
+    """
+    def dependency(request: Request) -> None:
+        limiter.hit(rule_name, client_ip(request))
+    return dependency
+
+
+def limit_account(limiter: RateLimiter, rule_name: str, account: Optional[str]) -> None:
+    """Limita por conta (email normalizado), quando informada."""
+    if account:
+        limiter.hit(rule_name, account.strip().lower())
@@ -0,0 +1,415 @@
+"""Lembretes de consulta: fila persistente (outbox) e despacho em lotes.
+
+Criar, cancelar ou remover um agendamento ajusta seus lembretes na tabela
+`reminder` (um por canal com contato do paciente, `REMINDER_LEAD_HOURS`
+antes do início). `ReminderDispatcher` roda em segundo plano e, a cada
+`REMINDER_INTERVAL_SECONDS`:
+
+1. reserva um lote de lembretes vencidos (`ReminderRepository.claim_due`,
+   sobre o índice (status, next_attempt_at) — a tabela de agendamentos só é
+   lida por chave primária para os lembretes do lote);
+2. confere o agendamento: cancelado, removido ou já iniciado cancela o
+   lembrete; horário alterado o reagenda;
+3. envia em paralelo por `REMINDER_WORKERS` threads, cada uma com uma
+   conexão SMTP para a sua parte do lote;
+4. grava os resultados em um `executemany`: falhas voltam à fila com espera
+   exponencial (`REMINDER_RETRY_BASE_SECONDS`, dobrando até 1h) e, após
+   `REMINDER_MAX_ATTEMPTS`, ficam como `failed`.
+
+Vários workers podem despachar ao mesmo tempo: cada lembrete é reservado por
+um só. Um worker que pare no meio do envio tem a reserva vencida após
+`CLAIM_SECONDS` e o lote volta à fila.
+"""
+import json
+import math
+import smtplib
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+from sqlmodel import Session, select
+
+from .config import get_settings
+from .database import task_engine as default_engine
+from .enums import AppointmentStatus, ReminderChannel, ReminderStatus
+from .logger import logger
+from .metrics import SCHEDULER_ROWS, SCHEDULER_RUN_LATENCY
+from .models import Appointment, Patient, Room
+from .repository import ReminderRepository
+from .scheduler import PeriodicTask, utcnow
+
+settings = get_settings()
+
+JOB_NAME = "reminders"
+# Duração da reserva de um lote (envio + gravação do resultado)
+CLAIM_SECONDS = 300
+MAX_RETRY_SECONDS = 3600
+OUTCOMES = ("sent", "retried", "failed", "cancelled", "rescheduled")
+
+
+class ReminderMessage(NamedTuple):
+    """Lembrete pronto para envio."""
+
+    reminder_id: int
+    channel: ReminderChannel
+    to: str
+    subject: str
+    body: str
+
+
+class ReminderSender(ABC):
+    """Interface de envio de um canal."""
+
+    @abstractmethod
+    def send_many(self, messages: Sequence[ReminderMessage]) -> List[Optional[str]]:
+        """
+        Envia as mensagens, reaproveitando a conexão quando possível.
+
+        Returns:
+            Para cada mensagem, None se enviada ou a descrição do erro
+        """
+
+
+class SMTPReminderSender(ReminderSender):
+    """
+    Envio por email (uma conexão SMTP por chamada).
+
+    Args:
+        host: Servidor SMTP
+        port: Porta
+        sender: Remetente
+        username: Usuário (vazio = sem autenticação)
+        password: Senha
+        starttls: Usa STARTTLS
+        timeout: Tempo máximo de cada operação em segundos
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        sender: str,
+        username: str = "",
+        password: str = "",
+        starttls: bool = False,
+        timeout: float = 10,
+    ):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+
+    def send_many(self, messages: Sequence[ReminderMessage]) -> List[Optional[str]]:
+        try:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        except (OSError, smtplib.SMTPException) as e:
+            return [f"SMTP indisponível: {e}"] * len(messages)
+        errors: List[Optional[str]] = []
+        with smtp:
+            try:
+                if self.starttls:
+                    smtp.starttls()
+                if self.username:
+                    smtp.login(self.username, self.password)
+            except (OSError, smtplib.SMTPException) as e:
+                return [f"Falha na conexão SMTP: {e}"] * len(messages)
+            for message in messages:
+                email = EmailMessage()
+                email["From"] = self.sender
+                email["To"] = message.to
+                email["Subject"] = message.subject
+                email.set_content(message.body)
+                try:
+                    smtp.send_message(email)
+                    errors.append(None)
+                except (OSError, smtplib.SMTPException) as e:
+                    errors.append(str(e)[:500])
+        return errors
+
+
+class HTTPSmsSender(ReminderSender):
+    """
+    Envio por SMS via gateway HTTP (`POST {"to": ..., "message": ...}`).
+
+    Args:
+        url: URL do gateway
+        timeout: Tempo máximo de cada requisição em segundos
+    """
+
+    def __init__(self, url: str, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+
+    def send_many(self, messages: Sequence[ReminderMessage]) -> List[Optional[str]]:
+        errors: List[Optional[str]] = []
+        for message in messages:
+            request = urllib.request.Request(
+                self.url,
+                data=json.dumps({"to": message.to, "message": message.body}).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout):
+                    errors.append(None)
+            except OSError as e:
+                errors.append(str(e)[:500])
+        return errors
+
+
+def build_senders() -> Dict[ReminderChannel, ReminderSender]:
+    """Canais configurados: email sempre; SMS se houver gateway."""
+    senders: Dict[ReminderChannel, ReminderSender] = {
+        ReminderChannel.EMAIL: SMTPReminderSender(
+            settings.SMTP_HOST,
+            settings.SMTP_PORT,
+            settings.REMINDER_EMAIL_FROM,
+            username=settings.SMTP_USERNAME,
+            password=settings.SMTP_PASSWORD,
+            starttls=settings.SMTP_STARTTLS,
+        ),
+    }
+    if settings.REMINDER_SMS_GATEWAY_URL:
+        senders[ReminderChannel.SMS] = HTTPSmsSender(settings.REMINDER_SMS_GATEWAY_URL)
+    return senders
+
+
+def format_message(reminder_id: int, channel: ReminderChannel, to: str, context) -> ReminderMessage:
+    """Texto do lembrete a partir do agendamento, paciente e sala."""
+    when = f"{context.start_dt:%d/%m/%Y} às {context.start_dt:%H:%M}"
+    room = f" (sala {context.room_name})" if context.room_name else ""
+    body = (
+        f"Olá, {context.patient_name}. Lembramos da sua consulta na Clínica de Psicologia "
+        f"UNIPAR em {when}{room}. Em caso de imprevisto, avise a clínica."
+    )
+    return ReminderMessage(reminder_id, channel, to, "Lembrete de consulta - Clínica de Psicologia UNIPAR", body)
+
+
+class ReminderDispatcher(PeriodicTask):
+    """
+    Despacha a fila de lembretes em lotes, com novas tentativas.
+
+    Args:
+        engine: Engine do banco
+        senders: Envio por canal (canais ausentes não recebem lembretes)
+        lead_hours: Antecedência do lembrete
+        interval_seconds: Intervalo entre verificações da fila
+        batch_size: Lembretes reservados por lote
+        workers: Threads de envio
+        max_attempts: Tentativas antes de `failed`
+        retry_base_seconds: Espera após a 1ª falha (dobra a cada nova falha)
+    """
+
+    def __init__(
+        self,
+        engine,
+        senders: Dict[ReminderChannel, ReminderSender],
+        lead_hours: float,
+        interval_seconds: float,
+        batch_size: int,
+        workers: int,
+        max_attempts: int,
+        retry_base_seconds: float,
+    ):
+        super().__init__("reminder-dispatcher", interval_seconds)
+        self.engine = engine
+        self.senders = senders
+        self.lead = timedelta(hours=lead_hours)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._runs = 0
+        self._last_run_ms = 0.0
+        self._outcomes: Dict[str, int] = dict.fromkeys(OUTCOMES, 0)
+
+    @property
+    def channels(self) -> List[ReminderChannel]:
+        """Canais com envio configurado."""
+        return list(self.senders)
+
+    def backoff(self, attempts: int) -> timedelta:
+        """Espera antes da próxima tentativa após `attempts` falhas."""
+        return timedelta(seconds=min(self.retry_base_seconds * 2 ** (attempts - 1), MAX_RETRY_SECONDS))
+
+    def sync(self, session: Session, appointment_id: int) -> None:
+        """Ajusta os lembretes de um agendamento após uma alteração."""
+        ReminderRepository.sync_for_appointment(session, appointment_id, self.lead, self.channels)
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Despacha todos os lembretes vencidos, lote a lote.
+
+        Args:
+            now: Instante de referência em UTC (padrão: agora)
+
+        Returns:
+            Lembretes por resultado (sent, retried, failed, cancelled,
+            rescheduled)
+        """
+        now = now or utcnow()
+        start = time.perf_counter()
+        outcomes = dict.fromkeys(OUTCOMES, 0)
+        with Session(self.engine) as session:
+            while True:
+                claimed = ReminderRepository.claim_due(
+                    session, now, self.batch_size, timedelta(seconds=CLAIM_SECONDS)
+                )
+                if claimed:
+                    self._dispatch(session, claimed, now, outcomes)
+                if len(claimed) < self.batch_size:
+                    break
+        elapsed = time.perf_counter() - start
+
+        SCHEDULER_RUN_LATENCY.labels(JOB_NAME).observe(elapsed)
+        for name, count in outcomes.items():
+            SCHEDULER_ROWS.labels(JOB_NAME, name).inc(count)
+        with self._lock:
+            self._runs += 1
+            self._last_run_ms = elapsed * 1000
+            for name, count in outcomes.items():
+                self._outcomes[name] += count
+        if any(outcomes.values()):
+            logger.info("Lembretes processados em %.1fms: %s", elapsed * 1000, outcomes)
+        return outcomes
+
+    def _dispatch(self, session: Session, claimed: list, now: datetime, outcomes: Dict[str, int]) -> None:
+        contexts = {
+            row.id: row
+            for row in session.execute(
+                select(
+                    Appointment.id,
+                    Appointment.start_dt,
+                    Appointment.status,
+                    Appointment.is_deleted,
+                    Patient.name.label("patient_name"),
+                    Patient.email,
+                    Patient.phone,
+                    Room.name.label("room_name"),
+                )
+                .join(Patient, Patient.id == Appointment.patient_id)
+                .outerjoin(Room, Room.id == Appointment.room_id)
+                .where(Appointment.id.in_({row.appointment_id for row in claimed}))
+            )
+        }
+
+        results: List[dict] = []
+        pending: Dict[ReminderChannel, List[tuple]] = {}
+
+        def finish(reminder, outcome: str, status: ReminderStatus, **values) -> None:
+            outcomes[outcome] += 1
+            results.append({
+                "id": reminder.id,
+                "status": status,
+                "due_at": values.get("due_at", reminder.due_at),
+                "attempts": values.get("attempts", reminder.attempts),
+                "next_attempt_at": values.get("next_attempt_at", now),
+                "last_error": values.get("last_error"),
+                "sent_at": values.get("sent_at"),
+            })
+
+        for reminder in claimed:
+            context = contexts.get(reminder.appointment_id)
+            if (
+                context is None
+                or context.is_deleted
+                or context.status != AppointmentStatus.SCHEDULED
+                or context.start_dt <= now
+            ):
+                finish(reminder, "cancelled", ReminderStatus.CANCELLED)
+                continue
+            due_at = context.start_dt - self.lead
+            if due_at != reminder.due_at:
+                finish(
+                    reminder, "rescheduled", ReminderStatus.PENDING,
+                    due_at=due_at, attempts=0, next_attempt_at=due_at,
+                )
+                continue
+            to = context.email if reminder.channel == ReminderChannel.EMAIL else context.phone
+            if not to or reminder.channel not in self.senders:
+                finish(reminder, "cancelled", ReminderStatus.CANCELLED, last_error="Sem contato ou canal desativado")
+                continue
+            message = format_message(reminder.id, reminder.channel, to, context)
+            pending.setdefault(reminder.channel, []).append((reminder, message))
+
+        # Encerra a leitura antes do envio: nenhuma transação fica aberta
+        # enquanto o SMTP/SMS responde
+        session.commit()
+        for reminder, error in self._send(pending):
+            if error is None:
+                finish(reminder, "sent", ReminderStatus.SENT, sent_at=now)
+            elif reminder.attempts >= self.max_attempts:
+                finish(reminder, "failed", ReminderStatus.FAILED, last_error=error)
+            else:
+                finish(
+                    reminder, "retried", ReminderStatus.PENDING,
+                    next_attempt_at=now + self.backoff(reminder.attempts), last_error=error,
+                )
+        ReminderRepository.finish(session, results, now)
+
+    def _send(self, pending: Dict[ReminderChannel, List[tuple]]) -> List[tuple]:
+        """Divide cada canal entre as threads de envio; retorna (lembrete, erro)."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="reminder-send")
+        jobs = []
+        for channel, items in pending.items():
+            size = math.ceil(len(items) / self.workers)
+            for offset in range(0, len(items), size):
+                chunk = items[offset:offset + size]
+                future = self._executor.submit(self.senders[channel].send_many, [message for _, message in chunk])
+                jobs.append((chunk, future))
+
+        sent = []
+        for chunk, future in jobs:
+            try:
+                errors = future.result()
+            except Exception as e:
+                logger.error("Falha inesperada no envio de lembretes: %s", e, exc_info=True)
+                errors = [str(e)[:500]] * len(chunk)
+            sent.extend((reminder, error) for (reminder, _), error in zip(chunk, errors))
+        return sent
+
+    def _stopped(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def metrics(self) -> dict:
+        """Retorna execuções, lembretes por resultado e pendentes na fila."""
+        with Session(self.engine) as session:
+            pending = ReminderRepository.count_pending(session)
+        with self._lock:
+            return {
+                "running": self.running,
+                "runs": self._runs,
+                "errors": self._errors,
+                "last_run_ms": round(self._last_run_ms, 3),
+                "pending": pending,
+                **self._outcomes,
+            }
+
+
+reminder_dispatcher = ReminderDispatcher(
+    default_engine,
+    senders=build_senders(),
+    lead_hours=settings.REMINDER_LEAD_HOURS,
+    interval_seconds=settings.REMINDER_INTERVAL_SECONDS,
+    batch_size=settings.REMINDER_BATCH_SIZE,
+    workers=settings.REMINDER_WORKERS,
+    max_attempts=settings.REMINDER_MAX_ATTEMPTS,
+    retry_base_seconds=settings.REMINDER_RETRY_BASE_SECONDS,
+)
+
+
+def sync_reminders(session: Session, appointment_id: int) -> None:
+    """Ajusta os lembretes do agendamento (sem efeito com lembretes desativados)."""
+    if settings.REMINDERS_ENABLED:
+        reminder_dispatcher.sync(session, appointment_id)
@@ -1,14 +1,33 @@
 """Camada de repositório - acesso a dados."""
-from datetime import datetime, timezone
-from typing import List, Optional, TypeVar, Generic, Type
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar, Generic, Type
+from sqlalchemy import String, bindparam, delete, func, insert, literal, update
+from sqlalchemy.orm import aliased
 from sqlmodel import Session, select
-from backend.models import Room, Patient, User, Appointment
-from backend.enums import AppointmentStatus
+from backend.models import Room, Patient, User, Appointment, Reminder, WebhookDelivery, WebhookSubscription
+from backend.enums import AppointmentStatus, ReminderChannel, ReminderStatus, UserRole, WebhookDeliveryStatus
 from .logger import logger
+from .metrics import instrument_repository
+from .search import PATIENT_INDEX, USER_INDEX, fts_query
 
 T = TypeVar('T')
 
 
+class StaleVersionError(Exception):
+    """
+    O registro mudou desde a versão informada (If-Match).
+
+    Attributes:
+        id: ID do registro
+        current_version: Versão atual no banco
+    """
+
+    def __init__(self, id: int, current_version: int):
+        super().__init__(f"Registro {id} está na versão {current_version}")
+        self.id = id
+        self.current_version = current_version
+
+
 class BaseRepository(Generic[T]):
     """Classe base genérica para repositórios."""
     model: Type[T] = None
@@ -27,6 +46,22 @@ class BaseRepository(Generic[T]):
         """
         return session.get(cls.model, id)
 
+    @classmethod
+    def get_many(cls, session: Session, ids: Sequence[int], *conditions) -> List[T]:
+        """
+        Obtém vários registros por ID em uma única consulta (IN).
+
+        Args:
+            session: Sessão do banco de dados
+            ids: IDs procurados
+            conditions: Filtros adicionais (ex.: apenas ativos)
+
+        Returns:
+            Registros encontrados, sem ordem definida
+        """
+        statement = select(cls.model).where(cls.model.id.in_(ids), *conditions)
+        return session.exec(statement).all()
+
     @classmethod
     def get_all(cls, session: Session, skip: int = 0, limit: int = 100) -> List[T]:
         """
@@ -58,35 +93,55 @@ class BaseRepository(Generic[T]):
         session.add(obj)
         session.commit()
         session.refresh(obj)
-        logger.debug(f"Criado novo {cls.model.__name__}: {obj.id}")
+        logger.debug("Criado novo %s: %s", cls.model.__name__, obj.id)
         return obj
 
     @classmethod
-    def update(cls, session: Session, id: int, data: dict) -> Optional[T]:
+    def update(
+        cls, session: Session, id: int, data: dict, expected_version: Optional[int] = None, conditions: Sequence = ()
+    ) -> Optional[T]:
         """
-        Atualiza um registro.
-        
+        Atualiza um registro com compare-and-swap na versão.
+
+        Um único `UPDATE ... WHERE id = ? [AND version = ?] RETURNING`
+        aplica os dados, incrementa `version` e devolve a linha nova, sem
+        leitura prévia nem `refresh`. Sem `expected_version`, a última
+        escrita prevalece (mas a versão ainda é incrementada).
+
         Args:
             session: Sessão do banco de dados
             id: ID do registro
             data: Dicionário com dados a atualizar
-        
+            expected_version: Versão lida pelo cliente (If-Match)
+            conditions: Filtros adicionais (ex.: não removido)
+
         Returns:
-            Objeto atualizado ou None se não encontrado
+            Objeto atualizado (fora da sessão) ou None se não encontrado ou
+            fora de `conditions`
+
+        Raises:
+            StaleVersionError: Se o registro estiver em outra versão
         """
-        obj = session.get(cls.model, id)
-        if not obj:
-            return None
-        
-        for key, value in data.items():
-            if value is not None and hasattr(obj, key):
-                setattr(obj, key, value)
-        
-        obj.updated_at = datetime.now(timezone.utc)
+        model = cls.model
+        values = {key: value for key, value in data.items() if value is not None and hasattr(model, key)}
+        values.update(updated_at=datetime.now(timezone.utc), version=model.version + 1)
+        stmt = update(model).where(model.id == id, *conditions).values(**values)
+        if expected_version is not None:
+            stmt = stmt.where(model.version == expected_version)
+        stmt = stmt.returning(*model.__table__.columns).execution_options(synchronize_session=False)
+
+        row = session.execute(stmt).first()
+        if row is None:
+            session.rollback()
+            current = session.execute(
+                select(model.version).where(model.id == id, *conditions)
+            ).scalar_one_or_none()
+            if current is None:
+                return None
+            raise StaleVersionError(id, current)
         session.commit()
-        session.refresh(obj)
-        logger.debug(f"Atualizado {cls.model.__name__}: {obj.id}")
-        return obj
+        logger.debug("Atualizado %s: %s (versão %s)", model.__name__, id, row.version)
+        return model(**row._mapping)
 
     @classmethod
     def delete(cls, session: Session, id: int) -> bool:
@@ -106,10 +161,11 @@ class BaseRepository(Generic[T]):
         
         session.delete(obj)
         session.commit()
-        logger.debug(f"Deletado {cls.model.__name__}: {id}")
+        logger.debug("Deletado %s: %s", cls.model.__name__, id)
         return True
 
 
+@instrument_repository
 class RoomRepository(BaseRepository[Room]):
     """Repositório para gerenciamento de salas."""
     model = Room
@@ -144,6 +200,7 @@ class RoomRepository(BaseRepository[Room]):
         return session.exec(stmt).first()
 
 
+@instrument_repository
 class PatientRepository(BaseRepository[Patient]):
     """Repositório para gerenciamento de pacientes."""
     model = Patient
@@ -177,6 +234,26 @@ class PatientRepository(BaseRepository[Patient]):
         stmt = select(Patient).where(Patient.email == email)
         return session.exec(stmt).first()
 
+    @staticmethod
+    def search(session: Session, query: str, limit: int = 20) -> List[Patient]:
+        """
+        Busca pacientes ativos por nome, email, telefone ou observações.
+
+        Args:
+            session: Sessão do banco de dados
+            query: Texto digitado (termos parciais, sem acentos)
+            limit: Máximo de resultados
+
+        Returns:
+            Pacientes ordenados por relevância
+        """
+        match = fts_query(query)
+        if match is None:
+            return []
+        found = PATIENT_INDEX.candidates(match, limit, Patient.active == True)
+        stmt = select(Patient).join(found, found.c.rowid == Patient.id).order_by(found.c.score)
+        return session.exec(stmt).all()
+
     @staticmethod
     def get_children(session: Session) -> List[Patient]:
         """
@@ -196,6 +273,7 @@ class PatientRepository(BaseRepository[Patient]):
         return session.exec(stmt).all()
 
 
+@instrument_repository
 class UserRepository(BaseRepository[User]):
     """Repositório para gerenciamento de usuários."""
     model = User
@@ -229,7 +307,34 @@ class UserRepository(BaseRepository[User]):
         stmt = select(User).where(User.is_active == True).order_by(User.name)
         return session.exec(stmt).all()
 
+    @staticmethod
+    def search(
+        session: Session, query: str, limit: int = 20, role: Optional[UserRole] = None
+    ) -> List[User]:
+        """
+        Busca usuários ativos por nome ou email.
+
+        Args:
+            session: Sessão do banco de dados
+            query: Texto digitado (termos parciais, sem acentos)
+            limit: Máximo de resultados
+            role: Restringe a um perfil
+
+        Returns:
+            Usuários ordenados por relevância
+        """
+        match = fts_query(query)
+        if match is None:
+            return []
+        conditions = [User.is_active == True]
+        if role is not None:
+            conditions.append(User.role == role)
+        found = USER_INDEX.candidates(match, limit, *conditions)
+        stmt = select(User).join(found, found.c.rowid == User.id).order_by(found.c.score)
+        return session.exec(stmt).all()
+
 
+@instrument_repository
 class AppointmentRepository(BaseRepository[Appointment]):
     """Repositório para gerenciamento de agendamentos."""
     model = Appointment
@@ -364,6 +469,7 @@ class AppointmentRepository(BaseRepository[Appointment]):
         
         appointment.is_deleted = True
         appointment.updated_at = datetime.now(timezone.utc)
+        appointment.version += 1
         session.commit()
         logger.debug(f"Agendamento deletado (soft): {id}")
         return True
@@ -412,3 +518,584 @@ class AppointmentRepository(BaseRepository[Appointment]):
         )
         return session.exec(stmt).all()
 
+    @staticmethod
+    def iter_export_rows(
+        session: Session,
+        student_id: Optional[int] = None,
+        room_id: Optional[int] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        batch_size: int = 1000,
+    ) -> Iterator:
+        """
+        Itera agendamentos para exportação sem carregar tudo em memória.
+
+        Usa um único SELECT com os nomes relacionados (sala, paciente,
+        estagiário e supervisor) e lê o cursor em lotes de `batch_size`.
+
+        Args:
+            session: Sessão do banco de dados
+            student_id: Filtrar por estagiário (opcional)
+            room_id: Filtrar por sala (opcional)
+            start: Início do período (opcional, inclusivo)
+            end: Fim do período (opcional, exclusivo)
+            batch_size: Quantidade de linhas lidas por vez do cursor
+
+        Yields:
+            Linhas com as colunas de `backend.export.EXPORT_COLUMNS`
+        """
+        student = aliased(User)
+        supervisor = aliased(User)
+        stmt = (
+            select(
+                Appointment.id,
+                Appointment.start_dt,
+                Appointment.end_dt,
+                Appointment.status,
+                Appointment.room_id,
+                Room.name.label("room_name"),
+                Appointment.patient_id,
+                Patient.name.label("patient_name"),
+                Appointment.student_id,
+                student.name.label("student_name"),
+                Appointment.supervisor_id,
+                supervisor.name.label("supervisor_name"),
+                Appointment.notes,
+            )
+            .outerjoin(Room, Room.id == Appointment.room_id)
+            .outerjoin(Patient, Patient.id == Appointment.patient_id)
+            .outerjoin(student, student.id == Appointment.student_id)
+            .outerjoin(supervisor, supervisor.id == Appointment.supervisor_id)
+            .where(Appointment.is_deleted == False)
+        )
+
+        if student_id:
+            stmt = stmt.where(Appointment.student_id == student_id)
+        if room_id:
+            stmt = stmt.where(Appointment.room_id == room_id)
+        if start:
+            stmt = stmt.where(Appointment.start_dt >= start)
+        if end:
+            stmt = stmt.where(Appointment.start_dt < end)
+
+        stmt = stmt.order_by(Appointment.start_dt).execution_options(yield_per=batch_size)
+        yield from session.execute(stmt)
+
+    @staticmethod
+    def search(
+        session: Session,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        supervisor_id: Optional[int] = None,
+        patient_id: Optional[int] = None,
+        student_id: Optional[int] = None,
+        statuses: Optional[Sequence[AppointmentStatus]] = None,
+        room_ids: Optional[Sequence[int]] = None,
+        children_only: bool = False,
+        limit: int = 50,
+        offset: int = 0,
+    ) -> Tuple[list, Dict[AppointmentStatus, int]]:
+        """
+        Busca agendamentos com filtros combináveis, paginada.
+
+        Cada filtro vira uma condição sobre colunas indexadas: período em
+        `start_dt`, igualdade/IN nos índices compostos (coluna, start_dt) e
+        pacientes infantojuvenis via chave primária de `patient`.
+
+        Args:
+            session: Sessão do banco de dados
+            start: Início do período (inclusivo, sobre start_dt)
+            end: Fim do período (exclusivo, sobre start_dt)
+            supervisor_id: Filtrar por supervisor
+            patient_id: Filtrar por paciente
+            student_id: Filtrar por estagiário
+            statuses: Status aceitos (qualquer um)
+            room_ids: Salas aceitas (qualquer uma)
+            children_only: Apenas pacientes infantojuvenis
+            limit: Tamanho da página
+            offset: Registros a pular
+
+        Returns:
+            (linhas da página com os nomes relacionados, contagem por status
+            de todos os agendamentos que atendem aos filtros)
+        """
+        conditions = [Appointment.is_deleted == False]
+        if start:
+            conditions.append(Appointment.start_dt >= start)
+        if end:
+            conditions.append(Appointment.start_dt < end)
+        if supervisor_id:
+            conditions.append(Appointment.supervisor_id == supervisor_id)
+        if patient_id:
+            conditions.append(Appointment.patient_id == patient_id)
+        if student_id:
+            conditions.append(Appointment.student_id == student_id)
+        if statuses:
+            conditions.append(Appointment.status.in_(statuses))
+        if room_ids:
+            conditions.append(Appointment.room_id.in_(room_ids))
+        if children_only:
+            conditions.append(Patient.is_child == True)
+
+        counts_stmt = select(Appointment.status, func.count()).where(*conditions).group_by(Appointment.status)
+        if children_only:
+            counts_stmt = counts_stmt.join(Patient, Patient.id == Appointment.patient_id)
+        counts = dict(session.execute(counts_stmt).all())
+        if offset >= sum(counts.values()):
+            return [], counts
+
+        student = aliased(User)
+        supervisor = aliased(User)
+        page_stmt = (
+            select(
+                Appointment.id,
+                Appointment.start_dt,
+                Appointment.end_dt,
+                Appointment.status,
+                Room.name.label("room_name"),
+                Patient.name.label("patient_name"),
+                student.name.label("student_name"),
+                supervisor.name.label("supervisor_name"),
+            )
+            .outerjoin(Room, Room.id == Appointment.room_id)
+            .outerjoin(Patient, Patient.id == Appointment.patient_id)
+            .outerjoin(student, student.id == Appointment.student_id)
+            .outerjoin(supervisor, supervisor.id == Appointment.supervisor_id)
+            .where(*conditions)
+            .order_by(Appointment.start_dt, Appointment.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        return session.execute(page_stmt).all(), counts
+
+    @staticmethod
+    def transition_status(
+        session: Session,
+        from_statuses: Sequence[AppointmentStatus],
+        to_status: AppointmentStatus,
+        conditions: Sequence = (),
+        batch_size: int = 500,
+    ) -> int:
+        """
+        Muda o status dos agendamentos em lotes, sem carregá-los.
+
+        Cada lote é um `UPDATE ... WHERE id IN (SELECT id ... LIMIT n)`
+        confirmado em seguida, para não segurar o bloqueio de escrita do
+        SQLite por muito tempo. As linhas alteradas deixam de casar com o
+        filtro, então o próximo lote pega as seguintes. A versão é
+        incrementada (o ETag dos agendamentos alterados muda).
+
+        Args:
+            session: Sessão do banco de dados
+            from_statuses: Status de origem
+            to_status: Novo status
+            conditions: Filtros adicionais (ex.: período)
+            batch_size: Linhas por UPDATE
+
+        Returns:
+            Quantidade de agendamentos alterados
+        """
+        ids = (
+            select(Appointment.id)
+            .where(
+                Appointment.status.in_(from_statuses),
+                Appointment.is_deleted == False,
+                *conditions,
+            )
+            .limit(batch_size)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(Appointment)
+            .where(Appointment.id.in_(ids))
+            .values(status=to_status, updated_at=datetime.now(timezone.utc), version=Appointment.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        total = 0
+        while True:
+            changed = session.execute(stmt).rowcount
+            session.commit()
+            total += changed
+            if changed < batch_size:
+                return total
+
+
+@instrument_repository
+class ReminderRepository(BaseRepository[Reminder]):
+    """Repositório da fila de lembretes."""
+    model = Reminder
+
+    @staticmethod
+    def sync_for_appointment(
+        session: Session, appointment_id: int, lead: timedelta, channels: Sequence[ReminderChannel]
+    ) -> None:
+        """
+        Ajusta os lembretes de um agendamento ao seu estado atual.
+
+        Agendamento ativo (`scheduled`) recebe um lembrete por canal com
+        contato do paciente; se o horário mudou, o lembrete volta para a fila
+        com o novo `due_at` (mesmo se já enviado). Cancelado, concluído ou
+        removido tem os lembretes ainda não enviados cancelados.
+
+        Args:
+            session: Sessão do banco de dados
+            appointment_id: ID do agendamento
+            lead: Antecedência do lembrete
+            channels: Canais habilitados
+        """
+        row = session.execute(
+            select(Appointment.start_dt, Appointment.status, Appointment.is_deleted, Patient.email, Patient.phone)
+            .join(Patient, Patient.id == Appointment.patient_id)
+            .where(Appointment.id == appointment_id)
+        ).first()
+        wanted: Dict[ReminderChannel, datetime] = {}
+        if row is not None and not row.is_deleted and row.status == AppointmentStatus.SCHEDULED:
+            contacts = {ReminderChannel.EMAIL: row.email, ReminderChannel.SMS: row.phone}
+            wanted = {channel: row.start_dt - lead for channel in channels if contacts[channel]}
+
+        now = datetime.now(timezone.utc)
+        existing = session.exec(select(Reminder).where(Reminder.appointment_id == appointment_id)).all()
+        for reminder in existing:
+            due_at = wanted.pop(reminder.channel, None)
+            if due_at is None:
+                if reminder.status in (ReminderStatus.PENDING, ReminderStatus.SENDING):
+                    reminder.status = ReminderStatus.CANCELLED
+                    reminder.updated_at = now
+            elif due_at != reminder.due_at or reminder.status == ReminderStatus.CANCELLED:
+                reminder.due_at = reminder.next_attempt_at = due_at
+                reminder.status = ReminderStatus.PENDING
+                reminder.attempts = 0
+                reminder.last_error = reminder.sent_at = None
+                reminder.updated_at = now
+        for channel, due_at in wanted.items():
+            session.add(Reminder(appointment_id=appointment_id, channel=channel, due_at=due_at, next_attempt_at=due_at))
+        session.commit()
+
+    @staticmethod
+    def backfill(
+        session: Session, now: datetime, lead: timedelta, channels: Sequence[ReminderChannel]
+    ) -> int:
+        """
+        Cria (INSERT ... SELECT) os lembretes dos agendamentos futuros.
+
+        Para instalar a fila sobre uma agenda existente; lembretes já
+        criados são mantidos (`OR IGNORE` na chave agendamento + canal).
+
+        Returns:
+            Quantidade de lembretes criados
+        """
+        # due_at calculado no SQLite mantendo o formato gravado pelo
+        # SQLAlchemy (a fração de segundos do início é preservada)
+        due_at = func.strftime(
+            "%Y-%m-%d %H:%M:%S", Appointment.start_dt, f"-{int(lead.total_seconds())} seconds", type_=String
+        ) + func.substr(Appointment.start_dt, 20)
+        columns = Reminder.__table__.c
+        contact = {ReminderChannel.EMAIL: Patient.email, ReminderChannel.SMS: Patient.phone}
+        created = 0
+        for channel in channels:
+            source = (
+                select(
+                    Appointment.id,
+                    literal(channel, columns.channel.type),
+                    due_at,
+                    literal(ReminderStatus.PENDING, columns.status.type),
+                    literal(0),
+                    due_at,
+                    literal(now, columns.created_at.type),
+                    literal(now, columns.updated_at.type),
+                )
+                .join(Patient, Patient.id == Appointment.patient_id)
+                .where(
+                    Appointment.status == AppointmentStatus.SCHEDULED,
+                    Appointment.is_deleted == False,
+                    Appointment.start_dt > now,
+                    contact[channel].is_not(None),
+                    contact[channel] != "",
+                )
+            )
+            stmt = insert(Reminder).prefix_with("OR IGNORE").from_select(
+                ["appointment_id", "channel", "due_at", "status", "attempts", "next_attempt_at", "created_at", "updated_at"],
+                source,
+            )
+            created += session.execute(stmt).rowcount
+        session.commit()
+        return created
+
+    @staticmethod
+    def claim_due(session: Session, now: datetime, limit: int, claim_for: timedelta) -> list:
+        """
+        Reserva para envio os próximos lembretes vencidos.
+
+        Um único `UPDATE ... WHERE id IN (SELECT ... LIMIT n) RETURNING`
+        marca o lote como `sending` e conta a tentativa; com vários workers
+        cada lembrete é reservado por apenas um. Reservas de um worker que
+        parou vencem após `claim_for` e voltam a ser reservadas.
+
+        Args:
+            session: Sessão do banco de dados
+            now: Instante atual (UTC)
+            limit: Tamanho do lote
+            claim_for: Duração da reserva
+
+        Returns:
+            Linhas (id, appointment_id, channel, due_at, attempts)
+        """
+        ids = (
+            select(Reminder.id)
+            .where(
+                Reminder.status.in_((ReminderStatus.PENDING, ReminderStatus.SENDING)),
+                Reminder.next_attempt_at <= now,
+            )
+            # Sem ORDER BY: o índice (status, next_attempt_at) já entrega os
+            # mais antigos de cada status primeiro, sem ordenar todos os
+            # vencidos a cada lote
+            .limit(limit)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(Reminder)
+            .where(Reminder.id.in_(ids))
+            .values(
+                status=ReminderStatus.SENDING,
+                attempts=Reminder.attempts + 1,
+                next_attempt_at=now + claim_for,
+                updated_at=now,
+            )
+            .returning(Reminder.id, Reminder.appointment_id, Reminder.channel, Reminder.due_at, Reminder.attempts)
+            .execution_options(synchronize_session=False)
+        )
+        rows = session.execute(stmt).all()
+        session.commit()
+        return rows
+
+    @staticmethod
+    def finish(session: Session, results: Sequence[dict], now: datetime) -> None:
+        """
+        Grava o resultado de um lote em um único `executemany`.
+
+        Só altera lembretes ainda reservados (`sending`): um cancelamento
+        feito durante o envio prevalece.
+
+        Args:
+            session: Sessão do banco de dados
+            results: Dicionários com id, status, due_at, attempts,
+                next_attempt_at, last_error e sent_at
+            now: Instante do resultado (updated_at)
+        """
+        if not results:
+            return
+        table = Reminder.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("reminder_id"), table.c.status == ReminderStatus.SENDING)
+            .values(
+                status=bindparam("new_status"),
+                due_at=bindparam("due"),
+                attempts=bindparam("attempt_count"),
+                next_attempt_at=bindparam("retry_at"),
+                last_error=bindparam("error"),
+                sent_at=bindparam("delivered_at"),
+                updated_at=bindparam("now"),
+            )
+        )
+        session.execute(stmt, [
+            {
+                "reminder_id": result["id"],
+                "new_status": result["status"],
+                "due": result["due_at"],
+                "attempt_count": result["attempts"],
+                "retry_at": result["next_attempt_at"],
+                "error": result["last_error"],
+                "delivered_at": result["sent_at"],
+                "now": now,
+            }
+            for result in results
+        ])
+        session.commit()
+
+    @staticmethod
+    def count_pending(session: Session) -> int:
+        """Lembretes aguardando envio (contagem sobre o índice de status)."""
+        return session.execute(
+            select(func.count()).select_from(Reminder).where(
+                Reminder.status.in_((ReminderStatus.PENDING, ReminderStatus.SENDING))
+            )
+        ).scalar_one()
+
+
+@instrument_repository
+class WebhookRepository(BaseRepository[WebhookSubscription]):
+    """Repositório das assinaturas de webhook e da sua fila de entregas."""
+    model = WebhookSubscription
+
+    @staticmethod
+    def deactivate(session: Session, id: int) -> bool:
+        """
+        Desativa uma assinatura e cancela as entregas ainda na fila.
+
+        Returns:
+            True se desativada, False se não encontrada
+        """
+        now = datetime.now(timezone.utc)
+        found = session.execute(
+            update(WebhookSubscription)
+            .where(WebhookSubscription.id == id)
+            .values(active=False, updated_at=now)
+        ).rowcount
+        if found:
+            session.execute(
+                update(WebhookDelivery)
+                .where(
+                    WebhookDelivery.subscription_id == id,
+                    WebhookDelivery.status == WebhookDeliveryStatus.PENDING,
+                )
+                .values(status=WebhookDeliveryStatus.CANCELLED, next_attempt_at=now)
+            )
+        session.commit()
+        return bool(found)
+
+    @staticmethod
+    def claim_due(session: Session, now: datetime, limit: int, claim_for: timedelta) -> list:
+        """
+        Reserva para envio as próximas entregas vencidas.
+
+        Mesmo esquema de `ReminderRepository.claim_due`: um `UPDATE ...
+        RETURNING` sobre o índice (status, next_attempt_at) marca o lote
+        como `sending` e conta a tentativa; reservas de um worker que parou
+        vencem após `claim_for`.
+
+        Returns:
+            Linhas (id, subscription_id, event, payload, attempts, created_at)
+        """
+        ids = (
+            select(WebhookDelivery.id)
+            .where(
+                WebhookDelivery.status.in_((WebhookDeliveryStatus.PENDING, WebhookDeliveryStatus.SENDING)),
+                WebhookDelivery.next_attempt_at <= now,
+            )
+            .limit(limit)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(WebhookDelivery)
+            .where(WebhookDelivery.id.in_(ids))
+            .values(
+                status=WebhookDeliveryStatus.SENDING,
+                attempts=WebhookDelivery.attempts + 1,
+                next_attempt_at=now + claim_for,
+            )
+            .returning(
+                WebhookDelivery.id,
+                WebhookDelivery.subscription_id,
+                WebhookDelivery.event,
+                WebhookDelivery.payload,
+                WebhookDelivery.attempts,
+                WebhookDelivery.created_at,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        rows = session.execute(stmt).all()
+        session.commit()
+        return rows
+
+    @staticmethod
+    def finish(session: Session, results: Sequence[dict]) -> None:
+        """
+        Grava o resultado de um lote em um único `executemany`.
+
+        Só altera entregas ainda reservadas (`sending`).
+
+        Args:
+            session: Sessão do banco de dados
+            results: Dicionários com id, status, next_attempt_at,
+                last_error, response_status e delivered_at
+        """
+        if not results:
+            return
+        table = WebhookDelivery.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("delivery_id"), table.c.status == WebhookDeliveryStatus.SENDING)
+            .values(
+                status=bindparam("new_status"),
+                next_attempt_at=bindparam("retry_at"),
+                last_error=bindparam("error"),
+                response_status=bindparam("http_status"),
+                delivered_at=bindparam("delivered"),
+            )
+        )
+        session.execute(stmt, [
+            {
+                "delivery_id": result["id"],
+                "new_status": result["status"],
+                "retry_at": result["next_attempt_at"],
+                "error": result["last_error"],
+                "http_status": result["response_status"],
+                "delivered": result["delivered_at"],
+            }
+            for result in results
+        ])
+        session.commit()
+
+    @staticmethod
+    def requeue(session: Session, delivery_id: int, now: datetime) -> bool:
+        """
+        Devolve à fila uma entrega `dead` (tentativas zeradas).
+
+        Returns:
+            True se devolvida, False se não encontrada ou fora de `dead`
+        """
+        requeued = session.execute(
+            update(WebhookDelivery)
+            .where(WebhookDelivery.id == delivery_id, WebhookDelivery.status == WebhookDeliveryStatus.DEAD)
+            .values(status=WebhookDeliveryStatus.PENDING, attempts=0, next_attempt_at=now)
+        ).rowcount
+        session.commit()
+        return bool(requeued)
+
+    @staticmethod
+    def list_deliveries(
+        session: Session,
+        status: Optional[WebhookDeliveryStatus] = None,
+        subscription_id: Optional[int] = None,
+        limit: int = 100,
+    ) -> List[WebhookDelivery]:
+        """Entregas mais recentes, opcionalmente por status e assinatura."""
+        statement = select(WebhookDelivery)
+        if status is not None:
+            statement = statement.where(WebhookDelivery.status == status)
+        if subscription_id is not None:
+            statement = statement.where(WebhookDelivery.subscription_id == subscription_id)
+        return session.exec(statement.order_by(WebhookDelivery.id.desc()).limit(limit)).all()
+
+    @staticmethod
+    def count_queued(session: Session) -> Dict[str, int]:
+        """Entregas na fila e descartadas, por status (o histórico entregue não é lido)."""
+        rows = session.execute(
+            select(WebhookDelivery.status, func.count())
+            .where(WebhookDelivery.status.in_((
+                WebhookDeliveryStatus.PENDING, WebhookDeliveryStatus.SENDING, WebhookDeliveryStatus.DEAD,
+            )))
+            .group_by(WebhookDelivery.status)
+        ).all()
+        return {status.value: count for status, count in rows}
+
+    @staticmethod
+    def purge(session: Session, before: datetime) -> int:
+        """
+        Apaga entregas concluídas (entregues ou canceladas) antes de `before`.
+
+        Essas entregas têm `next_attempt_at` igual ao instante do resultado,
+        então a faixa é lida no índice (status, next_attempt_at).
+
+        Returns:
+            Quantidade de entregas apagadas
+        """
+        purged = session.execute(
+            delete(WebhookDelivery).where(
+                WebhookDelivery.status.in_((WebhookDeliveryStatus.DELIVERED, WebhookDeliveryStatus.CANCELLED)),
+                WebhookDelivery.next_attempt_at < before,
+            )
+        ).rowcount
+        session.commit()
+        return purged
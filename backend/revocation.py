@@ -0,0 +1,318 @@
+"""Lista de revogação de tokens com memória constante.
+
+Tokens revogados (logout, rotação de refresh token) são registrados pelo seu
+`jti` em filtros de Bloom rotativos. Cada filtro cobre uma faixa de datas de
+expiração; quando todos os tokens de uma faixa já expiraram o filtro é
+zerado e reaproveitado para uma faixa futura. Assim a memória depende apenas
+da capacidade configurada, nunca da quantidade de tokens emitidos.
+
+Filtros de Bloom podem dar falso positivo (um token válido considerado
+revogado, com probabilidade `error_rate`), nunca falso negativo. O efeito de
+um falso positivo é apenas pedir um novo login.
+
+Usuários desativados são registrados à parte (`revoke_subject`): todo token
+do usuário emitido antes da desativação passa a ser recusado. O mesmo vale
+para famílias de tokens (`revoke_family`, todos os pares derivados de um
+login por rotação), revogadas quando um refresh token já trocado é reusado.
+
+Usuários e famílias revogados ficam em memória até o último token afetado
+expirar, limitados a `capacity` entradas de cada tipo (as mais antigas são
+descartadas primeiro).
+
+O armazenamento é plugável, como em `rate_limit.py`:
+
+- `RevocationList`: filtros de Bloom por processo; com vários workers, uma
+  revogação só vale no worker que a registrou.
+- `SQLiteRevocationList`: arquivo SQLite compartilhado entre workers do
+  mesmo host (`REVOCATION_STORE_URL=sqlite:///./revocation.db`), exato e
+  sem falso positivo; entradas expiradas são removidas periodicamente.
+"""
+import hashlib
+import math
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Tuple
+
+
+class RevocationStore(ABC):
+    """Interface de armazenamento das revogações."""
+
+    @abstractmethod
+    def revoke(self, jti: str, exp: float) -> bool:
+        """
+        Revoga um token até sua expiração.
+
+        Verificação e registro são atômicos: entre duas chamadas simultâneas
+        com o mesmo `jti`, apenas uma recebe True.
+
+        Args:
+            jti: Identificador único do token
+            exp: Expiração do token (timestamp UNIX)
+
+        Returns:
+            True se o token ainda não estava revogado (ou já expirou)
+        """
+
+    @abstractmethod
+    def is_revoked(self, jti: str, exp: float) -> bool:
+        """
+        Verifica se um token foi revogado.
+
+        Args:
+            jti: Identificador único do token
+            exp: Expiração do token (timestamp UNIX)
+
+        Returns:
+            True se o token (provavelmente) foi revogado
+        """
+
+    @abstractmethod
+    def revoke_subject(self, subject: str) -> None:
+        """Recusa todos os tokens do usuário emitidos até agora."""
+
+    @abstractmethod
+    def is_subject_revoked(self, subject: str, issued_at: float) -> bool:
+        """Verifica se o token do usuário foi emitido antes de uma desativação."""
+
+    @abstractmethod
+    def revoke_family(self, family: str) -> None:
+        """Recusa todos os tokens da família (derivados de um mesmo login)."""
+
+    @abstractmethod
+    def is_family_revoked(self, family: str) -> bool:
+        """Verifica se a família do token foi revogada."""
+
+    @abstractmethod
+    def metrics(self) -> dict:
+        """Retorna contagem de revogações."""
+
+
+class RevocationList(RevocationStore):
+    """
+    Conjunto de tokens revogados baseado em filtros de Bloom rotativos.
+
+    Args:
+        capacity: Revogações esperadas por faixa de expiração (e limite de
+            usuários e famílias revogados mantidos)
+        error_rate: Taxa de falso positivo desejada
+        max_ttl_seconds: Maior tempo de vida de um token emitido
+        generations: Quantidade de filtros (faixas) mantidos
+    """
+
+    def __init__(self, capacity: int, error_rate: float, max_ttl_seconds: int, generations: int = 4):
+        if generations < 2:
+            raise ValueError("São necessárias ao menos 2 gerações")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.generations = generations
+        self.bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hashes = max(1, int(round(self.bits / capacity * math.log(2))))
+        # Faixas suficientes para cobrir de "agora" até "agora + max_ttl"
+        self.slice_seconds = max(1, int(math.ceil(max_ttl_seconds / (generations - 1))))
+        self._filters: List[bytearray] = [bytearray((self.bits + 7) // 8) for _ in range(generations)]
+        self._epochs: List[int] = [-1] * generations
+        # Em ordem de revogação, que é também a de expiração (TTL fixo)
+        self._subjects: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._families: "OrderedDict[str, float]" = OrderedDict()
+        self._subject_ttl = max_ttl_seconds
+        self._lock = threading.Lock()
+        self._revoked = 0
+
+    def _positions(self, jti: str):
+        digest = hashlib.blake2b(jti.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def _slot(self, exp: float) -> Tuple[int, int]:
+        epoch = int(exp // self.slice_seconds)
+        return epoch % self.generations, epoch
+
+    def revoke(self, jti: str, exp: float) -> bool:
+        if exp <= time.time():
+            return True
+        slot, epoch = self._slot(exp)
+        positions = self._positions(jti)
+        with self._lock:
+            if self._epochs[slot] != epoch:
+                # A faixa anterior deste filtro já expirou por completo
+                self._filters[slot] = bytearray(len(self._filters[slot]))
+                self._epochs[slot] = epoch
+            bloom = self._filters[slot]
+            if all(bloom[position >> 3] & (1 << (position & 7)) for position in positions):
+                return False
+            for position in positions:
+                bloom[position >> 3] |= 1 << (position & 7)
+            self._revoked += 1
+        return True
+
+    def is_revoked(self, jti: str, exp: float) -> bool:
+        slot, epoch = self._slot(exp)
+        positions = self._positions(jti)
+        with self._lock:
+            if self._epochs[slot] != epoch:
+                return False
+            bloom = self._filters[slot]
+            return all(bloom[position >> 3] & (1 << (position & 7)) for position in positions)
+
+    def revoke_subject(self, subject: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._subjects.pop(subject, None)
+            self._subjects[subject] = (now, now + self._subject_ttl)
+            self._purge(now)
+
+    def is_subject_revoked(self, subject: str, issued_at: float) -> bool:
+        with self._lock:
+            self._purge(time.time())
+            entry = self._subjects.get(subject)
+        return entry is not None and issued_at <= entry[0]
+
+    def revoke_family(self, family: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._families.pop(family, None)
+            self._families[family] = now + self._subject_ttl
+            self._purge(now)
+
+    def is_family_revoked(self, family: str) -> bool:
+        with self._lock:
+            self._purge(time.time())
+            return family in self._families
+
+    def _purge(self, now: float) -> None:
+        subjects = self._subjects
+        while subjects:
+            oldest = next(iter(subjects))
+            if subjects[oldest][1] > now and len(subjects) <= self.capacity:
+                break
+            del subjects[oldest]
+        families = self._families
+        while families:
+            oldest = next(iter(families))
+            if families[oldest] > now and len(families) <= self.capacity:
+                break
+            del families[oldest]
+
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "revoked": self._revoked,
+                "revoked_subjects": len(self._subjects),
+                "revoked_families": len(self._families),
+                "memory_bytes": sum(len(bloom) for bloom in self._filters),
+                "bits_per_filter": self.bits,
+                "hash_functions": self.hashes,
+            }
+
+
+class SQLiteRevocationList(RevocationStore):
+    """
+    Revogações em um arquivo SQLite compartilhado entre processos.
+
+    Args:
+        path: Caminho do arquivo do banco
+        max_ttl_seconds: Maior tempo de vida de um token emitido
+        purge_every: A cada quantas revogações remover entradas expiradas
+    """
+
+    def __init__(self, path: str, max_ttl_seconds: int, purge_every: int = 1000):
+        self.path = path
+        self.purge_every = purge_every
+        self._subject_ttl = max_ttl_seconds
+        self._local = threading.local()
+        self._operations = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS revoked_tokens ("
+                "kind TEXT NOT NULL, key TEXT NOT NULL, revoked_at REAL NOT NULL, "
+                "expires_at REAL NOT NULL, PRIMARY KEY (kind, key)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_revoked_tokens_expires_at "
+                "ON revoked_tokens (expires_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _insert(self, kind: str, key: str, now: float, expires_at: float, replace: bool) -> bool:
+        conn = self._connect()
+        verb = "INSERT OR REPLACE" if replace else "INSERT OR IGNORE"
+        inserted = conn.execute(
+            f"{verb} INTO revoked_tokens (kind, key, revoked_at, expires_at) VALUES (?, ?, ?, ?)",
+            (kind, key, now, expires_at),
+        ).rowcount == 1
+        self._operations += 1
+        if self._operations % self.purge_every == 0:
+            conn.execute("DELETE FROM revoked_tokens WHERE expires_at <= ?", (now,))
+        return inserted
+
+    def _revoked_at(self, kind: str, key: str):
+        row = self._connect().execute(
+            "SELECT revoked_at FROM revoked_tokens WHERE kind = ? AND key = ? AND expires_at > ?",
+            (kind, key, time.time()),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def revoke(self, jti: str, exp: float) -> bool:
+        now = time.time()
+        if exp <= now:
+            return True
+        return self._insert("jti", jti, now, exp, replace=False)
+
+    def is_revoked(self, jti: str, exp: float) -> bool:
+        return self._revoked_at("jti", jti) is not None
+
+    def revoke_subject(self, subject: str) -> None:
+        now = time.time()
+        self._insert("subject", subject, now, now + self._subject_ttl, replace=True)
+
+    def is_subject_revoked(self, subject: str, issued_at: float) -> bool:
+        revoked_at = self._revoked_at("subject", subject)
+        return revoked_at is not None and issued_at <= revoked_at
+
+    def revoke_family(self, family: str) -> None:
+        now = time.time()
+        self._insert("family", family, now, now + self._subject_ttl, replace=True)
+
+    def is_family_revoked(self, family: str) -> bool:
+        return self._revoked_at("family", family) is not None
+
+    def metrics(self) -> dict:
+        counts = dict(self._connect().execute(
+            "SELECT kind, COUNT(*) FROM revoked_tokens WHERE expires_at > ? GROUP BY kind", (time.time(),)
+        ).fetchall())
+        return {
+            "revoked": counts.get("jti", 0),
+            "revoked_subjects": counts.get("subject", 0),
+            "revoked_families": counts.get("family", 0),
+        }
+
+
+def build_revocation_list(url: str, capacity: int, error_rate: float, max_ttl_seconds: int) -> RevocationStore:
+    """
+    Cria a lista de revogação a partir da URL configurada.
+
+    Args:
+        url: "memory" ou "sqlite:///caminho/arquivo.db"
+        capacity: Revogações esperadas por faixa (lista em memória)
+        error_rate: Taxa de falso positivo (lista em memória)
+        max_ttl_seconds: Maior tempo de vida de um token emitido
+
+    Returns:
+        Lista de revogação
+    """
+    if not url or url == "memory":
+        return RevocationList(capacity, error_rate, max_ttl_seconds)
+    if url.startswith("sqlite:///"):
+        return SQLiteRevocationList(url[len("sqlite:///"):], max_ttl_seconds)
+    raise ValueError(f"REVOCATION_STORE_URL não suportada: {url}")
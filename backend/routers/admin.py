@@ -0,0 +1,37 @@
+"""Router de ferramentas administrativas (profiles de requisições)."""
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse, Response
+from ..profiling import CPROFILE, profile_store, pstats_text
+from ..security import require_admin
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+@router.get("/profiles", response_model=List[dict])
+def list_profiles():
+    """Lista profiles guardados (sob demanda e os mais lentos por rota)."""
+    return profile_store.list()
+
+@router.get("/profiles/{profile_id}")
+def get_profile(profile_id: str, format: str = Query("raw", pattern="^(raw|text)$")):
+    """Baixa um profile: .prof (pstats) ou .speedscope.json; `format=text` resume o pstats."""
+    record = profile_store.get(profile_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Profile não encontrado")
+    if record.mode == CPROFILE:
+        if format == "text":
+            return PlainTextResponse(pstats_text(record.data))
+        filename, media_type = f"{record.id}.prof", "application/octet-stream"
+    else:
+        filename, media_type = f"{record.id}.speedscope.json", "application/json"
+    return Response(
+        record.data,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@router.delete("/profiles", status_code=204)
+def clear_profiles():
+    """Remove todos os profiles guardados."""
+    profile_store.clear()
+    return Response(status_code=204)
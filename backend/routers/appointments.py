@@ -1,40 +1,92 @@
 """Router para gerenciamento de agendamentos."""
-from typing import List, Optional
+from operator import itemgetter
+from typing import List, Optional, Sequence, Union
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Header, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlmodel import Session
 from ..models import Appointment, User
-from ..schemas import AppointmentCreate, AppointmentUpdate, AppointmentResponse, AppointmentListResponse
+from ..enums import AppointmentStatus
+from ..schemas import (
+    AppointmentCreate, AppointmentUpdate, AppointmentResponse, AppointmentListResponse, AppointmentSearchResponse,
+    BatchRequest, BatchResponse,
+)
+from ..batch import IDS_DESCRIPTION, in_request_order, request_ids
+from ..etag import etag, if_match_version
 from ..repository import AppointmentRepository
 from ..service import AppointmentService, RoomService, StudentService
 from ..database import get_session
+from ..export import EXPORT_MEDIA_TYPES, EXPORT_WRITERS
+from ..fieldsets import APPOINTMENT_FIELDSET, FieldSelectionError
 from ..logger import logger
+from ..reminders import sync_reminders
 
 router = APIRouter(prefix="/api/appointments", tags=["appointments"])
 
+FIELDS_DESCRIPTION = "Campos separados por virgula (ex.: id,start_dt,room.name)"
+EXPAND_DESCRIPTION = "Relacoes aninhadas: room, patient, student, supervisor"
+
+
+def _sparse_select(fields: Optional[str], expand: Optional[str]):
+    """SELECT de `fields=`/`expand=` (400 para campos desconhecidos)."""
+    try:
+        return APPOINTMENT_FIELDSET.select(fields, expand)
+    except FieldSelectionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _appointment_detail(session: Session, appointment_id: int) -> dict:
+    """Agendamento com sala, paciente, estagiario e supervisor (uma consulta)."""
+    stmt, to_item = APPOINTMENT_FIELDSET.select(None, "room,patient,student,supervisor")
+    row = session.execute(
+        stmt.where((Appointment.id == appointment_id) & (Appointment.is_deleted == False))
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Agendamento nao encontrado")
+    return to_item(row)
+
+
+def _appointments_batch(
+    session: Session, ids: Union[str, Sequence[int]], fields: Optional[str], expand: Optional[str]
+) -> dict:
+    """Agendamentos por ID, na ordem pedida (com `fields`/`expand`)."""
+    wanted = request_ids(ids)
+    stmt, to_item = _sparse_select(fields, expand)
+    rows = session.execute(stmt.where(Appointment.id.in_(wanted), Appointment.is_deleted == False))
+    items, not_found = in_request_order(wanted, [to_item(row) for row in rows], key=itemgetter("id"))
+    return {"items": items, "not_found": not_found}
+
+
 @router.get("", response_model=List[AppointmentListResponse])
 def list_appointments(
     skip: int = 0,
     limit: int = 100,
     student_id: Optional[int] = Query(None),
     room_id: Optional[int] = Query(None),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    expand: Optional[str] = Query(None, description=EXPAND_DESCRIPTION),
+    ids: Optional[str] = Query(None, description=IDS_DESCRIPTION),
     session: Session = Depends(get_session)
 ):
-    """Lista agendamentos com filtros opcionais."""
+    """Lista agendamentos com filtros opcionais (`fields`/`expand` para resposta sob medida, `ids` em lote)."""
     from sqlmodel import select
-    
-    stmt = (
-        select(Appointment)
-        .where(
-            (Appointment.is_deleted == False)
-        )
-    )
-    
+
+    if ids is not None:
+        return JSONResponse(jsonable_encoder(_appointments_batch(session, ids, fields, expand)))
+
+    conditions = [Appointment.is_deleted == False]
     if student_id:
-        stmt = stmt.where(Appointment.student_id == student_id)
+        conditions.append(Appointment.student_id == student_id)
     if room_id:
-        stmt = stmt.where(Appointment.room_id == room_id)
-    
+        conditions.append(Appointment.room_id == room_id)
+
+    if fields or expand:
+        stmt, to_item = _sparse_select(fields, expand)
+        stmt = stmt.where(*conditions).order_by(Appointment.start_dt).offset(skip).limit(limit)
+        return JSONResponse(jsonable_encoder([to_item(row) for row in session.execute(stmt)]))
+
+    stmt = select(Appointment).where(*conditions)
     stmt = stmt.offset(skip).limit(limit).order_by(Appointment.start_dt)
     appointments = session.exec(stmt).all()
     
@@ -69,12 +121,90 @@ def list_appointments(
 
     return results
 
+@router.post("/batch", response_model=BatchResponse[dict])
+def get_appointments_batch(
+    request: BatchRequest,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    expand: Optional[str] = Query(None, description=EXPAND_DESCRIPTION),
+    session: Session = Depends(get_session)
+):
+    """Obtem varios agendamentos por ID (listas longas)."""
+    return JSONResponse(jsonable_encoder(_appointments_batch(session, request.ids, fields, expand)))
+
+@router.get("/search", response_model=AppointmentSearchResponse)
+def search_appointments(
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    supervisor_id: Optional[int] = Query(None),
+    patient_id: Optional[int] = Query(None),
+    student_id: Optional[int] = Query(None),
+    status: Optional[List[AppointmentStatus]] = Query(None),
+    room_id: Optional[List[int]] = Query(None),
+    children_only: bool = Query(False),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    session: Session = Depends(get_session)
+):
+    """Busca agendamentos com filtros combinaveis (status e room_id aceitam varios valores)."""
+    if start and end and end <= start:
+        raise HTTPException(status_code=400, detail="Data final deve ser posterior a data inicial")
+
+    rows, counts = AppointmentRepository.search(
+        session, start=start, end=end, supervisor_id=supervisor_id, patient_id=patient_id,
+        student_id=student_id, statuses=status, room_ids=room_id, children_only=children_only,
+        limit=limit, offset=offset,
+    )
+    return AppointmentSearchResponse(
+        total=sum(counts.values()),
+        status_counts=counts,
+        limit=limit,
+        offset=offset,
+        items=[AppointmentListResponse(**row._mapping) for row in rows],
+    )
+
+@router.get("/export")
+def export_appointments(
+    format: str = Query("csv", pattern="^(csv|ndjson|ics)$"),
+    student_id: Optional[int] = Query(None),
+    room_id: Optional[int] = Query(None),
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    session: Session = Depends(get_session)
+):
+    """Exporta agendamentos em streaming (csv, ndjson ou ics)."""
+    if start and end and end <= start:
+        raise HTTPException(status_code=400, detail="Data final deve ser posterior a data inicial")
+
+    rows = AppointmentRepository.iter_export_rows(
+        session, student_id=student_id, room_id=room_id, start=start, end=end
+    )
+    logger.info("Exportacao de agendamentos iniciada (formato %s)", format)
+    return StreamingResponse(
+        EXPORT_WRITERS[format](rows),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="agendamentos.{format}"'},
+    )
+
 @router.get("/{appointment_id}", response_model=AppointmentResponse)
-def get_appointment(appointment_id: int, session: Session = Depends(get_session)):
-    """Obtem agendamento por ID."""
-    appointment = session.get(Appointment, appointment_id)
-    if not appointment or appointment.is_deleted:
-        raise HTTPException(status_code=404, detail="Agendamento nao encontrado")
+def get_appointment(
+    appointment_id: int,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    expand: Optional[str] = Query(None, description=EXPAND_DESCRIPTION),
+    session: Session = Depends(get_session)
+):
+    """Obtem agendamento por ID com ETag (`fields`/`expand` para resposta sob medida)."""
+    if fields or expand:
+        stmt, to_item = _sparse_select(fields, expand)
+        row = session.execute(
+            stmt.where((Appointment.id == appointment_id) & (Appointment.is_deleted == False))
+        ).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Agendamento nao encontrado")
+        return JSONResponse(jsonable_encoder(to_item(row)))
+
+    appointment = _appointment_detail(session, appointment_id)
+    response.headers["ETag"] = etag(appointment["version"])
     return appointment
 
 @router.post("", response_model=AppointmentResponse, status_code=status.HTTP_201_CREATED)
@@ -114,6 +244,7 @@ def create_appointment(
     appointment = Appointment(**appointment_data.dict())
     appointment = AppointmentRepository.create(session, appointment)
     logger.info(f"Agendamento criado: ID {appointment.id}")
+    sync_reminders(session, appointment.id)
 
     # Preencher os campos student e supervisor para o response model
     student = session.get(User, appointment.student_id) if appointment.student_id else None
@@ -133,26 +264,31 @@ def create_appointment(
         supervisor=supervisor,
         created_at=appointment.created_at,
         updated_at=appointment.updated_at,
+        version=appointment.version,
     )
 
 @router.put("/{appointment_id}", response_model=AppointmentResponse)
 def update_appointment(
     appointment_id: int,
     appointment_data: AppointmentUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     session: Session = Depends(get_session)
 ):
-    """Atualiza agendamento (apenas status e notas)."""
-    appointment = session.get(Appointment, appointment_id)
-    if not appointment or appointment.is_deleted:
-        raise HTTPException(status_code=404, detail="Agendamento nao encontrado")
-    
+    """Atualiza agendamento (apenas status e notas; 412 se `If-Match` nao for a versao atual)."""
     appointment = AppointmentRepository.update(
         session,
         appointment_id,
-        appointment_data.dict(exclude_unset=True)
+        appointment_data.dict(exclude_unset=True),
+        if_match_version(if_match),
+        conditions=[Appointment.is_deleted == False],
     )
+    if not appointment:
+        raise HTTPException(status_code=404, detail="Agendamento nao encontrado")
     logger.info(f"Agendamento atualizado: ID {appointment.id}")
-    return appointment
+    sync_reminders(session, appointment_id)
+    response.headers["ETag"] = etag(appointment.version)
+    return _appointment_detail(session, appointment_id)
 
 @router.delete("/{appointment_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_appointment(appointment_id: int, session: Session = Depends(get_session)):
@@ -163,6 +299,7 @@ def delete_appointment(appointment_id: int, session: Session = Depends(get_sessi
     
     AppointmentRepository.soft_delete(session, appointment_id)
     logger.info(f"Agendamento deletado: ID {appointment_id}")
+    sync_reminders(session, appointment_id)
     return None
 
 @router.get("/student/{student_id}/availability", response_model=dict)
@@ -1,23 +1,35 @@
 """Router para autenticação."""
-from datetime import timedelta
-from fastapi import APIRouter, HTTPException, status, Depends
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Response, status, Depends
+from fastapi.security import HTTPAuthorizationCredentials
 from sqlmodel import Session
 from ..models import User
-from ..schemas import TokenResponse, LoginRequest, UserCreate, UserResponse
+from ..schemas import (
+    TokenResponse, LoginRequest, RefreshRequest, LogoutRequest, UserCreate, UserResponse
+)
 from ..security import (
-    create_access_token,
+    consume_refresh_token,
+    create_token_pair,
+    verify_token,
+    revoke_token,
+    security,
     verify_password,
     hash_password,
+    password_hasher,
+    upgrade_password_hash,
+    rate_limiter,
     get_settings
 )
 from ..repository import UserRepository
+from ..rate_limit import limit_by_ip, limit_account
 from ..database import get_session
 from ..logger import logger
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 settings = get_settings()
+limit_auth_ip = limit_by_ip(rate_limiter, "auth_ip")
 
-@router.post("/register", response_model=UserResponse)
+@router.post("/register", response_model=UserResponse, dependencies=[Depends(limit_auth_ip)])
 def register(user_data: UserCreate, session: Session = Depends(get_session)):
     """Registra novo usuário."""
     # Verificar se já existe
@@ -41,9 +53,15 @@ def register(user_data: UserCreate, session: Session = Depends(get_session)):
     logger.info(f"Novo usuário registrado: {user.email} (role: {user.role})")
     return user
 
-@router.post("/login", response_model=TokenResponse)
-def login(credentials: LoginRequest, session: Session = Depends(get_session)):
+@router.post("/login", response_model=TokenResponse, dependencies=[Depends(limit_auth_ip)])
+def login(
+    credentials: LoginRequest,
+    background_tasks: BackgroundTasks,
+    session: Session = Depends(get_session)
+):
     """Login e geração de JWT token."""
+    # Também por conta: limita tentativas distribuídas entre vários IPs
+    limit_account(rate_limiter, "login_account", credentials.email)
     user = UserRepository.get_by_email(session, credentials.email)
     
     if not user or not verify_password(credentials.password, user.hashed_password):
@@ -60,15 +78,38 @@ def login(credentials: LoginRequest, session: Session = Depends(get_session)):
             detail="Usuário inativo"
         )
     
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email},
-        expires_delta=access_token_expires
-    )
+    # Hash com fator de trabalho antigo: regerar após responder
+    if password_hasher.needs_update(user.hashed_password):
+        background_tasks.add_task(
+            upgrade_password_hash, session.get_bind(), user.id, credentials.password
+        )
     
     logger.info(f"Login bem-sucedido: {user.email}")
-    return {"access_token": access_token, "token_type": "bearer"}
-
-
+    return create_token_pair(user)
 
+@router.post("/refresh", response_model=TokenResponse, dependencies=[Depends(limit_auth_ip)])
+def refresh(data: RefreshRequest, session: Session = Depends(get_session)):
+    """Troca um refresh token por um novo par de tokens (rotação)."""
+    # Cada refresh token vale uma única vez: reuso indica vazamento e
+    # revoga a família inteira
+    payload = consume_refresh_token(data.refresh_token)
+    user = UserRepository.get_by_email(session, payload["sub"])
+    if not user or not user.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Usuário inativo ou inexistente"
+        )
+    return create_token_pair(user, payload.get("fam"))
 
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(
+    data: Optional[LogoutRequest] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+):
+    """Revoga o access token atual e, se enviado, o refresh token."""
+    payload = verify_token(credentials.credentials)
+    revoke_token(credentials.credentials, payload)
+    if data and data.refresh_token:
+        revoke_token(data.refresh_token, verify_token(data.refresh_token, expected_type="refresh"))
+    logger.info("Logout: %s", payload["sub"])
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
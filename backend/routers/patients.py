@@ -1,27 +1,77 @@
 """Router para gerenciamento de pacientes."""
-from typing import List
-from fastapi import APIRouter, HTTPException, status, Depends
+import io
+from typing import List, Optional, Sequence, Union
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Header, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlmodel import Session
 from ..models import Patient
-from ..schemas import PatientCreate, PatientUpdate, PatientResponse
+from ..schemas import PatientCreate, PatientUpdate, PatientResponse, BulkImportReport, BatchRequest, BatchResponse
+from ..batch import IDS_DESCRIPTION, in_request_order, request_ids
+from ..etag import etag, if_match_version
 from ..repository import PatientRepository
 from ..database import get_session
+from ..bulk_import import import_patients
 from ..logger import logger
+from ..security import rate_limiter, require_admin
+from ..rate_limit import limit_by_ip
 
 router = APIRouter(prefix="/api/patients", tags=["patients"])
 
+def _patients_batch(session: Session, ids: Union[str, Sequence[int]]) -> BatchResponse[PatientResponse]:
+    """Pacientes ativos por ID, na ordem pedida."""
+    wanted = request_ids(ids)
+    patients, not_found = in_request_order(
+        wanted, PatientRepository.get_many(session, wanted, Patient.active == True)
+    )
+    return BatchResponse[PatientResponse](items=patients, not_found=not_found)
+
 @router.get("", response_model=List[PatientResponse])
-def list_patients(skip: int = 0, limit: int = 100, session: Session = Depends(get_session)):
-    """Lista todos os pacientes."""
+def list_patients(
+    skip: int = 0,
+    limit: int = 100,
+    ids: Optional[str] = Query(None, description=IDS_DESCRIPTION),
+    session: Session = Depends(get_session)
+):
+    """Lista todos os pacientes (ou os de `ids`, em lote)."""
+    if ids is not None:
+        return JSONResponse(jsonable_encoder(_patients_batch(session, ids)))
     patients = PatientRepository.get_active_patients(session)
     return patients[skip : skip + limit]
 
+@router.post("/batch", response_model=BatchResponse[PatientResponse])
+def get_patients_batch(request: BatchRequest, session: Session = Depends(get_session)):
+    """Obtém vários pacientes por ID (listas longas)."""
+    return _patients_batch(session, request.ids)
+
+@router.get("/search", response_model=List[PatientResponse])
+def search_patients(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    session: Session = Depends(get_session),
+):
+    """Busca pacientes por nome, email, telefone ou observações (prefixo, sem acentos)."""
+    return PatientRepository.search(session, q, limit)
+
+@router.post(
+    "/import",
+    response_model=BulkImportReport,
+    dependencies=[Depends(require_admin), Depends(limit_by_ip(rate_limiter, "auth_ip"))],
+)
+def import_patients_csv(file: UploadFile = File(...), session: Session = Depends(get_session)):
+    """Importa pacientes em massa a partir de um CSV."""
+    with io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="") as lines:
+        report = import_patients(session, lines)
+    logger.info("Importação de pacientes via API: %d criados, %d erros", report["created"], len(report["errors"]))
+    return report
+
 @router.get("/{patient_id}", response_model=PatientResponse)
-def get_patient(patient_id: int, session: Session = Depends(get_session)):
-    """Obtém paciente por ID."""
+def get_patient(patient_id: int, response: Response, session: Session = Depends(get_session)):
+    """Obtém paciente por ID (com ETag da versão)."""
     patient = session.get(Patient, patient_id)
     if not patient or not patient.active:
         raise HTTPException(status_code=404, detail="Paciente não encontrado")
+    response.headers["ETag"] = etag(patient.version)
     return patient
 
 @router.post("", response_model=PatientResponse, status_code=status.HTTP_201_CREATED)
@@ -33,14 +83,21 @@ def create_patient(patient_data: PatientCreate, session: Session = Depends(get_s
     return patient
 
 @router.put("/{patient_id}", response_model=PatientResponse)
-def update_patient(patient_id: int, patient_data: PatientUpdate, session: Session = Depends(get_session)):
-    """Atualiza paciente."""
-    patient = session.get(Patient, patient_id)
+def update_patient(
+    patient_id: int,
+    patient_data: PatientUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    session: Session = Depends(get_session)
+):
+    """Atualiza paciente (412 se `If-Match` não for a versão atual)."""
+    patient = PatientRepository.update(
+        session, patient_id, patient_data.dict(exclude_unset=True), if_match_version(if_match)
+    )
     if not patient:
         raise HTTPException(status_code=404, detail="Paciente não encontrado")
-    
-    patient = PatientRepository.update(session, patient_id, patient_data.dict(exclude_unset=True))
     logger.info(f"Paciente atualizado: {patient.name}")
+    response.headers["ETag"] = etag(patient.version)
     return patient
 
 @router.delete("/{patient_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1,27 +1,50 @@
 """Router para gerenciamento de salas."""
-from typing import List
-from fastapi import APIRouter, HTTPException, status, Depends
+from typing import List, Optional, Sequence, Union
+from fastapi import APIRouter, HTTPException, status, Depends, Header, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlmodel import Session
 from ..models import Room
-from ..schemas import RoomCreate, RoomUpdate, RoomResponse
+from ..schemas import RoomCreate, RoomUpdate, RoomResponse, BatchRequest, BatchResponse
+from ..batch import IDS_DESCRIPTION, in_request_order, request_ids
+from ..etag import etag, if_match_version
 from ..repository import RoomRepository
 from ..database import get_session
 from ..logger import logger
 
 router = APIRouter(prefix="/api/rooms", tags=["rooms"])
 
+def _rooms_batch(session: Session, ids: Union[str, Sequence[int]]) -> BatchResponse[RoomResponse]:
+    """Salas ativas por ID, na ordem pedida."""
+    wanted = request_ids(ids)
+    rooms, not_found = in_request_order(wanted, RoomRepository.get_many(session, wanted, Room.active == True))
+    return BatchResponse[RoomResponse](items=rooms, not_found=not_found)
+
 @router.get("", response_model=List[RoomResponse])
-def list_rooms(skip: int = 0, limit: int = 100, session: Session = Depends(get_session)):
-    """Lista todas as salas."""
+def list_rooms(
+    skip: int = 0,
+    limit: int = 100,
+    ids: Optional[str] = Query(None, description=IDS_DESCRIPTION),
+    session: Session = Depends(get_session)
+):
+    """Lista todas as salas (ou as de `ids`, em lote)."""
+    if ids is not None:
+        return JSONResponse(jsonable_encoder(_rooms_batch(session, ids)))
     rooms = RoomRepository.get_active_rooms(session)
     return rooms[skip : skip + limit]
 
+@router.post("/batch", response_model=BatchResponse[RoomResponse])
+def get_rooms_batch(request: BatchRequest, session: Session = Depends(get_session)):
+    """Obtém várias salas por ID (listas longas)."""
+    return _rooms_batch(session, request.ids)
+
 @router.get("/{room_id}", response_model=RoomResponse)
-def get_room(room_id: int, session: Session = Depends(get_session)):
-    """Obtém sala por ID."""
+def get_room(room_id: int, response: Response, session: Session = Depends(get_session)):
+    """Obtém sala por ID (com ETag da versão)."""
     room = session.get(Room, room_id)
     if not room or not room.active:
         raise HTTPException(status_code=404, detail="Sala não encontrada")
+    response.headers["ETag"] = etag(room.version)
     return room
 
 @router.post("", response_model=RoomResponse, status_code=status.HTTP_201_CREATED)
@@ -40,14 +63,21 @@ def create_room(room_data: RoomCreate, session: Session = Depends(get_session)):
     return room
 
 @router.put("/{room_id}", response_model=RoomResponse)
-def update_room(room_id: int, room_data: RoomUpdate, session: Session = Depends(get_session)):
-    """Atualiza sala."""
-    room = session.get(Room, room_id)
+def update_room(
+    room_id: int,
+    room_data: RoomUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    session: Session = Depends(get_session)
+):
+    """Atualiza sala (412 se `If-Match` não for a versão atual)."""
+    room = RoomRepository.update(
+        session, room_id, room_data.model_dump(exclude_unset=True), if_match_version(if_match)
+    )
     if not room:
         raise HTTPException(status_code=404, detail="Sala não encontrada")
-    
-    room = RoomRepository.update(session, room_id, room_data.model_dump(exclude_unset=True))
     logger.info(f"Sala atualizada: {room.name}")
+    response.headers["ETag"] = etag(room.version)
     return room
 
 @router.delete("/{room_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -1,19 +1,31 @@
 ﻿"""Router para gerenciamento de usuÃ¡rios (estagiÃ¡rios, professores, admin)."""
-from typing import List
-from fastapi import APIRouter, HTTPException, status, Depends
+import io
+from typing import List, Optional, Sequence, Union
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Header, Query, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from sqlmodel import Session, select
 from ..models import User
-from ..schemas import UserResponse, UserUpdate, UserCreate
+from ..schemas import UserResponse, UserUpdate, UserCreate, BulkImportReport, BatchRequest, BatchResponse
+from ..batch import IDS_DESCRIPTION, in_request_order, request_ids
+from ..etag import etag, if_match_version
 from ..repository import UserRepository
 from ..database import get_session
+from ..bulk_import import import_users
 from ..logger import logger
 from ..enums import UserRole
-from ..security import hash_password
+from ..security import hash_password, principal_cache, require_admin, revoke_user_tokens, rate_limiter
+from ..rate_limit import limit_by_ip
 
 router = APIRouter(prefix="/api/users", tags=["users"])
 
 # POST deve vir ANTES dos GETs para evitar colisÃ£o de rotas
-@router.post("", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "",
+    response_model=UserResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limit_by_ip(rate_limiter, "auth_ip"))],
+)
 def create_user(user_data: UserCreate, session: Session = Depends(get_session)):
     """Cria novo usuÃ¡rio (equivalente a /api/auth/register)."""
     # Verificar se jÃ¡ existe
@@ -37,12 +49,52 @@ def create_user(user_data: UserCreate, session: Session = Depends(get_session)):
     logger.info(f"Novo usuÃ¡rio registrado: {user.email} (role: {user.role})")
     return user
 
+@router.post(
+    "/import",
+    response_model=BulkImportReport,
+    dependencies=[Depends(require_admin), Depends(limit_by_ip(rate_limiter, "auth_ip"))],
+)
+def import_users_csv(file: UploadFile = File(...), session: Session = Depends(get_session)):
+    """Importa usuarios em massa a partir de um CSV (name,email,password,role)."""
+    with io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="") as lines:
+        report = import_users(session, lines)
+    logger.info("Importacao de usuarios via API: %d criados, %d erros", report["created"], len(report["errors"]))
+    return report
+
+def _users_batch(session: Session, ids: Union[str, Sequence[int]]) -> BatchResponse[UserResponse]:
+    """Usuarios ativos por ID, na ordem pedida."""
+    wanted = request_ids(ids)
+    users, not_found = in_request_order(wanted, UserRepository.get_many(session, wanted, User.is_active == True))
+    return BatchResponse[UserResponse](items=users, not_found=not_found)
+
 @router.get("", response_model=List[UserResponse])
-def list_users(skip: int = 0, limit: int = 100, session: Session = Depends(get_session)):
+def list_users(
+    skip: int = 0,
+    limit: int = 100,
+    ids: Optional[str] = Query(None, description=IDS_DESCRIPTION),
+    session: Session = Depends(get_session)
+):
     """Lista todos os usuÃ¡rios."""
+    if ids is not None:
+        return JSONResponse(jsonable_encoder(_users_batch(session, ids)))
     users = UserRepository.get_active_users(session)
     return users[skip : skip + limit]
 
+@router.post("/batch", response_model=BatchResponse[UserResponse])
+def get_users_batch(request: BatchRequest, session: Session = Depends(get_session)):
+    """Obtem varios usuarios por ID (listas longas)."""
+    return _users_batch(session, request.ids)
+
+@router.get("/search", response_model=List[UserResponse])
+def search_users(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    role: Optional[UserRole] = Query(None),
+    session: Session = Depends(get_session),
+):
+    """Busca usuarios por nome ou email (prefixo, sem acentos)."""
+    return UserRepository.search(session, q, limit, role)
+
 @router.get("/students", response_model=List[UserResponse])
 def list_students(session: Session = Depends(get_session)):
     """Lista todos os estagiÃ¡rios."""
@@ -62,23 +114,40 @@ def list_professors(session: Session = Depends(get_session)):
     return professors
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(user_id: int, session: Session = Depends(get_session)):
+def get_user(user_id: int, response: Response, session: Session = Depends(get_session)):
     """ObtÃ©m usuÃ¡rio por ID."""
     user = session.get(User, user_id)
     if not user or not user.is_active:
         raise HTTPException(status_code=404, detail="UsuÃ¡rio nÃ£o encontrado")
+    response.headers["ETag"] = etag(user.version)
     return user
 
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user(user_id: int, user_data: UserUpdate, session: Session = Depends(get_session)):
+def update_user(
+    user_id: int,
+    user_data: UserUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    session: Session = Depends(get_session)
+):
     """Atualiza usuÃ¡rio."""
     user = session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="UsuÃ¡rio nÃ£o encontrado")
-    
-    user = UserRepository.update(session, user_id, user_data.dict(exclude_unset=True))
-    logger.info(f"UsuÃ¡rio atualizado: {user.email}")
-    return user
+    # Dados anteriores (email) para revogar tokens depois do commit
+    session.expunge(user)
+
+    updates = user_data.dict(exclude_unset=True)
+    updated = UserRepository.update(session, user_id, updates, if_match_version(if_match))
+    if not updated:
+        raise HTTPException(status_code=404, detail="UsuÃ¡rio nÃ£o encontrado")
+    if updates.get("is_active") is False:
+        # Desativado: tokens ja emitidos deixam de valer
+        revoke_user_tokens(user)
+    principal_cache.invalidate_user(user_id)
+    logger.info(f"UsuÃ¡rio atualizado: {updated.email}")
+    response.headers["ETag"] = etag(updated.version)
+    return updated
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_user(user_id: int, session: Session = Depends(get_session)):
@@ -88,6 +157,7 @@ def delete_user(user_id: int, session: Session = Depends(get_session)):
         raise HTTPException(status_code=404, detail="UsuÃ¡rio nÃ£o encontrado")
     
     UserRepository.update(session, user_id, {"is_active": False})
+    revoke_user_tokens(user)
     logger.info(f"UsuÃ¡rio desativado: {user.email}")
 
 
@@ -0,0 +1,62 @@
+"""Router de assinaturas de webhook e da fila de entregas (administradores)."""
+import secrets
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlmodel import Session
+from ..models import WebhookSubscription
+from ..schemas import (
+    WebhookDeliveryResponse,
+    WebhookSubscriptionCreate,
+    WebhookSubscriptionCreated,
+    WebhookSubscriptionResponse,
+)
+from ..enums import WebhookDeliveryStatus
+from ..repository import WebhookRepository
+from ..scheduler import utcnow
+from ..security import require_admin
+from ..database import get_session
+from ..logger import logger
+
+router = APIRouter(prefix="/api/webhooks", tags=["webhooks"], dependencies=[Depends(require_admin)])
+
+@router.get("", response_model=List[WebhookSubscriptionResponse])
+def list_subscriptions(session: Session = Depends(get_session)):
+    """Lista as assinaturas (ativas e desativadas)."""
+    return WebhookRepository.get_all(session, limit=1000)
+
+@router.post("", response_model=WebhookSubscriptionCreated, status_code=status.HTTP_201_CREATED)
+def create_subscription(data: WebhookSubscriptionCreate, session: Session = Depends(get_session)):
+    """Cria uma assinatura; sem `secret`, um segredo aleatório é gerado e devolvido uma única vez."""
+    subscription = WebhookRepository.create(session, WebhookSubscription(
+        url=data.url,
+        events=",".join(data.events),
+        secret=data.secret or secrets.token_urlsafe(32),
+        description=data.description,
+    ))
+    logger.info("Assinatura de webhook criada: %s -> %s (%s)", subscription.id, subscription.url, subscription.events)
+    return subscription
+
+@router.delete("/{subscription_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_subscription(subscription_id: int, session: Session = Depends(get_session)):
+    """Desativa a assinatura e cancela as entregas ainda na fila (o histórico é mantido)."""
+    if not WebhookRepository.deactivate(session, subscription_id):
+        raise HTTPException(status_code=404, detail="Assinatura não encontrada")
+    logger.info("Assinatura de webhook desativada: %s", subscription_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.get("/deliveries", response_model=List[WebhookDeliveryResponse])
+def list_deliveries(
+    status: Optional[WebhookDeliveryStatus] = Query(None, description="Ex.: dead (entregas descartadas)"),
+    subscription_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    session: Session = Depends(get_session),
+):
+    """Lista as entregas mais recentes."""
+    return WebhookRepository.list_deliveries(session, status, subscription_id, limit)
+
+@router.post("/deliveries/{delivery_id}/retry", status_code=status.HTTP_202_ACCEPTED)
+def retry_delivery(delivery_id: int, session: Session = Depends(get_session)):
+    """Devolve à fila uma entrega descartada (`dead`)."""
+    if not WebhookRepository.requeue(session, delivery_id, utcnow()):
+        raise HTTPException(status_code=404, detail="Entrega descartada não encontrada")
+    return {"success": True, "message": "Entrega devolvida à fila"}
@@ -0,0 +1,275 @@
+"""Transições automáticas de status dos agendamentos por horário.
+
+Uma thread em segundo plano executa, a cada `SCHEDULER_INTERVAL_SECONDS`:
+
+- `in_progress`: agendado cujo início já passou e o fim ainda não -> em
+  andamento;
+- `completed`: agendado ou em andamento cujo fim já passou -> concluído.
+
+Cancelados e faltas (`no_show`) são decisões da equipe e nunca são
+alterados. Cada transição é um `UPDATE` em lotes sobre o índice
+(status, start_dt), limitado aos agendamentos iniciados nas últimas
+`SCHEDULER_LOOKBACK_HOURS`.
+
+Com vários workers, só quem detém a concessão (`SchedulerLease`) executa:
+ela é renovada a cada execução e dura 3 intervalos, então outro worker
+assume se o atual parar.
+"""
+import os
+import socket
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, NamedTuple, Optional, Sequence
+
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session
+
+from .config import get_settings
+from .database import task_engine as default_engine
+from .enums import AppointmentStatus
+from .logger import logger
+from .metrics import SCHEDULER_ROWS, SCHEDULER_RUN_LATENCY
+from .models import Appointment, SchedulerLease
+from .repository import AppointmentRepository
+
+settings = get_settings()
+
+JOB_NAME = "appointment_status"
+
+
+class Transition(NamedTuple):
+    """Mudança de status aplicada aos agendamentos que casam com `conditions`."""
+
+    name: str
+    from_statuses: Sequence[AppointmentStatus]
+    to_status: AppointmentStatus
+    conditions: Callable[[datetime], tuple]
+
+
+TRANSITIONS = (
+    Transition(
+        "in_progress",
+        (AppointmentStatus.SCHEDULED,),
+        AppointmentStatus.IN_PROGRESS,
+        # Só começou há no máximo a duração máxima de um agendamento
+        lambda now: (
+            Appointment.start_dt > now - timedelta(minutes=settings.MAX_APPOINTMENT_DURATION_MINUTES),
+            Appointment.start_dt <= now,
+            Appointment.end_dt > now,
+        ),
+    ),
+    Transition(
+        "completed",
+        (AppointmentStatus.SCHEDULED, AppointmentStatus.IN_PROGRESS),
+        AppointmentStatus.COMPLETED,
+        # O limite em start_dt restringe a faixa lida no índice (status, start_dt)
+        lambda now: (Appointment.start_dt < now, Appointment.end_dt <= now),
+    ),
+)
+
+
+def acquire_lease(session: Session, name: str, owner: str, now: datetime, seconds: float) -> bool:
+    """
+    Obtém ou renova a concessão de uma tarefa em um único comando.
+
+    O `INSERT ... ON CONFLICT DO UPDATE WHERE` só grava se a concessão não
+    existe, já é de `owner` ou expirou; a contagem de linhas diz o resultado.
+
+    Returns:
+        True se `owner` detém a concessão até `now + seconds`
+    """
+    expires_at = now + timedelta(seconds=seconds)
+    stmt = insert(SchedulerLease).values(name=name, owner=owner, expires_at=expires_at)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[SchedulerLease.name],
+        set_={"owner": owner, "expires_at": expires_at},
+        where=(SchedulerLease.owner == owner) | (SchedulerLease.expires_at <= now),
+    )
+    acquired = session.execute(stmt).rowcount == 1
+    session.commit()
+    return acquired
+
+
+def release_lease(session: Session, name: str, owner: str) -> None:
+    """Encerra a concessão de `owner` para que outro worker assuma já."""
+    session.execute(
+        update(SchedulerLease)
+        .where(SchedulerLease.name == name, SchedulerLease.owner == owner)
+        .values(expires_at=datetime(1970, 1, 1))
+    )
+    session.commit()
+
+
+def utcnow() -> datetime:
+    """Instante atual em UTC sem fuso (formato gravado nas colunas de data)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class PeriodicTask(ABC):
+    """
+    Executa `run_once` a cada `interval_seconds` em uma thread daemon.
+
+    Subclasses implementam `run_once` e podem liberar recursos em
+    `_stopped`. Exceções de uma execução são registradas e contadas em
+    `errors`; a próxima execução ocorre normalmente.
+
+    Args:
+        name: Nome da tarefa (thread e logs)
+        interval_seconds: Intervalo entre execuções
+    """
+
+    def __init__(self, name: str, interval_seconds: float):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._errors = 0
+
+    @abstractmethod
+    def run_once(self, now: Optional[datetime] = None):
+        """Executa a tarefa uma vez."""
+
+    def _loop(self) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception as e:
+                with self._lock:
+                    self._errors += 1
+                logger.error("Falha na tarefa %s: %s", self.name, e, exc_info=True)
+            if self._stop.wait(self.interval_seconds):
+                return
+
+    def _stopped(self) -> None:
+        """Chamado por `stop` (também sem thread, após execuções diretas)."""
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        """Inicia a thread (sem efeito se já estiver rodando)."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Para a thread, aguardando a execução em andamento, e libera recursos."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=self.interval_seconds)
+            self._thread = None
+        self._stopped()
+
+
+class StatusScheduler(PeriodicTask):
+    """
+    Aplica `TRANSITIONS` periodicamente em uma thread daemon.
+
+    Args:
+        engine: Engine do banco
+        interval_seconds: Intervalo entre execuções
+        batch_size: Agendamentos alterados por UPDATE
+        lookback_hours: Janela de início considerada
+        transitions: Transições aplicadas, em ordem
+    """
+
+    def __init__(
+        self,
+        engine,
+        interval_seconds: float,
+        batch_size: int,
+        lookback_hours: float,
+        transitions: Sequence[Transition] = TRANSITIONS,
+    ):
+        super().__init__("status-scheduler", interval_seconds)
+        self.engine = engine
+        self.batch_size = batch_size
+        self.lookback = timedelta(hours=lookback_hours)
+        self.transitions = transitions
+        self.lease_seconds = interval_seconds * 3
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._leader = False
+        self._runs = 0
+        self._skipped = 0
+        self._last_run_ms = 0.0
+        self._rows: Dict[str, int] = {transition.name: 0 for transition in transitions}
+
+    def run_once(self, now: Optional[datetime] = None) -> Optional[Dict[str, int]]:
+        """
+        Executa as transições se este worker detiver a concessão.
+
+        Args:
+            now: Instante de referência em UTC (padrão: agora)
+
+        Returns:
+            Agendamentos alterados por transição, ou None se outro worker
+            detém a concessão
+        """
+        now = now or utcnow()
+        start = time.perf_counter()
+        with Session(self.engine) as session:
+            leader = acquire_lease(session, JOB_NAME, self.owner, now, self.lease_seconds)
+            if not leader:
+                with self._lock:
+                    self._leader = False
+                    self._skipped += 1
+                return None
+            changed = {}
+            for transition in self.transitions:
+                conditions = (Appointment.start_dt >= now - self.lookback, *transition.conditions(now))
+                changed[transition.name] = AppointmentRepository.transition_status(
+                    session, transition.from_statuses, transition.to_status, conditions, self.batch_size
+                )
+        elapsed = time.perf_counter() - start
+
+        SCHEDULER_RUN_LATENCY.labels(JOB_NAME).observe(elapsed)
+        for name, rows in changed.items():
+            SCHEDULER_ROWS.labels(JOB_NAME, name).inc(rows)
+        with self._lock:
+            self._leader = True
+            self._runs += 1
+            self._last_run_ms = elapsed * 1000
+            for name, rows in changed.items():
+                self._rows[name] += rows
+        if any(changed.values()):
+            logger.info("Transições de status aplicadas em %.1fms: %s", elapsed * 1000, changed)
+        return changed
+
+    def _stopped(self) -> None:
+        # Libera a concessão para que outro worker assuma sem esperar expirar
+        if not self._leader:
+            return
+        try:
+            with Session(self.engine) as session:
+                release_lease(session, JOB_NAME, self.owner)
+        except Exception as e:
+            logger.warning("Falha ao liberar a concessão do agendador: %s", e)
+
+    def metrics(self) -> dict:
+        """Retorna execuções, duração da última e agendamentos alterados."""
+        with self._lock:
+            return {
+                "running": self.running,
+                "leader": self._leader,
+                "runs": self._runs,
+                "skipped": self._skipped,
+                "errors": self._errors,
+                "last_run_ms": round(self._last_run_ms, 3),
+                "transitions": {name: {"rows": rows} for name, rows in self._rows.items()},
+            }
+
+
+status_scheduler = StatusScheduler(
+    default_engine,
+    interval_seconds=settings.SCHEDULER_INTERVAL_SECONDS,
+    batch_size=settings.SCHEDULER_BATCH_SIZE,
+    lookback_hours=settings.SCHEDULER_LOOKBACK_HOURS,
+)
@@ -1,8 +1,10 @@
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Generic, Optional, List, TypeVar
+import httpx
 from pydantic import field_validator, BaseModel, EmailStr, Field, ValidationInfo
 from pydantic import ConfigDict
-from backend.enums import UserRole, AppointmentStatus
+from backend.enums import UserRole, AppointmentStatus, WebhookDeliveryStatus
+from backend.outbox import EVENTS as WEBHOOK_EVENTS
 
 # ===== Responses (Leitura) =====
 
@@ -14,6 +16,7 @@ class RoomResponse(BaseModel):
     active: bool
     created_at: datetime
     updated_at: datetime
+    version: int
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -28,6 +31,7 @@ class PatientResponse(BaseModel):
     active: bool
     created_at: datetime
     updated_at: datetime
+    version: int
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -38,6 +42,7 @@ class UserResponse(BaseModel):
     role: UserRole
     is_active: bool
     created_at: datetime
+    version: int
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -53,6 +58,7 @@ class AppointmentResponse(BaseModel):
     supervisor: Optional[UserResponse]
     created_at: datetime
     updated_at: datetime
+    version: int
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -67,6 +73,14 @@ class AppointmentListResponse(BaseModel):
     student_name: Optional[str]
     supervisor_name: Optional[str]
 
+class AppointmentSearchResponse(BaseModel):
+    """Página de uma busca de agendamentos com as contagens totais."""
+    total: int
+    status_counts: Dict[AppointmentStatus, int]
+    limit: int
+    offset: int
+    items: List[AppointmentListResponse]
+
 # ===== Requests (Criação/Atualização) =====
 
 class RoomCreate(BaseModel):
@@ -150,11 +164,45 @@ class ValidationErrorResponse(BaseModel):
     message: str
     errors: List[ErrorDetail]
 
+# ===== Importação em massa =====
+
+class BulkImportRowError(BaseModel):
+    line: int
+    email: Optional[str] = None
+    message: str
+
+class BulkImportReport(BaseModel):
+    """Relatório de importação em massa via CSV."""
+    total: int
+    created: int
+    errors: List[BulkImportRowError]
+
+# ===== Leitura em lote =====
+
+T = TypeVar("T")
+
+class BatchRequest(BaseModel):
+    """IDs para leitura em lote (POST /batch)."""
+    ids: List[int] = Field(..., min_length=1)
+
+class BatchResponse(BaseModel, Generic[T]):
+    """Itens na ordem dos IDs pedidos e IDs não encontrados."""
+    items: List[T]
+    not_found: List[int]
+
 # ===== Auth =====
 
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
 
 class LoginRequest(BaseModel):
     email: EmailStr
@@ -162,3 +210,63 @@ class LoginRequest(BaseModel):
 
 
 
+
+# ===== Webhooks =====
+
+class WebhookSubscriptionCreate(BaseModel):
+    url: str = Field(..., max_length=500, pattern=r"^https?://")
+    events: List[str] = Field(default_factory=lambda: ["*"], min_length=1)
+    secret: Optional[str] = Field(default=None, min_length=16, max_length=100)
+    description: Optional[str] = Field(default=None, max_length=200)
+
+    @field_validator('url')
+    def valid_url(cls, v):
+        # O mesmo parser do envio: URL aceita aqui é URL que o dispatcher consegue postar
+        try:
+            url = httpx.URL(v)
+        except httpx.InvalidURL as e:
+            raise ValueError(f"URL inválida: {e}")
+        if not url.host:
+            raise ValueError("URL sem host")
+        return v
+
+    @field_validator('events')
+    def known_events(cls, v):
+        unknown = [event for event in v if event != "*" and event not in WEBHOOK_EVENTS]
+        if unknown:
+            raise ValueError(f"Eventos desconhecidos: {', '.join(unknown)} (disponíveis: {', '.join(WEBHOOK_EVENTS)})")
+        return ["*"] if "*" in v else list(dict.fromkeys(v))
+
+class WebhookSubscriptionResponse(BaseModel):
+    id: int
+    url: str
+    events: List[str]
+    description: Optional[str]
+    active: bool
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+    @field_validator('events', mode='before')
+    def split_events(cls, v):
+        # Gravados separados por vírgula
+        return v.split(",") if isinstance(v, str) else v
+
+class WebhookSubscriptionCreated(WebhookSubscriptionResponse):
+    """Assinatura criada; o segredo só é mostrado nesta resposta."""
+    secret: str
+
+class WebhookDeliveryResponse(BaseModel):
+    id: int
+    subscription_id: int
+    event: str
+    status: WebhookDeliveryStatus
+    attempts: int
+    next_attempt_at: datetime
+    last_error: Optional[str]
+    response_status: Optional[int]
+    delivered_at: Optional[datetime]
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,184 @@
+"""Busca textual (SQLite FTS5) de pacientes e usuários.
+
+Cada tabela indexada tem uma tabela virtual FTS5 com o mesmo `rowid`,
+mantida por gatilhos de INSERT/UPDATE/DELETE. O tokenizador `unicode61
+remove_diacritics 2` ignora acentos ("joao" encontra "João") e os índices
+de prefixo (`prefix='2 3 4'`) tornam barata a busca por termos parciais
+enquanto o usuário digita. O telefone também é indexado só com dígitos,
+com e sem DDD ("4499999" e "999990001" encontram "(44) 99999-0001").
+
+O ranking (bm25) é calculado apenas para os primeiros `RANK_CANDIDATES`
+resultados visíveis: prefixos curtos como "si" casam com boa parte da
+tabela, e ordenar todos custaria dezenas de ms a cada tecla. Os filtros da
+busca (ex.: apenas ativos) são aplicados antes desse corte, para que
+registros ocultos não ocupem as vagas. Termos mais específicos ficam abaixo
+do limite e são ordenados por completo.
+
+As tabelas e gatilhos são criados junto com `SQLModel.metadata.create_all`
+(o índice é preenchido com os registros existentes na primeira vez) e
+removidos com `drop_all`.
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import column, event, literal_column, select, table, text
+from sqlmodel import SQLModel
+
+# Máximo de termos considerados em uma busca
+MAX_TERMS = 8
+# Resultados visíveis ordenados por relevância em cada busca
+RANK_CANDIDATES = 1000
+
+_TOKEN = re.compile(r"[^\W_]+")
+_PHONE = re.compile(r"[\d\s()+\-.]*\d[\d\s()+\-.]*")
+
+
+def _digits(expr: str) -> str:
+    """Expressão SQL com o telefone sem pontuação."""
+    for char in ("(", ")", "-", " ", "+", "."):
+        expr = f"replace({expr}, '{char}', '')"
+    return expr
+
+
+def _phone_terms(expr: str) -> str:
+    """Dígitos do telefone, com e sem o DDD (números com 10+ dígitos)."""
+    digits = _digits(expr)
+    return f"CASE WHEN length({digits}) >= 10 THEN {digits} || ' ' || substr({digits}, 3) ELSE {digits} END"
+
+
+class FtsIndex:
+    """
+    Índice FTS5 espelhando colunas de uma tabela.
+
+    Args:
+        source: Nome da tabela de origem
+        columns: Colunas indexadas: nome no índice -> expressão sobre a linha
+            (`{row}` é substituído por `new`/`old` nos gatilhos)
+        weights: Peso de cada coluna no ranking bm25
+    """
+
+    def __init__(self, source: str, columns: dict, weights: tuple):
+        self.source = source
+        self.name = f"{source}_fts"
+        self.columns = columns
+        self.weights = weights
+        self.table = table(self.name, column("rowid"))
+
+    def _values(self, row: str) -> str:
+        return ", ".join(expr.format(row=row) for expr in self.columns.values())
+
+    def ddl(self) -> list:
+        names = ", ".join(self.columns)
+        source = f'"{self.source}"'
+        watched = ", ".join(dict.fromkeys(
+            match for expr in self.columns.values() for match in re.findall(r"\{row\}\.(\w+)", expr)
+        ))
+        return [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.name} USING fts5("
+            f"{names}, tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')",
+            f"CREATE TRIGGER IF NOT EXISTS {self.name}_ai AFTER INSERT ON {source} BEGIN "
+            f"INSERT INTO {self.name}(rowid, {names}) VALUES (new.id, {self._values('new')}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {self.name}_ad AFTER DELETE ON {source} BEGIN "
+            f"DELETE FROM {self.name} WHERE rowid = old.id; END",
+            f"CREATE TRIGGER IF NOT EXISTS {self.name}_au AFTER UPDATE OF {watched} ON {source} BEGIN "
+            f"DELETE FROM {self.name} WHERE rowid = old.id; "
+            f"INSERT INTO {self.name}(rowid, {names}) VALUES (new.id, {self._values('new')}); END",
+        ]
+
+    def populate(self) -> str:
+        values = self._values(f'"{self.source}"')
+        return (
+            f"INSERT INTO {self.name}(rowid, {', '.join(self.columns)}) "
+            f'SELECT "{self.source}".id, {values} FROM "{self.source}"'
+        )
+
+    def candidates(self, query: str, limit: int, *conditions):
+        """
+        Subconsulta (rowid, score) com os `limit` resultados mais relevantes
+        entre os primeiros `RANK_CANDIDATES` que passam pelos filtros.
+
+        Args:
+            query: Consulta FTS5 (ver `fts_query`)
+            limit: Quantidade de resultados
+            conditions: Filtros sobre a tabela de origem (ex.: apenas ativos),
+                aplicados antes do corte em `RANK_CANDIDATES`
+
+        Returns:
+            Subconsulta para `join` com a tabela de origem; ordene por `score`
+            (menor = mais relevante)
+        """
+        source = SQLModel.metadata.tables[self.source]
+        weights = ", ".join(str(weight) for weight in self.weights)
+        score = literal_column(f"bm25({self.name}, {weights})").label("score")
+        stmt = select(self.table.c.rowid, score).where(
+            text(f"{self.name} MATCH :fts_query").bindparams(fts_query=query)
+        )
+        if conditions:
+            # EXISTS correlacionado em vez de JOIN: com o JOIN o planejador pode
+            # partir de um índice da tabela de origem (ex.: `active`) e consultar
+            # o FTS linha a linha; assim o índice FTS conduz a busca.
+            stmt = stmt.where(select(source.c.id).where(source.c.id == self.table.c.rowid, *conditions).exists())
+        ranked = stmt.limit(RANK_CANDIDATES).subquery()
+        return select(ranked).order_by(ranked.c.score).limit(limit).subquery()
+
+
+PATIENT_INDEX = FtsIndex(
+    "patient",
+    {
+        "name": "{row}.name",
+        "email": "{row}.email",
+        "phone": "{row}.phone",
+        "phone_digits": _phone_terms("{row}.phone"),
+        "notes": "{row}.notes",
+    },
+    weights=(10.0, 4.0, 4.0, 4.0, 1.0),
+)
+USER_INDEX = FtsIndex(
+    "user",
+    {"name": "{row}.name", "email": "{row}.email"},
+    weights=(10.0, 4.0),
+)
+INDEXES = (PATIENT_INDEX, USER_INDEX)
+
+
+def fts_query(text_query: str) -> Optional[str]:
+    """
+    Converte o texto digitado em uma consulta FTS5 segura.
+
+    Cada termo vira um prefixo entre aspas (`"joa"*`), todos obrigatórios;
+    operadores e pontuação do usuário são descartados. Texto que parece um
+    telefone ("(44) 9") vira um único prefixo de dígitos ("449"), casado com
+    a coluna de dígitos do telefone.
+
+    Returns:
+        Consulta FTS5, ou None se não houver termos
+    """
+    if _PHONE.fullmatch(text_query):
+        digits = re.sub(r"\D", "", text_query)
+        return f'"{digits}"*' if digits else None
+    terms = _TOKEN.findall(text_query)[:MAX_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+@event.listens_for(SQLModel.metadata, "after_create")
+def _create_indexes(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    for index in INDEXES:
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (index.name,)
+        ).first()
+        for statement in index.ddl():
+            connection.exec_driver_sql(statement)
+        if not exists:
+            connection.exec_driver_sql(index.populate())
+
+
+@event.listens_for(SQLModel.metadata, "after_drop")
+def _drop_indexes(target, connection, **kw):
+    if connection.dialect.name != "sqlite":
+        return
+    for index in INDEXES:
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {index.name}")
@@ -1,60 +1,232 @@
+import time
+import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlmodel import Session
 from .config import get_settings
 from .models import User
+from .enums import UserRole
 from .logger import logger
 from .database import get_session
 from .repository import UserRepository
+from .password_hasher import PasswordHasher
+from .principal_cache import PrincipalCache
+from .revocation import build_revocation_list
+from .rate_limit import RateLimiter, RateLimitRule, build_store
 
 settings = get_settings()
 security = HTTPBearer()
 
 # Password hashing
-# Use pbkdf2_sha256 to avoid bcrypt 72-byte password length limitation
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Use pbkdf2_sha256 to avoid bcrypt 72-byte password length limitation.
+# O cálculo roda em um pool de processos limitado (ver password_hasher.py).
+password_hasher = PasswordHasher(
+    rounds=settings.PASSWORD_HASH_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    niceness=settings.PASSWORD_HASH_NICENESS,
+)
+pwd_context = password_hasher.context
+# Importação em massa: pool próprio, para que milhares de senhas não esperem
+# atrás do limite de fila dos logins nem o ocupem
+import_hasher = PasswordHasher(
+    rounds=settings.PASSWORD_HASH_ROUNDS,
+    workers=settings.BULK_IMPORT_HASH_WORKERS,
+    max_pending=max(1, settings.BULK_IMPORT_HASH_WORKERS) * settings.BULK_IMPORT_MAX_CONCURRENT,
+    niceness=settings.PASSWORD_HASH_NICENESS,
+)
+
+# Usuários autenticados por token (evita decodificar o JWT e consultar o banco
+# a cada requisição)
+principal_cache = PrincipalCache(
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+)
+
+# Limitação de taxa das rotas que calculam hash de senha
+rate_limiter = RateLimiter(
+    store=build_store(settings.RATE_LIMIT_STORE_URL, settings.RATE_LIMIT_MAX_KEYS),
+    rules={
+        "auth_ip": RateLimitRule("auth_ip", settings.RATE_LIMIT_IP_PER_MINUTE, settings.RATE_LIMIT_IP_BURST),
+        "login_account": RateLimitRule(
+            "login_account", settings.RATE_LIMIT_ACCOUNT_PER_MINUTE, settings.RATE_LIMIT_ACCOUNT_BURST
+        ),
+    },
+    enabled=settings.RATE_LIMIT_ENABLED,
+)
 
 def hash_password(password: str) -> str:
     """Hash de senha."""
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica senha."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify(plain_password, hashed_password)
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+def upgrade_password_hash(bind, user_id: int, plain_password: str) -> None:
+    """
+    Regera o hash de um usuário com o fator de trabalho atual.
+
+    Executado em background após um login bem-sucedido cujo hash estava
+    desatualizado; usa uma sessão própria ligada ao mesmo engine da requisição.
+    """
+    try:
+        new_hash = password_hasher.hash(plain_password)
+        with Session(bind) as session:
+            user = session.get(User, user_id)
+            if user and password_hasher.needs_update(user.hashed_password):
+                user.hashed_password = new_hash
+                session.commit()
+                logger.info("Hash de senha atualizado para o usuário %s", user_id)
+    except Exception as e:
+        logger.warning("Falha ao atualizar hash de senha do usuário %s: %s", user_id, e)
+
+# Tokens revogados (logout, rotação de refresh token, usuário desativado)
+revocation_list = build_revocation_list(
+    settings.REVOCATION_STORE_URL,
+    capacity=settings.REVOCATION_LIST_CAPACITY,
+    error_rate=settings.REVOCATION_LIST_ERROR_RATE,
+    max_ttl_seconds=settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400,
+)
+
+def create_access_token(
+    data: dict,
+    expires_delta: Optional[timedelta] = None,
+    token_type: str = "access",
+) -> str:
     """Cria JWT token."""
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({
+        "exp": expire,
+        "iat": time.time(),
+        "jti": uuid.uuid4().hex,
+        "type": token_type,
+    })
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str) -> dict:
+def create_refresh_token(subject: str, family: Optional[str] = None) -> str:
+    """Cria refresh token (usado apenas em /api/auth/refresh)."""
+    return create_access_token(
+        {"sub": subject, "fam": family or uuid.uuid4().hex},
+        expires_delta=timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+        token_type="refresh",
+    )
+
+def create_token_pair(user: User, family: Optional[str] = None) -> dict:
+    """
+    Cria par access/refresh token para o usuário.
+
+    Args:
+        user: Usuário autenticado
+        family: Família da rotação (padrão: nova, para um login)
+    """
+    family = family or uuid.uuid4().hex
+    return {
+        "access_token": create_access_token({"sub": user.email, "role": UserRole(user.role).value, "fam": family}),
+        "refresh_token": create_refresh_token(user.email, family),
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+def verify_token(token: str, expected_type: str = "access") -> dict:
     """Verifica e decodifica JWT token."""
+    payload = _decode_token(token, expected_type)
+    if is_token_revoked(payload):
+        logger.warning("Token revogado recebido para %s", payload["sub"])
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revogado")
+    return payload
+
+def _decode_token(token: str, expected_type: str) -> dict:
+    """Decodifica o token e confere o tipo (sem consultar revogações)."""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido")
-        return payload
     except JWTError:
         logger.warning(f"Token inválido recebido")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido")
 
+    email: str = payload.get("sub")
+    # Tokens emitidos antes dos refresh tokens não têm "type": são de acesso
+    if email is None or payload.get("type", "access") != expected_type:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido")
+    return payload
+
+def is_token_revoked(payload: dict) -> bool:
+    """Verifica revogação individual (jti), da família (reuso) e do usuário (desativação)."""
+    jti = payload.get("jti")
+    if jti and revocation_list.is_revoked(jti, payload["exp"]):
+        return True
+    family = payload.get("fam")
+    if family and revocation_list.is_family_revoked(family):
+        return True
+    return revocation_list.is_subject_revoked(payload["sub"], payload.get("iat", 0))
+
+def consume_refresh_token(token: str) -> dict:
+    """
+    Valida um refresh token e o revoga na mesma operação (uso único).
+
+    Entre requisições simultâneas com o mesmo token só uma passa. Um token
+    já trocado sendo usado de novo indica vazamento: toda a família (os
+    tokens derivados do mesmo login, inclusive os já emitidos na rotação)
+    é revogada e o usuário precisa entrar de novo.
+
+    Raises:
+        HTTPException: 401 se o token for inválido, revogado ou reusado
+    """
+    payload = _decode_token(token, "refresh")
+    if not is_token_revoked(payload) and revocation_list.revoke(payload["jti"], payload["exp"]):
+        return payload
+    family = payload.get("fam")
+    if family and not revocation_list.is_family_revoked(family):
+        revocation_list.revoke_family(family)
+        logger.warning("Reuso de refresh token para %s: família de tokens revogada", payload["sub"])
+    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revogado")
+
+def revoke_token(token: str, payload: dict) -> None:
+    """Revoga um token decodificado até sua expiração."""
+    if payload.get("jti"):
+        revocation_list.revoke(payload["jti"], payload["exp"])
+    principal_cache.invalidate_token(token)
+
+def revoke_user_tokens(user: User) -> None:
+    """Revoga todos os tokens já emitidos para o usuário."""
+    revocation_list.revoke_subject(user.email)
+    principal_cache.invalidate_user(user.id)
+
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     session: Session = Depends(get_session)
 ) -> User:
     """Obtém usuário autenticado a partir do token."""
-    token = credentials.credentials
+    return resolve_principal(session, credentials.credentials)
+
+def resolve_principal(session: Session, token: str) -> User:
+    """
+    Usuário atual do token (cache de principais ou banco).
+
+    O papel vem do usuário, não da claim `role` do token: um administrador
+    rebaixado perde o acesso sem precisar de um token novo. A revogação é
+    conferida também nos acertos do cache, para que um token revogado
+    (inclusive por outro worker, com a lista compartilhada) pare de valer
+    na hora.
+
+    Raises:
+        HTTPException: 401 se o token for inválido ou o usuário não existir
+    """
+    cached = principal_cache.get(token)
+    if cached is not None:
+        user, payload = cached
+        if not is_token_revoked(payload):
+            return user
+        principal_cache.invalidate_token(token)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revogado")
     payload = verify_token(token)
     email = payload.get("sub")
     if not email:
@@ -62,6 +234,11 @@ def get_current_user(
     user = UserRepository.get_by_email(session, email)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuário não encontrado")
+    principal_cache.put(token, user, payload)
     return user
 
-
+def require_admin(user: User = Depends(get_current_user)) -> User:
+    """Exige usuário autenticado com papel de administrador."""
+    if user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso restrito a administradores")
+    return user
@@ -1,4 +1,8 @@
-﻿"""Script para popular banco de dados com dados de teste."""
+﻿"""Script para popular banco de dados com dados de teste.
+
+Não roda na inicialização da API (exceto com `SEED_ON_STARTUP` ou banco em
+memória); execute uma vez: `python -m backend.seed_data`.
+"""
 from datetime import datetime, timedelta, timezone
 from .models import Room, Patient, User, Appointment
 from .security import hash_password
@@ -13,25 +17,9 @@ def seed_database():
 
     try:
         with get_session_context() as session:
-            # Verificar se já existe dados
-            count = session.exec(select(Room)).first()
-            if count:
-                # Se já existem dados, garantir que registros essenciais estejam ativos
-                from sqlmodel import select
-                inactive_patients = session.exec(select(Patient).where(Patient.active == False)).all()
-                if inactive_patients:
-                    for p in inactive_patients:
-                        p.active = True
-                    session.commit()
-                    logger.info(f"Atualizados {len(inactive_patients)} pacientes para active=True")
-
-                inactive_users = session.exec(select(User).where(User.is_active == False)).all()
-                if inactive_users:
-                    for u in inactive_users:
-                        u.is_active = True
-                    session.commit()
-                    logger.info(f"Atualizados {len(inactive_users)} usuários para is_active=True")
-
+            # Seed é único: com dados existentes não altera nada (registros
+            # desativados continuam desativados)
+            if session.exec(select(Room.id).limit(1)).first() is not None:
                 logger.info("Banco de dados já contém dados. Pulando criação inicial de seed.")
                 return
 
@@ -142,8 +130,6 @@ def seed_database():
 
 
 if __name__ == "__main__":
-    from .database import create_db_and_tables
-    create_db_and_tables()
+    from .database import ensure_schema
+    ensure_schema()
     seed_database()
-
-
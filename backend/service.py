@@ -11,6 +11,7 @@ from backend.enums import AppointmentStatus, UserRole
 from backend.enums import minutes_between, get_day_start, get_day_end
 from .config import get_settings
 from .logger import logger
+from .metrics import CONFLICT_CHECK_LATENCY
 
 settings = get_settings()
 
@@ -65,12 +66,12 @@ class AppointmentService:
         # 2. Validar entidades existem e estão ativas
         room = session.get(Room, room_id)
         if not room or not room.active:
-            logger.warning(f"Sala {room_id} não encontrada ou inativa")
+            logger.warning("Sala %s não encontrada ou inativa", room_id)
             return False, "Sala não encontrada ou inativa."
 
         patient = session.get(Patient, patient_id)
         if not patient or not patient.active:
-            logger.warning(f"Paciente {patient_id} não encontrado ou inativo")
+            logger.warning("Paciente %s não encontrado ou inativo", patient_id)
             return False, "Paciente não encontrado ou inativo."
 
         student = session.get(User, student_id)
@@ -79,7 +80,7 @@ class AppointmentService:
             or not student.is_active
             or student.role != UserRole.STUDENT
         ):
-            logger.warning(f"Estagiário {student_id} não encontrado ou inativo")
+            logger.warning("Estagiário %s não encontrado ou inativo", student_id)
             return False, "Estagiário não encontrado ou inativo."
 
         supervisor = session.get(User, supervisor_id)
@@ -88,7 +89,7 @@ class AppointmentService:
             or not supervisor.is_active
             or supervisor.role != UserRole.PROFESSOR
         ):
-            logger.warning(f"Supervisor {supervisor_id} não encontrado ou inativo")
+            logger.warning("Supervisor %s não encontrado ou inativo", supervisor_id)
             return False, "Supervisor não encontrado ou inativo."
 
         # 3. Validar conflitos de horário
@@ -96,7 +97,7 @@ class AppointmentService:
             session, start_dt, end_dt, room_id, student_id, supervisor_id
         )
         if conflicts:
-            logger.warning(f"Conflitos detectados: {conflicts}")
+            logger.warning("Conflitos detectados: %s", conflicts)
             return False, f"Conflito de horário detectado: {', '.join(conflicts)}"
 
         # 4. Validar limite de horas do estagiário por dia
@@ -104,19 +105,18 @@ class AppointmentService:
             session, student_id, start_dt
         )
         if max_reached:
-            logger.warning(
-                f"Estagiário {student_id} atingiu limite diário: {hours}h"
-            )
+            logger.warning("Estagiário %s atingiu limite diário: %sh", student_id, hours)
             return False, (
                 f"Estagiário atingiu limite de "
                 f"{settings.MAX_STUDENT_HOURS_PER_DAY}h por dia. "
                 f"Horas agendadas: {hours:.1f}h"
             )
 
-        logger.info(f"Validação de agendamento aprovada para sala {room_id}")
+        logger.info("Validação de agendamento aprovada para sala %s", room_id)
         return True, None
 
     @staticmethod
+    @CONFLICT_CHECK_LATENCY.time()
     def check_conflicts(
         session: Session,
         start_dt: datetime,
@@ -0,0 +1,221 @@
+"""Servidor do frontend estático com arquivos versionados e pré-comprimidos.
+
+Na inicialização todos os arquivos de `frontend/` são lidos uma única vez,
+recebem um nome com hash do conteúdo (ex: `app.3f2a9c1b0d.js`) e são
+comprimidos com gzip (e brotli, se disponível). As páginas HTML são
+reescritas para referenciar os nomes versionados, o que permite servir os
+assets com cache de longa duração (`immutable`). Elas também recebem
+`<meta name="api-base-url" content="">`: servido pelo backend, o frontend
+chama a API na mesma origem.
+"""
+import gzip
+import hashlib
+import mimetypes
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse, RedirectResponse, Response
+from starlette.types import Receive, Scope, Send
+
+from .compression import accepts_encoding, brotli
+from .logger import logger
+
+FRONTEND_DIR = Path(__file__).resolve().parent.parent / "frontend"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# Arquivos que não fazem parte do site publicado
+IGNORED_FILES = {"README.md", ".nojekyll"}
+
+# Tipos de conteúdo que valem a pena comprimir
+COMPRESSIBLE_PREFIXES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+# Referências em HTML: href="..." ou src="..."
+ASSET_REFERENCE = re.compile(r'(?P<attr>\b(?:href|src))="(?P<url>[^"#?:]+)"')
+
+HEAD_TAG = re.compile(r"<head[^>]*>", re.IGNORECASE)
+# Base da API lida por app.js (vazia = mesma origem que serviu a página)
+API_BASE_META = '<meta name="api-base-url" content="">'
+
+
+class StaticAsset:
+    """
+    Arquivo estático carregado em memória com suas versões comprimidas.
+
+    Attributes:
+        body: Conteúdo original
+        gzip_body: Conteúdo comprimido com gzip (ou None se não compensar)
+        br_body: Conteúdo comprimido com brotli (ou None)
+        media_type: Content-Type do arquivo
+        etag: ETag forte baseado no hash do conteúdo
+        cache_control: Valor do cabeçalho Cache-Control
+    """
+
+    def __init__(self, body: bytes, media_type: str, digest: str, immutable: bool):
+        self.body = body
+        self.media_type = media_type
+        self.etag = f'"{digest[:16]}"'
+        self.cache_control = IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+        self.gzip_body: Optional[bytes] = None
+        self.br_body: Optional[bytes] = None
+
+        if media_type.startswith(COMPRESSIBLE_PREFIXES):
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.gzip_body = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.br_body = compressed
+
+    def select_body(self, accept_encoding: str):
+        """
+        Escolhe a melhor representação aceita pelo cliente.
+
+        Args:
+            accept_encoding: Valor do cabeçalho Accept-Encoding
+
+        Returns:
+            Tupla (corpo, content_encoding ou None)
+        """
+        if self.br_body is not None and accepts_encoding(accept_encoding, "br"):
+            return self.br_body, "br"
+        if self.gzip_body is not None and accepts_encoding(accept_encoding, "gzip"):
+            return self.gzip_body, "gzip"
+        return self.body, None
+
+
+def hashed_name(path: str, digest: str) -> str:
+    """
+    Retorna o caminho com o hash do conteúdo inserido antes da extensão.
+
+    Args:
+        path: Caminho relativo (ex: "assets/js/app.js")
+        digest: Hash hexadecimal do conteúdo
+
+    Returns:
+        Caminho versionado (ex: "assets/js/app.3f2a9c1b0d.js")
+    """
+    p = Path(path)
+    return p.with_name(f"{p.stem}.{digest[:10]}{p.suffix}").as_posix()
+
+
+def _resolve_reference(html_path: str, url: str) -> str:
+    """Resolve uma URL relativa de um HTML para um caminho relativo à raiz."""
+    if url.startswith("/"):
+        return url.lstrip("/")
+    base = Path(html_path).parent
+    parts = []
+    for part in (base / url).as_posix().split("/"):
+        if part in ("", "."):
+            continue
+        if part == "..":
+            if parts:
+                parts.pop()
+            continue
+        parts.append(part)
+    return "/".join(parts)
+
+
+class FrontendApp:
+    """
+    Aplicação ASGI que serve o frontend a partir da memória.
+
+    Deve ser montada com `app.mount(<prefixo>, FrontendApp(...))`.
+    """
+
+    def __init__(self, directory: Path = FRONTEND_DIR, index: str = "index.html"):
+        self.directory = Path(directory)
+        self.index = index
+        self.assets: Dict[str, StaticAsset] = {}
+        self.build()
+
+    def build(self) -> None:
+        """Carrega, versiona e comprime todos os arquivos do frontend."""
+        sources: Dict[str, bytes] = {}
+        for file in sorted(self.directory.rglob("*")):
+            if not file.is_file() or file.name in IGNORED_FILES:
+                continue
+            sources[file.relative_to(self.directory).as_posix()] = file.read_bytes()
+
+        assets: Dict[str, StaticAsset] = {}
+        versioned: Dict[str, str] = {}
+        for path, body in sources.items():
+            if path.endswith(".html"):
+                continue
+            media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            digest = hashlib.sha256(body).hexdigest()
+            versioned[path] = hashed_name(path, digest)
+            assets[versioned[path]] = StaticAsset(body, media_type, digest, immutable=True)
+            # O caminho original continua disponível, mas sempre revalidado
+            assets[path] = StaticAsset(body, media_type, digest, immutable=False)
+
+        for path, body in sources.items():
+            if not path.endswith(".html"):
+                continue
+
+            def rewrite(match, html_path=path):
+                target = _resolve_reference(html_path, match.group("url"))
+                if target not in versioned:
+                    return match.group(0)
+                url = match.group("url")
+                url_dir = url[: len(url) - len(Path(url).name)]
+                return f'{match.group("attr")}="{url_dir}{Path(versioned[target]).name}"'
+
+            html = ASSET_REFERENCE.sub(rewrite, body.decode("utf-8"))
+            html = HEAD_TAG.sub(lambda match: f"{match.group(0)}\n    {API_BASE_META}", html, count=1)
+            encoded = html.encode("utf-8")
+            digest = hashlib.sha256(encoded).hexdigest()
+            assets[path] = StaticAsset(encoded, "text/html; charset=utf-8", digest, immutable=False)
+
+        self.assets = assets
+        logger.info("Frontend carregado: %d arquivos de %s", len(sources), self.directory)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+            await response(scope, receive, send)
+            return
+
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        path = path.lstrip("/")
+        if path == "" or path.endswith("/"):
+            path = f"{path}{self.index}"
+
+        asset = self.assets.get(path)
+        if asset is None and f"{path}/{self.index}" in self.assets:
+            response = RedirectResponse(url=f"{scope['path']}/", status_code=307)
+            await response(scope, receive, send)
+            return
+        if asset is None:
+            response = PlainTextResponse("Not Found", status_code=404)
+            await response(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        headers = {
+            "ETag": asset.etag,
+            "Cache-Control": asset.cache_control,
+            "Vary": "Accept-Encoding",
+        }
+        if request_headers.get("if-none-match") == asset.etag:
+            response = Response(status_code=304, headers=headers)
+            await response(scope, receive, send)
+            return
+
+        body, encoding = asset.select_body(request_headers.get("accept-encoding", ""))
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        if scope["method"] == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            body = b""
+        response = Response(body, media_type=asset.media_type, headers=headers)
+        await response(scope, receive, send)
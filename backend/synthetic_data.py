@@ -0,0 +1,383 @@
+"""Gerador de dados sintéticos em escala para testes de capacidade.
+
+Complementa `seed_data` (poucos registros de demonstração) com uma clínica
+realista em qualquer escala: salas, estagiários, professores, pacientes e
+agendamentos semanais sem conflitos. O resultado é determinístico para a
+mesma semente e o mesmo `now`, que por padrão é a data fixa `DEFAULT_NOW`
+(use `--now` para gerar em torno de outra data, ou `--now now` para hoje).
+
+Modelo dos agendamentos: a semana tem 50 horários (seg-sex, 08h-18h, 1h). Em
+cada sala e horário acontecem "séries" semanais — mesmo paciente, estagiário
+e supervisor por algumas semanas — intercaladas com semanas livres. Em um
+mesmo horário nenhum estagiário, supervisor ou paciente aparece em duas
+salas, e o estagiário respeita `MAX_STUDENT_HOURS_PER_DAY`. Todas as salas e
+pessoas são novas, então os agendamentos gerados também não conflitam com
+dados já existentes.
+
+A inserção usa `executemany` direto no driver do SQLite (valores já no
+formato armazenado pelo SQLAlchemy); em outros bancos usa o `insert()` em
+lote do SQLAlchemy.
+
+Uso:
+    python -m backend.synthetic_data --preset capacity --seed 42
+    python -m backend.synthetic_data --rooms 10 --students 100 --appointments 50000 --reset
+    python -m backend.synthetic_data --preset clinic --now 2026-03-02T08:00
+"""
+import argparse
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Engine
+from sqlmodel import SQLModel
+
+from .config import get_settings
+from .enums import AppointmentStatus, UserRole
+from .logger import logger
+from .models import Appointment, Patient, Room, User
+from .password_hasher import hash_with_rounds
+
+settings = get_settings()
+
+PRESETS: Dict[str, Dict[str, int]] = {
+    "small": {"rooms": 5, "students": 40, "professors": 5, "patients": 500, "appointments": 5_000},
+    "clinic": {"rooms": 12, "students": 200, "professors": 20, "patients": 5_000, "appointments": 100_000},
+    "capacity": {"rooms": 50, "students": 2_000, "professors": 200, "patients": 50_000, "appointments": 1_000_000},
+}
+
+# Horários semanais: (dia da semana, hora de início)
+WEEKLY_SLOTS: List[Tuple[int, int]] = [(day, hour) for day in range(5) for hour in range(8, 18)]
+FUTURE_WEEKS = 8
+SERIES_WEEKS = (4, 20)
+GAP_WEEKS = (1, 4)
+GAP_PROBABILITY = 0.15
+PICK_ATTEMPTS = 40
+DEFAULT_BATCH_SIZE = 50_000
+# Referência padrão de "agora": mesma semente, mesmos dados em qualquer dia
+DEFAULT_NOW = datetime(2026, 1, 5, 9, 0)
+
+PATIENT_COLUMNS = ("id", "name", "birthdate", "email", "phone", "is_child", "active", "created_at", "updated_at")
+APPOINTMENT_COLUMNS = (
+    "start_dt", "end_dt", "status", "is_deleted", "created_at", "updated_at",
+    "room_id", "patient_id", "student_id", "supervisor_id",
+)
+
+FIRST_NAMES = (
+    "Ana", "Bruno", "Carla", "Daniel", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela", "João",
+    "Karina", "Lucas", "Mariana", "Nicolas", "Olivia", "Pedro", "Queila", "Rafael", "Sofia", "Thiago",
+    "Ursula", "Vinicius", "Wesley", "Yasmin", "Zeca", "Beatriz", "Caio", "Larissa", "Mateus", "Renata",
+)
+LAST_NAMES = (
+    "Silva", "Santos", "Oliveira", "Souza", "Rodrigues", "Ferreira", "Alves", "Pereira", "Lima", "Gomes",
+    "Costa", "Ribeiro", "Martins", "Carvalho", "Almeida", "Lopes", "Soares", "Fernandes", "Vieira", "Barbosa",
+)
+
+_DT_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def _name(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _next_id(conn, model) -> int:
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+class _Inserter:
+    """Insere linhas em lote pelo caminho mais rápido do dialeto."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.sqlite = conn.dialect.name == "sqlite"
+        self._cursor = conn.connection.dbapi_connection.cursor() if self.sqlite else None
+
+    def value(self, value):
+        """Converte para o formato armazenado (somente no caminho SQLite)."""
+        if not self.sqlite:
+            return value
+        if isinstance(value, datetime):
+            return value.strftime(_DT_FORMAT)
+        if isinstance(value, (UserRole, AppointmentStatus)):
+            return value.name
+        if isinstance(value, bool):
+            return int(value)
+        return value
+
+    def insert(self, model, columns: Sequence[str], rows: List[tuple]) -> None:
+        if not rows:
+            return
+        if self.sqlite:
+            table = model.__tablename__
+            placeholders = ", ".join("?" for _ in columns)
+            self._cursor.executemany(
+                f'INSERT INTO "{table}" ({", ".join(columns)}) VALUES ({placeholders})', rows
+            )
+        else:
+            self.conn.execute(insert(model), [dict(zip(columns, row)) for row in rows])
+
+
+def generate_appointments(
+    rng: random.Random,
+    total: int,
+    rooms: Sequence[int],
+    students: Sequence[int],
+    professors: Sequence[int],
+    patients: Sequence[int],
+    first_monday: datetime,
+    now: datetime,
+    max_student_hours: int,
+) -> Iterator[Tuple[datetime, datetime, AppointmentStatus, int, int, int, int]]:
+    """
+    Gera agendamentos semanais sem conflito, semana a semana.
+
+    Args:
+        rng: Gerador aleatório (determinístico)
+        total: Quantidade de agendamentos
+        rooms, students, professors, patients: IDs disponíveis
+        first_monday: Segunda-feira (00h) da primeira semana
+        now: Referência para status passados/futuros
+        max_student_hours: Máximo de horas por dia por estagiário
+
+    Yields:
+        (início, fim, status, sala, paciente, estagiário, supervisor)
+    """
+    slots = len(WEEKLY_SLOTS)
+    # Estado por (sala, horário): semanas restantes e pessoas da série atual
+    remaining = [[0] * slots for _ in rooms]
+    current: List[List[Optional[Tuple[int, int, int]]]] = [[None] * slots for _ in rooms]
+    busy_students = [set() for _ in range(slots)]
+    busy_professors = [set() for _ in range(slots)]
+    busy_patients = [set() for _ in range(slots)]
+    student_day_load: Dict[Tuple[int, int], int] = {}
+
+    def release(room_index: int, slot: int) -> None:
+        series = current[room_index][slot]
+        if series is None:
+            return
+        patient, student, professor = series
+        busy_patients[slot].discard(patient)
+        busy_students[slot].discard(student)
+        busy_professors[slot].discard(professor)
+        student_day_load[(student, WEEKLY_SLOTS[slot][0])] -= 1
+        current[room_index][slot] = None
+
+    def pick(pool: Sequence[int], busy: set, accept=None) -> Optional[int]:
+        for _ in range(PICK_ATTEMPTS):
+            candidate = pool[rng.randrange(len(pool))]
+            if candidate not in busy and (accept is None or accept(candidate)):
+                return candidate
+        return None
+
+    produced = 0
+    week = 0
+    while produced < total:
+        monday = first_monday + timedelta(weeks=week)
+        for slot, (day, hour) in enumerate(WEEKLY_SLOTS):
+            start = monday + timedelta(days=day, hours=hour)
+            end = start + timedelta(hours=1)
+            past = end <= now
+            for room_index, room in enumerate(rooms):
+                if remaining[room_index][slot] == 0:
+                    release(room_index, slot)
+                    if rng.random() < GAP_PROBABILITY:
+                        remaining[room_index][slot] = rng.randint(*GAP_WEEKS)
+                    else:
+                        student = pick(
+                            students, busy_students[slot],
+                            lambda s: student_day_load.get((s, day), 0) < max_student_hours,
+                        )
+                        professor = pick(professors, busy_professors[slot])
+                        patient = pick(patients, busy_patients[slot])
+                        if student is None or professor is None or patient is None:
+                            remaining[room_index][slot] = 1
+                        else:
+                            busy_students[slot].add(student)
+                            busy_professors[slot].add(professor)
+                            busy_patients[slot].add(patient)
+                            student_day_load[(student, day)] = student_day_load.get((student, day), 0) + 1
+                            current[room_index][slot] = (patient, student, professor)
+                            remaining[room_index][slot] = rng.randint(*SERIES_WEEKS)
+                remaining[room_index][slot] -= 1
+
+                series = current[room_index][slot]
+                if series is None:
+                    continue
+                roll = rng.random()
+                if past:
+                    status = (
+                        AppointmentStatus.COMPLETED if roll < 0.88
+                        else AppointmentStatus.CANCELLED if roll < 0.95
+                        else AppointmentStatus.NO_SHOW
+                    )
+                else:
+                    status = AppointmentStatus.CANCELLED if roll < 0.05 else AppointmentStatus.SCHEDULED
+                yield start, end, status, room, series[0], series[1], series[2]
+                produced += 1
+                if produced == total:
+                    return
+        week += 1
+
+
+def generate(
+    engine: Engine,
+    rooms: int,
+    students: int,
+    professors: int,
+    patients: int,
+    appointments: int,
+    seed: int = 42,
+    password: str = "senha123",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    now: Optional[datetime] = None,
+) -> Dict[str, int]:
+    """
+    Gera e insere uma clínica sintética.
+
+    Todos os usuários gerados compartilham a senha `password` (um único hash).
+    Os emails e nomes de sala incluem a semente; gerar duas vezes com a mesma
+    semente no mesmo banco viola as restrições de unicidade.
+
+    Args:
+        engine: Engine do banco (tabelas já criadas)
+        rooms, students, professors, patients, appointments: Quantidades
+        seed: Semente do gerador aleatório
+        password: Senha dos usuários gerados
+        batch_size: Linhas por `executemany`
+        now: Referência de "agora" (UTC, sem fuso); padrão: `DEFAULT_NOW`
+
+    Returns:
+        Quantidade de registros inseridos por tabela
+    """
+    rng = random.Random(seed)
+    now = now or DEFAULT_NOW
+    this_monday = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0)
+    # Fração esperada de semanas ocupadas em cada (sala, horário)
+    series, gap = sum(SERIES_WEEKS) / 2, sum(GAP_WEEKS) / 2
+    occupancy = (1 - GAP_PROBABILITY) * series / ((1 - GAP_PROBABILITY) * series + GAP_PROBABILITY * gap)
+    # Salas ocupáveis ao mesmo tempo: limitadas pelas pessoas disponíveis
+    hours_per_day = len(WEEKLY_SLOTS) // 5
+    concurrent = min(rooms, professors, patients, students * settings.MAX_STUDENT_HOURS_PER_DAY / hours_per_day)
+    weekly_capacity = max(1.0, concurrent * len(WEEKLY_SLOTS) * occupancy)
+    weeks = max(1, math.ceil(appointments / weekly_capacity))
+    first_monday = this_monday - timedelta(weeks=max(0, weeks - FUTURE_WEEKS))
+    password_hash = hash_with_rounds(password, settings.PASSWORD_HASH_ROUNDS)
+
+    with engine.begin() as conn:
+        inserter = _Inserter(conn)
+        v = inserter.value
+        if inserter.sqlite:
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+
+        room_start = _next_id(conn, Room)
+        room_ids = list(range(room_start, room_start + rooms))
+        inserter.insert(Room, ("id", "name", "description", "capacity", "active", "created_at", "updated_at"), [
+            (room_id, f"Sala {seed}-{i + 1:03d}", None, 1 if i % 5 else 4, v(True), v(now), v(now))
+            for i, room_id in enumerate(room_ids)
+        ])
+
+        user_start = _next_id(conn, User)
+        student_ids = list(range(user_start, user_start + students))
+        professor_ids = list(range(user_start + students, user_start + students + professors))
+        user_rows = []
+        for i, user_id in enumerate(student_ids + professor_ids):
+            is_student = i < students
+            kind, number = ("estagiario", i + 1) if is_student else ("professor", i - students + 1)
+            role = UserRole.STUDENT if is_student else UserRole.PROFESSOR
+            user_rows.append((
+                user_id, _name(rng), f"{kind}{number}.s{seed}@sintetico.unipar.br", password_hash,
+                v(role), v(True), v(now), v(now),
+            ))
+        inserter.insert(
+            User, ("id", "name", "email", "hashed_password", "role", "is_active", "created_at", "updated_at"),
+            user_rows,
+        )
+
+        patient_start = _next_id(conn, Patient)
+        patient_ids = list(range(patient_start, patient_start + patients))
+        patient_rows = []
+        for patient_id in patient_ids:
+            is_child = rng.random() < 0.2
+            age_days = rng.randint(4 * 365, 17 * 365) if is_child else rng.randint(18 * 365, 80 * 365)
+            patient_rows.append((
+                patient_id, _name(rng), v(now - timedelta(days=age_days)), None,
+                f"(44) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}",
+                v(is_child), v(True), v(now), v(now),
+            ))
+            if len(patient_rows) == batch_size:
+                inserter.insert(Patient, PATIENT_COLUMNS, patient_rows)
+                patient_rows = []
+        inserter.insert(Patient, PATIENT_COLUMNS, patient_rows)
+
+        batch = []
+        stamp = v(now)
+        scheduled = generate_appointments(
+            rng, appointments, room_ids, student_ids, professor_ids, patient_ids,
+            first_monday, now, settings.MAX_STUDENT_HOURS_PER_DAY,
+        )
+        for start, end, status, room_id, patient_id, student_id, professor_id in scheduled:
+            batch.append((
+                v(start), v(end), v(status), v(False), stamp, stamp,
+                room_id, patient_id, student_id, professor_id,
+            ))
+            if len(batch) == batch_size:
+                inserter.insert(Appointment, APPOINTMENT_COLUMNS, batch)
+                batch = []
+        inserter.insert(Appointment, APPOINTMENT_COLUMNS, batch)
+
+    return {
+        "rooms": rooms,
+        "users": students + professors,
+        "patients": patients,
+        "appointments": appointments,
+    }
+
+
+def _now_arg(value: str) -> datetime:
+    if value == "now":
+        return datetime.utcnow().replace(microsecond=0)
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida: {value!r} (use ISO 8601 ou 'now')")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos de uma clínica em escala.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small")
+    for field in ("rooms", "students", "professors", "patients", "appointments"):
+        parser.add_argument(f"--{field}", type=int, help=f"Sobrescreve a quantidade de {field} do preset")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--now", type=_now_arg, default=DEFAULT_NOW,
+        help=f"Referência de \"agora\" em UTC (ISO 8601 ou 'now'; padrão: {DEFAULT_NOW.isoformat()})",
+    )
+    parser.add_argument("--password", default="senha123", help="Senha de todos os usuários gerados")
+    parser.add_argument("--database-url", help="Banco de destino (padrão: banco da aplicação)")
+    parser.add_argument("--reset", action="store_true", help="Apaga e recria as tabelas antes de gerar")
+    args = parser.parse_args()
+
+    from sqlmodel import create_engine
+    from .database import engine as app_engine, ensure_schema
+
+    engine = create_engine(args.database_url) if args.database_url else app_engine
+    counts = dict(PRESETS[args.preset])
+    counts.update({key: value for key, value in vars(args).items() if key in counts and value is not None})
+
+    if args.reset:
+        SQLModel.metadata.drop_all(engine)
+    ensure_schema(engine)
+
+    start = time.perf_counter()
+    inserted = generate(engine, seed=args.seed, password=args.password, now=args.now, **counts)
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Dados sintéticos gerados em {elapsed:.1f}s: "
+        + ", ".join(f"{count} {table}" for table, count in inserted.items())
+    )
+
+
+if __name__ == "__main__":
+    main()
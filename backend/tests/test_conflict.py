@@ -41,3 +41,28 @@ def test_conflict_detected():
     session.close()
 
 
+def test_synthetic_data_is_deterministic_and_conflict_free():
+    from sqlalchemy import text
+    from backend.synthetic_data import DEFAULT_NOW, generate
+
+    dumps = []
+    # Sem `now`, a referência é a data fixa (não o relógio)
+    for now in (None, DEFAULT_NOW):
+        engine = create_engine("sqlite:///:memory:")
+        SQLModel.metadata.create_all(engine)
+        generate(engine, rooms=3, students=12, professors=4, patients=40,
+                 appointments=600, seed=7, now=now)
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT start_dt, room_id, patient_id, student_id, supervisor_id, status "
+                "FROM appointment ORDER BY id"
+            )).fetchall()
+            assert len(rows) == 600
+            for column in ("room_id", "patient_id", "student_id", "supervisor_id"):
+                clashes = conn.execute(text(
+                    f"SELECT COUNT(*) FROM (SELECT 1 FROM appointment "
+                    f"GROUP BY {column}, start_dt HAVING COUNT(*) > 1)"
+                )).scalar()
+                assert clashes == 0
+        dumps.append(rows)
+    assert dumps[0] == dumps[1]
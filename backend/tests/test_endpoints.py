@@ -1,11 +1,12 @@
 """Testes de endpoints da API."""
 import pytest
 from fastapi.testclient import TestClient
-from sqlmodel import create_engine, SQLModel, Session
+from sqlmodel import create_engine, SQLModel, Session, select
 from backend.main import app
 from backend.database import get_session
 from backend.models import User
-from backend.security import hash_password
+from backend.security import hash_password, rate_limiter
+from backend.idempotency import idempotency_store
 from backend.enums import UserRole
 
 # Engine em memória
@@ -40,6 +41,8 @@ def client(session):
         return session
     
     app.dependency_overrides[get_session] = override_get_session
+    rate_limiter.reset()
+    idempotency_store.reset()
     yield TestClient(app)
     app.dependency_overrides.clear()
 
@@ -169,3 +172,1159 @@ def test_create_patient(client):
     assert data["active"] is True
 
 
+
+def test_large_json_response_is_compressed(client):
+    """Testa compressão gzip de respostas JSON acima do limite."""
+    for i in range(30):
+        client.post("/api/rooms", json={"name": f"Sala {i}", "description": "x" * 50, "capacity": 1})
+
+    response = client.get("/api/rooms", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(response.json()) == 30
+
+    small = client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+
+def test_frontend_served_with_hashed_assets(client):
+    """Testa frontend servido pelo backend com assets versionados e cacheáveis."""
+    response = client.get("/app/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == "no-cache"
+
+    import re
+    match = re.search(r'src="(assets/js/app\.[0-9a-f]{10}\.js)"', response.text)
+    assert match, "index.html deve referenciar o app.js versionado"
+    assert '<meta name="api-base-url" content="">' in response.text  # API na mesma origem
+
+    asset = client.get(f"/app/{match.group(1)}")
+    assert asset.status_code == 200
+    assert "immutable" in asset.headers["cache-control"]
+
+    cached = client.get(f"/app/{match.group(1)}", headers={"If-None-Match": asset.headers["etag"]})
+    assert cached.status_code == 304
+
+def test_cors_preflight_and_simple_request(client):
+    """Testa CORS: preflight com Max-Age e eco da origem permitida."""
+    preflight = client.options("/api/rooms", headers={
+        "Origin": "http://localhost:3000",
+        "Access-Control-Request-Method": "POST",
+    })
+    assert preflight.status_code == 200
+    assert preflight.headers["access-control-allow-origin"] == "http://localhost:3000"
+    assert preflight.headers["access-control-max-age"] == "600"
+    allowed = {name.strip().lower() for name in preflight.headers["access-control-allow-headers"].split(",")}
+    assert {"if-match", "idempotency-key", "x-request-id", "x-profile"} <= allowed
+
+    response = client.get("/health", headers={"Origin": "http://localhost:3000"})
+    assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
+    assert response.headers["access-control-allow-credentials"] == "true"
+    exposed = {name.strip().lower() for name in response.headers["access-control-expose-headers"].split(",")}
+    assert {"etag", "retry-after", "idempotent-replayed"} <= exposed
+
+    blocked = client.get("/health", headers={"Origin": "http://evil.example"})
+    assert "access-control-allow-origin" not in blocked.headers
+
+def _seed_appointments(session, count):
+    """Cria sala, paciente, estagiário, supervisor e `count` agendamentos."""
+    from datetime import datetime, timedelta
+    from backend.models import Room, Patient, Appointment
+    room = Room(name="Sala Export")
+    patient = Patient(name="Paciente; Export")
+    student = User(name="Estagiario Export", email="est.export@test.com", hashed_password="hash", role=UserRole.STUDENT)
+    supervisor = User(name="Supervisor Export", email="sup.export@test.com", hashed_password="hash", role=UserRole.PROFESSOR)
+    session.add_all([room, patient, student, supervisor])
+    session.commit()
+    base = datetime(2026, 3, 2, 8, 0)
+    for i in range(count):
+        start = base + timedelta(days=i)
+        session.add(Appointment(
+            start_dt=start, end_dt=start + timedelta(hours=1),
+            room_id=room.id, patient_id=patient.id,
+            student_id=student.id, supervisor_id=supervisor.id,
+        ))
+    session.commit()
+    return room, patient, student, supervisor
+
+def test_export_appointments_formats(client, session):
+    """Testa exportação em streaming nos formatos csv, ndjson e ics."""
+    import csv, io, json
+    _seed_appointments(session, 1200)
+
+    response = client.get("/api/appointments/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 1200
+    assert rows[0]["room_name"] == "Sala Export"
+    assert rows[0]["student_name"] == "Estagiario Export"
+
+    response = client.get("/api/appointments/export", params={
+        "format": "ndjson", "start": "2026-03-10T00:00:00", "end": "2026-03-20T00:00:00",
+    })
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 10
+    assert lines[0]["start_dt"].startswith("2026-03-10T08:00:00")
+
+    response = client.get("/api/appointments/export", params={"format": "ics", "end": "2026-03-04T00:00:00"})
+    assert response.text.startswith("BEGIN:VCALENDAR\r\n")
+    assert response.text.count("BEGIN:VEVENT") == 2
+    assert r"SUMMARY:Atendimento - Paciente\; Export" in response.text
+
+def test_search_appointments_filters_and_counts(client, session):
+    """Testa busca de agendamentos com filtros combinados e contagens."""
+    from backend.enums import AppointmentStatus
+    from backend.models import Appointment
+    room, patient, student, supervisor = _seed_appointments(session, 40)
+    for appointment in session.exec(select(Appointment).where(Appointment.id % 4 == 0)).all():
+        appointment.status = AppointmentStatus.COMPLETED
+    session.commit()
+
+    response = client.get("/api/appointments/search", params={
+        "start": "2026-03-02T00:00:00", "end": "2026-03-22T00:00:00",
+        "supervisor_id": supervisor.id, "limit": 5, "offset": 5,
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total"] == 20
+    assert body["status_counts"] == {"scheduled": 15, "completed": 5}
+    assert [item["start_dt"][:10] for item in body["items"]] == [
+        "2026-03-07", "2026-03-08", "2026-03-09", "2026-03-10", "2026-03-11",
+    ]
+    assert body["items"][0]["student_name"] == "Estagiario Export"
+
+    body = client.get("/api/appointments/search", params=[
+        ("status", "completed"), ("status", "cancelled"), ("room_id", room.id), ("room_id", 999),
+    ]).json()
+    assert body["total"] == 10 and len(body["items"]) == 10
+    assert {item["status"] for item in body["items"]} == {"completed"}
+
+    assert client.get("/api/appointments/search", params={"children_only": True}).json()["total"] == 0
+    patient.is_child = True
+    session.commit()
+    assert client.get("/api/appointments/search", params={"children_only": True}).json()["total"] == 40
+    assert client.get("/api/appointments/search", params={"status": "unknown"}).status_code == 422
+
+def test_appointment_fields_and_expand(client, session, count_queries):
+    """Testa `fields=`/`expand=`: só as colunas pedidas, relações em uma consulta."""
+    room, patient, student, supervisor = _seed_appointments(session, 30)
+    room_id, supervisor_id = room.id, supervisor.id
+    session.expunge_all()
+
+    with count_queries() as queries:
+        response = client.get("/api/appointments", params={"fields": "start_dt,room.name", "limit": 25})
+    assert response.status_code == 200
+    assert queries.count == 1
+    items = response.json()
+    assert len(items) == 25
+    assert items[0] == {"id": items[0]["id"], "start_dt": "2026-03-02T08:00:00", "room": {"id": room_id, "name": "Sala Export"}}
+
+    with count_queries() as queries:
+        items = client.get("/api/appointments", params={"expand": "student,supervisor"}).json()
+    assert queries.count == 1
+    assert items[0]["student"]["name"] == "Estagiario Export"
+    assert items[0]["supervisor"]["id"] == supervisor_id
+    assert "hashed_password" not in items[0]["student"]
+    assert items[0]["room_id"] == room_id and "room" not in items[0]
+
+    body = client.get(f"/api/appointments/{items[0]['id']}", params={"fields": "status", "expand": "patient"}).json()
+    assert set(body) == {"id", "status", "patient"}
+    assert body["patient"]["name"] == "Paciente; Export"
+
+    assert client.get("/api/appointments", params={"fields": "hashed_password"}).status_code == 400
+    assert client.get("/api/appointments", params={"fields": "student.hashed_password"}).status_code == 400
+    assert client.get("/api/appointments", params={"expand": "room,owner"}).status_code == 400
+    assert client.get("/api/appointments/99999", params={"fields": "id"}).status_code == 404
+
+def test_batch_get_by_ids(client, session, count_queries):
+    """Testa leitura em lote: uma consulta IN, ordem pedida e IDs não encontrados."""
+    from backend.config import get_settings
+    from backend.models import Room, Patient
+    room, patient, student, supervisor = _seed_appointments(session, 3)
+    rooms = [Room(name=f"Sala Lote {i}") for i in range(3)]
+    session.add_all(rooms + [Patient(name="Inativo", active=False)])
+    session.commit()
+    ids = [rooms[2].id, 999, rooms[0].id, rooms[2].id]
+
+    with count_queries() as queries:
+        response = client.get("/api/rooms", params={"ids": ",".join(map(str, ids))})
+    assert response.status_code == 200
+    assert queries.count == 1
+    body = response.json()
+    assert [item["name"] for item in body["items"]] == ["Sala Lote 2", "Sala Lote 0"]
+    assert body["not_found"] == [999]
+
+    body = client.post("/api/patients/batch", json={"ids": [patient.id, patient.id + 1]}).json()
+    assert [item["name"] for item in body["items"]] == ["Paciente; Export"]
+    assert body["not_found"] == [patient.id + 1]
+
+    body = client.get("/api/users", params={"ids": f"{supervisor.id},{student.id}"}).json()
+    assert [item["email"] for item in body["items"]] == ["sup.export@test.com", "est.export@test.com"]
+    assert "hashed_password" not in body["items"][0]
+
+    with count_queries() as queries:
+        body = client.post("/api/appointments/batch", params={"expand": "room"}, json={"ids": [3, 1, 42]}).json()
+    assert queries.count == 1
+    assert [item["id"] for item in body["items"]] == [3, 1]
+    assert body["items"][0]["room"]["name"] == "Sala Export"
+    assert body["not_found"] == [42]
+
+    assert client.get("/api/rooms", params={"ids": "1,a"}).status_code == 400
+    assert client.get("/api/rooms", params={"ids": ""}).status_code == 400
+    too_many = list(range(1, get_settings().BATCH_MAX_IDS + 2))
+    assert client.post("/api/users/batch", json={"ids": too_many}).status_code == 400
+    assert client.post("/api/users/batch", json={"ids": []}).status_code == 422
+
+def test_optimistic_concurrency_with_etags(client, session, count_queries):
+    """Testa ETag/If-Match: compare-and-swap em um UPDATE e 412 para versão antiga."""
+    room, patient, student, supervisor = _seed_appointments(session, 2)
+    room_id = room.id
+
+    response = client.get(f"/api/rooms/{room_id}")
+    assert response.headers["etag"] == '"1"'
+
+    with count_queries() as queries:
+        response = client.put(f"/api/rooms/{room_id}", json={"capacity": 3}, headers={"If-Match": '"1"'})
+    assert response.status_code == 200
+    assert queries.count == 1
+    assert response.json()["version"] == 2 and response.json()["capacity"] == 3
+    assert response.headers["etag"] == '"2"'
+
+    stale = client.put(f"/api/rooms/{room_id}", json={"capacity": 9}, headers={"If-Match": '"1"'})
+    assert stale.status_code == 412
+    assert stale.headers["etag"] == '"2"'
+    assert client.get(f"/api/rooms/{room_id}").json()["capacity"] == 3
+    assert client.put(f"/api/rooms/{room_id}", json={"capacity": 9}, headers={"If-Match": 'W/"2"'}).status_code == 412
+    assert client.put(f"/api/rooms/{room_id}", json={"capacity": 4}).json()["version"] == 3
+    assert client.put("/api/rooms/9999", json={"capacity": 4}, headers={"If-Match": '"1"'}).status_code == 404
+
+    response = client.put(f"/api/patients/{patient.id}", json={"notes": "x"}, headers={"If-Match": '"1"'})
+    assert response.headers["etag"] == '"2"'
+    assert client.put(f"/api/users/{student.id}", json={"name": "Novo"}, headers={"If-Match": '"5"'}).status_code == 412
+
+    response = client.get("/api/appointments/1")
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"1"'
+    assert response.json()["student"]["name"] == "Estagiario Export"
+    response = client.put("/api/appointments/1", json={"status": "completed"}, headers={"If-Match": '"1"'})
+    assert response.json()["status"] == "completed" and response.json()["version"] == 2
+    assert client.delete("/api/appointments/1").status_code == 204
+    assert client.put("/api/appointments/1", json={"notes": "x"}).status_code == 404
+
+def test_idempotency_key_replays_create(client, session, count_queries, tmp_path):
+    """Testa Idempotency-Key: repetição devolve a resposta original sem criar outro registro."""
+    from backend.idempotency import (
+        IdempotencyInProgress, IdempotencyKeyReused, SQLiteIdempotencyStore, StoredResponse,
+    )
+    from backend.models import Appointment, Patient
+    room, patient, student, supervisor = _seed_appointments(session, 1)
+    payload = {"name": "Paciente Wi-Fi", "phone": "(44) 99999-0001"}
+    headers = {"Idempotency-Key": "pac-1"}
+
+    first = client.post("/api/patients", json=payload, headers=headers)
+    assert first.status_code == 201
+    with count_queries() as queries:
+        replay = client.post("/api/patients", json=payload, headers=headers)
+    assert queries.count == 0
+    assert replay.status_code == 201
+    assert replay.content == first.content
+    assert replay.headers["idempotent-replayed"] == "true"
+    assert len(session.exec(select(Patient).where(Patient.name == "Paciente Wi-Fi")).all()) == 1
+
+    reused = client.post("/api/patients", json={"name": "Outro"}, headers=headers)
+    assert reused.status_code == 422
+    # Mesma chave em outra rota é independente; sem a chave nada muda
+    assert client.post("/api/rooms", json={"name": "Sala Wi-Fi"}, headers=headers).status_code == 201
+    assert client.post("/api/patients", json=payload).json()["id"] != first.json()["id"]
+
+    appointment = {
+        "start_dt": "2026-06-01T10:00:00", "end_dt": "2026-06-01T11:00:00",
+        "room_id": room.id, "patient_id": patient.id,
+        "student_id": student.id, "supervisor_id": supervisor.id,
+    }
+    created = client.post("/api/appointments", json=appointment, headers={"Idempotency-Key": "ag-1"})
+    assert created.status_code == 201
+    replay = client.post("/api/appointments", json=appointment, headers={"Idempotency-Key": "ag-1"})
+    assert replay.json() == created.json()
+    assert len(session.exec(select(Appointment)).all()) == 2
+    # Conflito de horário também é uma resposta final e é repetido
+    conflict = client.post("/api/appointments", json=appointment, headers={"Idempotency-Key": "ag-2"})
+    assert conflict.status_code == 400
+    assert client.post("/api/appointments", json=appointment, headers={"Idempotency-Key": "ag-2"}).headers.get("idempotent-replayed") == "true"
+    assert client.get("/health").json()["idempotency"]["replayed"] >= 3
+
+    store = SQLiteIdempotencyStore(str(tmp_path / "idempotency.db"), ttl_seconds=60)
+    assert store.reserve(b"k", b"body", now=0) is None
+    with pytest.raises(IdempotencyInProgress):
+        store.reserve(b"k", b"body", now=1)
+    store.complete(b"k", StoredResponse(201, ((b"content-type", b"application/json"),), b"{}"), now=1)
+    assert store.reserve(b"k", b"body", now=2) == StoredResponse(201, ((b"content-type", b"application/json"),), b"{}")
+    with pytest.raises(IdempotencyKeyReused):
+        store.reserve(b"k", b"other", now=2)
+    assert store.reserve(b"k", b"other", now=100) is None
+
+def test_status_scheduler_transitions(session):
+    """Testa as transições automáticas de status em lotes e a concessão entre workers."""
+    from datetime import datetime
+    from backend.enums import AppointmentStatus
+    from backend.models import Appointment
+    from backend.scheduler import StatusScheduler
+    _seed_appointments(session, 4)
+    session.get(Appointment, 2).status = AppointmentStatus.NO_SHOW
+    session.commit()
+
+    now = datetime(2026, 3, 4, 8, 30)
+    scheduler = StatusScheduler(test_engine, interval_seconds=60, batch_size=1, lookback_hours=168)
+    assert scheduler.run_once(now) == {"in_progress": 1, "completed": 1}
+    session.expire_all()
+    statuses = [session.get(Appointment, id).status for id in (1, 2, 3, 4)]
+    assert statuses == [
+        AppointmentStatus.COMPLETED, AppointmentStatus.NO_SHOW,
+        AppointmentStatus.IN_PROGRESS, AppointmentStatus.SCHEDULED,
+    ]
+    assert session.get(Appointment, 1).version == 2
+    assert scheduler.run_once(now) == {"in_progress": 0, "completed": 0}
+
+    # Outro worker só assume quando a concessão (3 intervalos) expira
+    other = StatusScheduler(test_engine, interval_seconds=60, batch_size=500, lookback_hours=168)
+    assert other.run_once(datetime(2026, 3, 4, 8, 31)) is None
+    assert other.run_once(datetime(2026, 3, 4, 9, 30)) == {"in_progress": 0, "completed": 1}
+    assert scheduler.run_once(datetime(2026, 3, 4, 9, 31)) is None
+
+    metrics = scheduler.metrics()
+    assert metrics["runs"] == 2 and metrics["skipped"] == 1 and not metrics["leader"]
+    assert metrics["transitions"]["completed"]["rows"] == 1
+
+def test_scheduler_isolated_from_open_request_transaction(tmp_path):
+    """Testa que a transição em segundo plano usa conexão própria e não confirma a transação aberta de uma requisição."""
+    import threading
+    from datetime import datetime
+    from sqlalchemy.pool import NullPool
+    from backend.enums import AppointmentStatus
+    from backend.models import Appointment, Patient
+    from backend.scheduler import StatusScheduler
+    url = f"sqlite:///{(tmp_path / 'agenda.db').as_posix()}"
+    # Mesma configuração de `engine` e `task_engine` com banco em arquivo
+    request_engine = create_engine(url, connect_args={"check_same_thread": False})
+    background_engine = create_engine(url, connect_args={"check_same_thread": False}, poolclass=NullPool)
+    SQLModel.metadata.create_all(request_engine)
+    with Session(request_engine) as seed:
+        _seed_appointments(seed, 4)
+    scheduler = StatusScheduler(background_engine, interval_seconds=60, batch_size=500, lookback_hours=168)
+
+    changed = {}
+    with Session(request_engine) as request:
+        request.get(Patient, 1).name = "Nunca confirmado"
+        request.flush()
+        worker = threading.Thread(target=lambda: changed.update(scheduler.run_once(datetime(2026, 3, 4, 8, 30))))
+        worker.start()
+        # A escrita da requisição ainda está aberta: o agendador espera o
+        # bloqueio em vez de gravar (e confirmar) na mesma conexão
+        worker.join(0.5)
+        assert worker.is_alive()
+        request.rollback()
+    worker.join(5)
+    assert changed == {"in_progress": 1, "completed": 2}
+
+    with Session(request_engine) as check:
+        assert check.get(Patient, 1).name == "Paciente; Export"
+        assert check.get(Appointment, 1).status == AppointmentStatus.COMPLETED
+    request_engine.dispose()
+
+@pytest.fixture
+def smtp_server():
+    """Servidor SMTP mínimo em uma porta local; guarda as mensagens recebidas."""
+    import socketserver, threading
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            self.wfile.write(b"220 localhost\r\n")
+            for line in self.rfile:
+                command = line[:4].upper()
+                if command == b"DATA":
+                    self.wfile.write(b"354 fim com .\r\n")
+                    data = []
+                    for line in self.rfile:
+                        if line == b".\r\n":
+                            break
+                        data.append(line)
+                    self.server.messages.append(b"".join(data))
+                    self.wfile.write(b"250 ok\r\n")
+                elif command == b"QUIT":
+                    self.wfile.write(b"221 bye\r\n")
+                    return
+                else:
+                    self.wfile.write(b"250 ok\r\n")
+
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.messages = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_reminder_queue_dispatch_and_retry(client, session, smtp_server, monkeypatch):
+    """Testa a fila de lembretes: agendamento, cancelamento, reagendamento, envio e novas tentativas."""
+    import email
+    from datetime import datetime, timedelta
+    from backend.enums import ReminderChannel, ReminderStatus
+    from backend.models import Appointment, Reminder
+    from backend.reminders import ReminderDispatcher, SMTPReminderSender, settings as reminder_settings
+    monkeypatch.setattr(reminder_settings, "REMINDERS_ENABLED", True)
+    room, patient, student, supervisor = _seed_appointments(session, 0)
+    patient.email = "paciente@test.com"
+    session.commit()
+
+    def book(hour):
+        response = client.post("/api/appointments", json={
+            "start_dt": f"2026-06-10T{hour}:00:00", "end_dt": f"2026-06-10T{hour + 1}:00:00",
+            "room_id": room.id, "patient_id": patient.id,
+            "student_id": student.id, "supervisor_id": supervisor.id,
+        })
+        assert response.status_code == 201
+        return response.json()["id"]
+
+    kept, cancelled, moved = book(10), book(14), book(16)
+    reminders = {r.appointment_id: r for r in session.exec(select(Reminder)).all()}
+    assert len(reminders) == 3 and reminders[kept].channel == ReminderChannel.EMAIL
+    assert reminders[kept].due_at == datetime(2026, 6, 9, 10, 0)
+    client.put(f"/api/appointments/{cancelled}", json={"status": "cancelled"})
+    session.refresh(reminders[cancelled])
+    assert reminders[cancelled].status == ReminderStatus.CANCELLED
+    # Horário alterado fora da API: o despacho percebe e reagenda
+    appointment = session.get(Appointment, moved)
+    appointment.start_dt += timedelta(days=2)
+    appointment.end_dt += timedelta(days=2)
+    session.commit()
+
+    sender = SMTPReminderSender("127.0.0.1", smtp_server.server_address[1], "clinica@test.com")
+    dispatcher = ReminderDispatcher(
+        test_engine, {ReminderChannel.EMAIL: sender}, lead_hours=24, interval_seconds=1,
+        batch_size=1, workers=2, max_attempts=2, retry_base_seconds=60,
+    )
+    outcomes = dispatcher.run_once(datetime(2026, 6, 9, 17, 0))
+    assert outcomes["sent"] == 1 and outcomes["rescheduled"] == 1
+    [raw] = smtp_server.messages
+    message = email.message_from_bytes(raw)
+    assert message["To"] == "paciente@test.com"
+    assert "10/06/2026 às 10:00" in message.get_payload(decode=True).decode("utf-8")
+    session.expire_all()
+    assert session.get(Reminder, reminders[moved].id).due_at == datetime(2026, 6, 11, 16, 0)
+    assert dispatcher.run_once(datetime(2026, 6, 9, 17, 1))["sent"] == 0
+
+    # SMTP fora do ar: nova tentativa após a espera, depois falha definitiva
+    offline = ReminderDispatcher(
+        test_engine, {ReminderChannel.EMAIL: SMTPReminderSender("127.0.0.1", 9, "clinica@test.com", timeout=1)},
+        lead_hours=24, interval_seconds=1, batch_size=10, workers=1, max_attempts=2, retry_base_seconds=60,
+    )
+    now = datetime(2026, 6, 11, 16, 5)
+    assert offline.run_once(now)["retried"] == 1
+    assert offline.run_once(now + timedelta(seconds=30))["retried"] == 0
+    assert offline.run_once(now + timedelta(seconds=61))["failed"] == 1
+    session.expire_all()
+    failed = session.get(Reminder, reminders[moved].id)
+    assert failed.status == ReminderStatus.FAILED and failed.attempts == 2 and failed.last_error
+    assert offline.metrics()["pending"] == 0
+    dispatcher.stop()
+    offline.stop()
+
+@pytest.fixture
+def webhook_receiver():
+    """Receptor HTTP local; guarda (cabeçalhos, corpo) e responde com `server.statuses` (padrão 200)."""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            self.server.received.append((dict(self.headers), body))
+            self.send_response(self.server.statuses.pop(0) if self.server.statuses else 200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.received = []
+    server.statuses = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_webhook_outbox_delivery_retry_and_dead_letter(client, session, webhook_receiver):
+    """Testa webhooks: eventos na transação da escrita, entrega assinada, novas tentativas e descarte."""
+    import hashlib, hmac, json
+    from datetime import datetime, timedelta
+    from sqlalchemy import update
+    from backend.enums import AppointmentStatus, WebhookDeliveryStatus
+    from backend.models import Appointment, WebhookDelivery
+    from backend.webhooks import WebhookDispatcher
+    token = client.post("/api/auth/login", json={"email": "admin@test.com", "password": "senha123"}).json()["access_token"]
+    admin = {"Authorization": f"Bearer {token}"}
+    room, patient, student, supervisor = _seed_appointments(session, 0)
+    url = f"http://127.0.0.1:{webhook_receiver.server_address[1]}/hooks"
+
+    assert client.post("/api/webhooks", json={"url": url}).status_code in (401, 403)
+    assert client.post("/api/webhooks", json={"url": url, "events": ["appointment.moved"]}, headers=admin).status_code == 422
+    for invalid in ("http://[::1", "http://", "ftp://exemplo.com"):
+        assert client.post("/api/webhooks", json={"url": invalid}, headers=admin).status_code == 422
+    response = client.post("/api/webhooks", headers=admin, json={
+        "url": url, "events": ["appointment.booked", "appointment.cancelled", "appointment.completed"],
+    })
+    assert response.status_code == 201
+    subscription = response.json()
+    secret = subscription["secret"]
+    assert "secret" not in client.get("/api/webhooks", headers=admin).json()[0]
+
+    response = client.post("/api/appointments", json={
+        "start_dt": "2026-06-10T10:00:00", "end_dt": "2026-06-10T11:00:00",
+        "room_id": room.id, "patient_id": patient.id,
+        "student_id": student.id, "supervisor_id": supervisor.id,
+    })
+    appointment_id = response.json()["id"]
+    # Gravado na transação da escrita; nada é enviado durante a requisição
+    assert webhook_receiver.received == []
+    [queued] = session.exec(select(WebhookDelivery)).all()
+    assert queued.event == "appointment.booked" and queued.status == WebhookDeliveryStatus.PENDING
+    # Transições em lote (agendador) também geram eventos; repetir o status não
+    for _ in range(2):
+        session.execute(update(Appointment).values(status=AppointmentStatus.COMPLETED))
+        session.commit()
+    assert len(session.exec(select(WebhookDelivery)).all()) == 2
+
+    dispatcher = WebhookDispatcher(
+        test_engine, interval_seconds=1, batch_size=1, concurrency=4, timeout_seconds=5,
+        max_attempts=2, retry_base_seconds=60, retention_days=30,
+    )
+    now = datetime(2026, 12, 1, 12, 0)
+    assert dispatcher.run_once(now)["delivered"] == 2
+    (headers, body), _ = webhook_receiver.received
+    payload = json.loads(body)
+    assert payload["event"] == headers["X-Webhook-Event"] == "appointment.booked"
+    assert payload["id"] == int(headers["X-Webhook-Id"])
+    assert payload["data"]["id"] == appointment_id and payload["data"]["status"] == "scheduled"
+    assert payload["data"]["start_dt"] == "2026-06-10T10:00:00"
+    timestamp, signature = (part.split("=", 1)[1] for part in headers["X-Webhook-Signature"].split(","))
+    expected = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    assert hmac.compare_digest(signature, expected)
+
+    # Receptor com erro: nova tentativa após a espera, depois descarte (dead)
+    client.delete(f"/api/appointments/{appointment_id}")  # evento não assinado
+    session.execute(update(Appointment).values(status=AppointmentStatus.CANCELLED))
+    session.commit()
+    webhook_receiver.statuses = [500, 503]
+    assert dispatcher.run_once(now)["retried"] == 1
+    assert dispatcher.run_once(now + timedelta(seconds=30))["retried"] == 0
+    assert dispatcher.run_once(now + timedelta(seconds=61))["dead"] == 1
+    [dead] = client.get("/api/webhooks/deliveries?status=dead", headers=admin).json()
+    assert dead["event"] == "appointment.cancelled" and dead["attempts"] == 2
+    assert dead["response_status"] == 503 and dead["last_error"] == "HTTP 503"
+    assert dispatcher.metrics()["dead_letters"] == 1
+
+    # Reenvio manual da entrega descartada
+    assert client.post(f"/api/webhooks/deliveries/{dead['id']}/retry", headers=admin).status_code == 202
+    assert client.post(f"/api/webhooks/deliveries/{dead['id']}/retry", headers=admin).status_code == 404
+    assert dispatcher.run_once(now + timedelta(seconds=62))["delivered"] == 1
+    assert len(webhook_receiver.received) == 5
+    # Concluídas saem após o prazo; assinatura desativada não recebe novos eventos
+    assert dispatcher.run_once(now + timedelta(days=31))["purged"] == 3
+    assert client.delete(f"/api/webhooks/{subscription['id']}", headers=admin).status_code == 204
+    session.execute(update(Appointment).values(status=AppointmentStatus.COMPLETED))
+    session.commit()
+    assert session.exec(select(WebhookDelivery)).all() == []
+    dispatcher.stop()
+
+def test_webhook_invalid_url_fails_only_its_delivery(session, webhook_receiver):
+    """Testa que uma URL inválida já gravada falha a própria entrega sem interromper o lote."""
+    from datetime import datetime
+    from backend.models import Appointment, WebhookSubscription
+    from backend.webhooks import WebhookDispatcher
+    room, patient, student, supervisor = _seed_appointments(session, 0)
+    url = f"http://127.0.0.1:{webhook_receiver.server_address[1]}/hooks"
+    # Gravadas direto no banco, como antes da validação na criação
+    session.add_all([
+        WebhookSubscription(url="http://[::1", events="*", secret="s" * 16),
+        WebhookSubscription(url=url, events="*", secret="s" * 16),
+    ])
+    session.commit()
+    session.add(Appointment(
+        start_dt=datetime(2026, 6, 10, 10), end_dt=datetime(2026, 6, 10, 11),
+        room_id=room.id, patient_id=patient.id, student_id=student.id, supervisor_id=supervisor.id,
+    ))
+    session.commit()
+
+    dispatcher = WebhookDispatcher(
+        test_engine, interval_seconds=1, batch_size=10, concurrency=4, timeout_seconds=5,
+        max_attempts=2, retry_base_seconds=60, retention_days=30,
+    )
+    outcomes = dispatcher.run_once(datetime(2026, 12, 1, 12, 0))
+    assert outcomes["delivered"] == 1 and outcomes["retried"] == 1
+    assert len(webhook_receiver.received) == 1
+
+@pytest.mark.parametrize("filters, index", [
+    ({}, "ix_appointment_start_dt"),
+    ({"supervisor_id": "supervisor"}, "ix_appointment_supervisor_start"),
+    ({"patient_id": "patient"}, "ix_appointment_patient_start"),
+    ({"student_id": "student"}, "ix_appointment_student_start"),
+    ({"room_ids": ["room", 999]}, "ix_appointment_room_start"),
+    ({"statuses": ["SCHEDULED", "COMPLETED"]}, "ix_appointment_status_start"),
+    ({"children_only": True}, "ix_appointment_start_dt"),
+    # Vários filtros: qualquer índice composto de um deles serve
+    ({"supervisor_id": "supervisor", "statuses": ["SCHEDULED"], "room_ids": ["room"]},
+     ("ix_appointment_supervisor_start", "ix_appointment_room_start", "ix_appointment_status_start")),
+])
+def test_search_appointments_query_plans(session, filters, index):
+    """Cada combinação de filtros (com período) usa um índice de appointment."""
+    from datetime import datetime
+    from sqlalchemy import event
+    from backend.enums import AppointmentStatus
+    from backend.repository import AppointmentRepository
+    room, patient, student, supervisor = _seed_appointments(session, 5)
+    patient.is_child = True
+    session.commit()
+    seeded = {"room": room.id, "patient": patient.id, "student": student.id, "supervisor": supervisor.id}
+    resolve = lambda value: seeded.get(value, value) if isinstance(value, str) else value
+    filters = {
+        key: [resolve(item) for item in value] if isinstance(value, list) else resolve(value)
+        for key, value in filters.items()
+    }
+    if "statuses" in filters:
+        filters["statuses"] = [AppointmentStatus[name] for name in filters["statuses"]]
+
+    statements = []
+    capture = lambda conn, cursor, statement, parameters, context, executemany: statements.append((statement, parameters))
+    event.listen(test_engine, "before_cursor_execute", capture)
+    try:
+        AppointmentRepository.search(session, start=datetime(2026, 3, 1), end=datetime(2026, 4, 1), **filters)
+    finally:
+        event.remove(test_engine, "before_cursor_execute", capture)
+
+    assert len(statements) == 2  # contagens + página
+    for statement, parameters in statements:
+        plan = [row[3] for row in session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+        indexes = (index,) if isinstance(index, str) else index
+        assert any(f"SEARCH appointment USING INDEX {name} (" in plan[0] for name in indexes), plan
+        assert not any(line.startswith("SCAN") for line in plan), plan
+
+def test_bulk_import_users_csv(client):
+    """Testa importação em massa de usuários com relatório de erros por linha."""
+    csv_content = (
+        "name,email,password,role\n"
+        "Aluno 1,aluno1@test.com,senha1234,student\n"
+        "Aluno 2,ALUNO2@test.com,senha1234,\n"
+        "Repetido,aluno1@test.com,senha1234,student\n"
+        "Admin Existente,admin@test.com,senha1234,admin\n"
+        "Sem Senha,semsenha@test.com,123,student\n"
+        "Professor,prof@test.com,senha1234,professor\n"
+    )
+    files = {"file": ("usuarios.csv", csv_content.encode("utf-8"), "text/csv")}
+    assert client.post("/api/users/import", files=files).status_code in (401, 403)
+    token = client.post("/api/auth/login", json={"email": "admin@test.com", "password": "senha123"}).json()["access_token"]
+    response = client.post("/api/users/import", files=files, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    report = response.json()
+    assert report["total"] == 6
+    assert report["created"] == 3
+    assert {error["line"] for error in report["errors"]} == {4, 5, 6}
+
+    login = client.post("/api/auth/login", json={"email": "aluno2@test.com", "password": "senha1234"})
+    assert login.status_code == 200
+
+def test_bulk_import_users_partial_when_hashing_busy(session, monkeypatch):
+    """Testa que o pool de senhas cheio interrompe a importação com as linhas não importadas no relatório."""
+    from backend import bulk_import
+    from backend.password_hasher import HashingBusyError
+    calls = []
+
+    def hash_many(passwords):
+        calls.append(len(passwords))
+        if len(calls) > 1:
+            raise HashingBusyError("ocupado")
+        return ["hash"] * len(passwords)
+
+    monkeypatch.setattr(bulk_import.import_hasher, "hash_many", hash_many)
+    lines = ["name,email,password\n"] + [f"Aluno {i},lote{i}@test.com,senha1234\n" for i in range(5)]
+    report = bulk_import.import_users(session, lines, chunk_size=2)
+
+    assert report["total"] == 5 and report["created"] == 2
+    assert [error["line"] for error in report["errors"]] == [4, 5, 6]
+    imported = session.exec(select(User.email).where(User.email.like("lote%"))).all()
+    assert sorted(imported) == ["lote0@test.com", "lote1@test.com"]
+
+def test_bulk_import_patients_csv(client):
+    """Testa importação em massa de pacientes."""
+    csv_content = (
+        "name,email,phone,birthdate,is_child\n"
+        "Paciente A,a@test.com,(44) 99999-0001,2015-04-01,true\n"
+        ",b@test.com,,,\n"
+        "Paciente C,,,,\n"
+    )
+    files = {"file": ("pacientes.csv", csv_content.encode("utf-8"), "text/csv")}
+    assert client.post("/api/patients/import", files=files).status_code in (401, 403)
+    token = client.post("/api/auth/login", json={"email": "admin@test.com", "password": "senha123"}).json()["access_token"]
+    response = client.post("/api/patients/import", files=files, headers={"Authorization": f"Bearer {token}"})
+    report = response.json()
+    assert report["created"] == 2
+    assert [error["line"] for error in report["errors"]] == [3]
+    patients = client.get("/api/patients").json()
+    assert {p["name"] for p in patients} == {"Paciente A", "Paciente C"}
+
+def test_login_upgrades_outdated_password_hash(client, session):
+    """Testa atualização em background de hash com fator de trabalho antigo."""
+    from backend.password_hasher import build_context
+    from backend.security import password_hasher
+    old_hash = build_context(1000).hash("senha123")
+    user = User(name="Antigo", email="antigo@test.com", hashed_password=old_hash, role=UserRole.STUDENT)
+    session.add(user)
+    session.commit()
+    assert password_hasher.needs_update(old_hash)
+
+    response = client.post("/api/auth/login", json={"email": "antigo@test.com", "password": "senha123"})
+    assert response.status_code == 200
+
+    session.expire_all()
+    upgraded = session.get(User, user.id).hashed_password
+    assert upgraded != old_hash
+    assert not password_hasher.needs_update(upgraded)
+    assert password_hasher.verify("senha123", upgraded)
+
+def test_current_user_cached_and_invalidated(client, session):
+    """Testa cache de usuário autenticado e invalidação ao alterar papel."""
+    from fastapi.security import HTTPAuthorizationCredentials
+    from backend.security import create_access_token, get_current_user, principal_cache
+    principal_cache.clear()
+    user = User(name="Cache", email="cache@test.com", hashed_password="hash", role=UserRole.STUDENT)
+    session.add(user)
+    session.commit()
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=create_access_token({"sub": user.email}))
+
+    first = get_current_user(credentials, session)
+    assert first.role == UserRole.STUDENT
+    assert principal_cache.metrics()["entries"] == 1
+
+    hits = principal_cache.metrics()["hits"]  # clear() mantém os contadores
+    cached = get_current_user(credentials, session=None)  # sem consulta ao banco
+    assert cached.id == user.id
+    assert principal_cache.metrics()["hits"] == hits + 1
+
+    client.put(f"/api/users/{user.id}", json={"role": "professor"})
+    assert principal_cache.metrics()["entries"] == 0
+    assert get_current_user(credentials, session).role == UserRole.PROFESSOR
+
+
+def test_refresh_token_rotation_and_logout(client):
+    """Testa rotação de refresh token, reuso e logout."""
+    client.post("/api/auth/register", json={
+        "name": "Refresh", "email": "refresh@test.com", "password": "senha12345", "role": "student"
+    })
+    tokens = client.post("/api/auth/login", json={"email": "refresh@test.com", "password": "senha12345"}).json()
+    assert tokens["refresh_token"] and tokens["expires_in"] > 0
+
+    # Refresh token não serve como access token
+    response = client.post("/api/auth/logout", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 401
+
+    rotated = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert rotated.status_code == 200
+    new_tokens = rotated.json()
+    assert new_tokens["refresh_token"] != tokens["refresh_token"]
+
+    # Reuso do refresh token antigo é recusado e revoga a família inteira
+    reused = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert reused.status_code == 401
+    assert client.post("/api/auth/refresh", json={"refresh_token": new_tokens["refresh_token"]}).status_code == 401
+    response = client.post("/api/auth/logout", headers={"Authorization": f"Bearer {new_tokens['access_token']}"})
+    assert response.status_code == 401
+
+    # Outro login é outra família
+    new_tokens = client.post("/api/auth/login", json={"email": "refresh@test.com", "password": "senha12345"}).json()
+    response = client.post(
+        "/api/auth/logout",
+        headers={"Authorization": f"Bearer {new_tokens['access_token']}"},
+        json={"refresh_token": new_tokens["refresh_token"]},
+    )
+    assert response.status_code == 204
+    assert client.post("/api/auth/refresh", json={"refresh_token": new_tokens["refresh_token"]}).status_code == 401
+    response = client.post("/api/auth/logout", headers={"Authorization": f"Bearer {new_tokens['access_token']}"})
+    assert response.status_code == 401
+
+
+def test_family_revocation_reaches_cached_principal(client, session):
+    """Testa que o reuso do refresh token derruba o access token já em cache."""
+    from fastapi import HTTPException
+    from fastapi.security import HTTPAuthorizationCredentials
+    from backend.security import get_current_user, principal_cache
+    client.post("/api/auth/register", json={
+        "name": "Família", "email": "familia@test.com", "password": "senha12345", "role": "student"
+    })
+    tokens = client.post("/api/auth/login", json={"email": "familia@test.com", "password": "senha12345"}).json()
+    rotated = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=rotated["access_token"])
+    assert get_current_user(credentials, session).email == "familia@test.com"
+    assert principal_cache.get(rotated["access_token"]) is not None
+
+    assert client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+    with pytest.raises(HTTPException) as exc:
+        get_current_user(credentials, session)
+    assert exc.value.status_code == 401
+
+
+def test_refresh_token_consumed_once_under_concurrency(session):
+    """Testa que a troca do refresh token é atômica: só uma de várias requisições simultâneas passa."""
+    import threading
+    from fastapi import HTTPException
+    from backend.security import consume_refresh_token, create_refresh_token
+    token = create_refresh_token("admin@test.com")
+    barrier = threading.Barrier(8)
+    results = []
+
+    def consume():
+        barrier.wait()
+        try:
+            consume_refresh_token(token)
+            results.append("ok")
+        except HTTPException as e:
+            results.append(e.status_code)
+
+    threads = [threading.Thread(target=consume) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results, key=str) == [401] * 7 + ["ok"]
+
+
+def test_deactivated_user_tokens_revoked(client, session):
+    """Testa que desativar o usuário revoga os tokens já emitidos."""
+    from backend.security import create_access_token, create_refresh_token, verify_token
+    user = User(name="Inativo", email="inativo@test.com", hashed_password="hash", role=UserRole.STUDENT)
+    session.add(user)
+    session.commit()
+    access = create_access_token({"sub": user.email})
+    refresh = create_refresh_token(user.email)
+    assert verify_token(access)["sub"] == user.email
+
+    assert client.delete(f"/api/users/{user.id}").status_code == 204
+    assert client.post("/api/auth/refresh", json={"refresh_token": refresh}).status_code == 401
+    response = client.post("/api/auth/logout", headers={"Authorization": f"Bearer {access}"})
+    assert response.status_code == 401
+
+
+def test_revocation_list_bounded_memory():
+    """Testa filtro de Bloom rotativo: sem falso negativo, memória fixa."""
+    import time
+    from backend.revocation import RevocationList
+    revocations = RevocationList(capacity=1000, error_rate=0.001, max_ttl_seconds=300)
+    memory = revocations.metrics()["memory_bytes"]
+    exp = time.time() + 120
+    for i in range(1000):
+        revocations.revoke(f"jti-{i}", exp)
+    assert all(revocations.is_revoked(f"jti-{i}", exp) for i in range(1000))
+    false_positives = sum(revocations.is_revoked(f"other-{i}", exp) for i in range(10000))
+    assert false_positives < 50
+    assert revocations.metrics()["memory_bytes"] == memory
+
+    # Token já expirado não ocupa espaço; faixa futura começa vazia
+    revocations.revoke("expired", time.time() - 1)
+    assert not revocations.is_revoked("jti-1", exp + 10 * revocations.slice_seconds)
+
+
+def test_revocation_list_shared_between_workers(tmp_path):
+    """Testa a lista em SQLite vista por dois processos e o limite de famílias em memória."""
+    import time
+    from backend.revocation import RevocationList, build_revocation_list
+    path = tmp_path / "revocation.db"
+    first = build_revocation_list(f"sqlite:///{path}", capacity=100, error_rate=0.001, max_ttl_seconds=300)
+    second = build_revocation_list(f"sqlite:///{path}", capacity=100, error_rate=0.001, max_ttl_seconds=300)
+    exp = time.time() + 120
+    assert first.revoke("jti-1", exp)
+    assert not second.revoke("jti-1", exp)
+    assert second.is_revoked("jti-1", exp) and not second.is_revoked("jti-2", exp)
+    first.revoke_family("familia")
+    assert second.is_family_revoked("familia")
+    issued = time.time()
+    second.revoke_subject("a@test.com")
+    assert first.is_subject_revoked("a@test.com", issued)
+    assert not first.is_subject_revoked("a@test.com", time.time() + 1)
+    assert first.metrics() == {"revoked": 1, "revoked_subjects": 1, "revoked_families": 1}
+
+    revocations = RevocationList(capacity=100, error_rate=0.001, max_ttl_seconds=300)
+    for i in range(150):
+        revocations.revoke_family(f"familia-{i}")
+    assert revocations.metrics()["revoked_families"] == 100
+    assert revocations.is_family_revoked("familia-149") and not revocations.is_family_revoked("familia-0")
+
+
+def test_login_rate_limited_per_account_and_ip(client):
+    """Testa 429 com Retry-After por conta e por IP."""
+    from backend.rate_limit import MemoryRateLimitStore, RateLimitRule
+    wrong = {"email": "admin@test.com", "password": "errada123"}
+    burst = rate_limiter.rules["login_account"].burst
+    for _ in range(burst):
+        assert client.post("/api/auth/login", json=wrong).status_code == 401
+    response = client.post("/api/auth/login", json=wrong)
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+    # Outra conta ainda pode tentar até esgotar o balde do IP
+    other = {"email": "outro@test.com", "password": "errada123"}
+    statuses = [client.post("/api/auth/login", json=other).status_code for _ in range(10)]
+    assert statuses[-1] == 429
+    # Com o balde do IP vazio, o refresh também é recusado
+    assert client.post("/api/auth/refresh", json={"refresh_token": "x"}).status_code == 429
+    metrics = client.get("/health").json()["rate_limit"]
+    assert metrics["rules"]["login_account"]["limited"] >= 1
+    assert metrics["rules"]["auth_ip"]["limited"] >= 1
+
+    # Interfaces abstratas: implementação incompleta não é instanciável
+    from backend.rate_limit import RateLimitStore
+    with pytest.raises(TypeError):
+        RateLimitStore()
+
+    # Baldes reabastecidos são descartados do armazenamento em memória
+    store = MemoryRateLimitStore(max_keys=2)
+    rule = RateLimitRule("teste", per_minute=60, burst=1)
+    assert store.consume("a", rule, now=0) == 0
+    assert store.consume("a", rule, now=0.5) == pytest.approx(0.5)
+    store.consume("b", rule, now=1.0)
+    store.consume("c", rule, now=10.0)
+    assert store.size() == 1
+
+
+def test_metrics_endpoint(client, session):
+    """Testa métricas Prometheus por rota, por consulta e de conflitos."""
+    from datetime import datetime
+    room, patient, student, supervisor = _seed_appointments(session, 1)
+    client.get(f"/api/users/{student.id}")
+    client.get("/api/appointments/export?format=ndjson")
+    client.post("/api/appointments", json={
+        "start_dt": datetime(2026, 3, 2, 8, 0).isoformat(),
+        "end_dt": datetime(2026, 3, 2, 9, 0).isoformat(),
+        "room_id": room.id,
+        "student_id": student.id,
+        "supervisor_id": supervisor.id,
+        "patient_id": patient.id,
+    })
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'agenda_http_request_duration_seconds_count{method="GET",route="/api/users/{user_id}"}' in body
+    assert 'agenda_db_queries_total{operation="AppointmentRepository.iter_export_rows"}' in body
+    assert "agenda_conflict_check_duration_seconds_count 0.0" not in body
+    assert "agenda_http_requests_in_flight" in body
+    assert "agenda_principal_cache_hit_ratio" in body
+    assert 'agenda_rate_limit_rules_allowed{name="auth_ip"}' in body
+
+
+def test_query_budget_and_slow_query_log(client, session, count_queries, caplog):
+    """Testa contagem de consultas por requisição, orçamento e log de consultas lentas."""
+    from datetime import datetime, timedelta
+    from backend.models import Room, Patient, Appointment
+    from backend.query_log import query_logger
+    student = User(name="Budget", email="budget@test.com", hashed_password="hash", role=UserRole.STUDENT)
+    session.add(student)
+    session.commit()
+    for i in range(15):
+        room, patient = Room(name=f"Sala Budget {i}"), Patient(name=f"Paciente Budget {i}")
+        session.add_all([room, patient])
+        session.commit()
+        start = datetime(2026, 4, 1, 8, 0) + timedelta(days=i)
+        session.add(Appointment(
+            start_dt=start, end_dt=start + timedelta(hours=1), room_id=room.id,
+            patient_id=patient.id, student_id=student.id, supervisor_id=student.id,
+        ))
+    session.commit()
+    session.expunge_all()
+
+    with count_queries() as queries:
+        response = client.get("/api/rooms")
+    assert queries.count == 1
+    assert "x-query-budget-exceeded" not in response.headers
+
+    # Listagem carrega sala e paciente de cada agendamento (N+1)
+    with count_queries() as queries:
+        response = client.get("/api/appointments")
+    assert response.status_code == 200
+    assert queries.count > 20
+    assert response.headers["x-query-budget-exceeded"] == f"count={queries.count}; budget=20"
+
+    threshold = query_logger.slow_query_seconds
+    query_logger.slow_query_seconds = 1e-9
+    try:
+        with caplog.at_level("WARNING", logger="backend.logger"):
+            client.get("/api/rooms")
+    finally:
+        query_logger.slow_query_seconds = threshold
+    slow = [r.getMessage() for r in caplog.records if "Consulta lenta" in r.getMessage()]
+    assert slow and "GET /api/rooms" in slow[0] and "plano:" in slow[0]
+
+    # Parâmetros só como quantidade e tipos: nada do valor consultado
+    caplog.clear()
+    query_logger.slow_query_seconds = 1e-9
+    try:
+        with caplog.at_level("WARNING", logger="backend.logger"):
+            client.get("/api/users/search", params={"q": "budget"})
+    finally:
+        query_logger.slow_query_seconds = threshold
+    slow = " ".join(r.getMessage() for r in caplog.records if "Consulta lenta" in r.getMessage())
+    assert "parâmetros=" in slow and "str" in slow and "budget" not in slow.lower()
+
+
+def test_on_demand_profiling(client, monkeypatch):
+    """Testa profiling sob demanda restrito a administradores."""
+    import json
+    from backend.profiling import ProfileStore, ProfilingMiddleware, instrument_endpoints
+    from backend.routers import admin as admin_router
+
+    store = ProfileStore(slowest_per_route=2, max_on_demand=5)
+    monkeypatch.setattr(admin_router, "profile_store", store)
+    instrument_endpoints(app)
+    profiled = TestClient(ProfilingMiddleware(app, store=store, sample_rate=1.0, engine=test_engine))
+    token = client.post("/api/auth/login", json={"email": "admin@test.com", "password": "senha123"}).json()["access_token"]
+    admin = {"Authorization": f"Bearer {token}"}
+
+    # Sem token de administrador o pedido é ignorado
+    response = profiled.get("/api/rooms", headers={"X-Profile": "cprofile"})
+    assert response.status_code == 200 and "x-profile-id" not in response.headers
+
+    response = profiled.get("/api/rooms", headers={**admin, "X-Profile": "cprofile"})
+    profile_id = response.headers["x-profile-id"]
+    text = client.get(f"/api/admin/profiles/{profile_id}?format=text", headers=admin).text
+    assert "list_rooms" in text  # executado na thread do threadpool
+
+    response = profiled.get("/api/rooms?profile=sample", headers=admin)
+    speedscope = client.get(f"/api/admin/profiles/{response.headers['x-profile-id']}", headers=admin)
+    assert json.loads(speedscope.content)["profiles"][0]["type"] == "sampled"
+
+    # Amostragem: mantém os mais lentos por rota
+    for _ in range(4):
+        profiled.get("/api/patients")
+    listed = client.get("/api/admin/profiles", headers=admin).json()
+    assert len([p for p in listed if p["route"] == "/api/patients"]) == 2
+    assert client.get("/api/admin/profiles").status_code in (401, 403)
+
+    # Rebaixado: o token (com a claim role=admin) deixa de pedir profiles
+    assert client.put("/api/users/1", json={"role": "professor"}, headers=admin).status_code == 200
+    response = profiled.get("/api/rooms", headers={**admin, "X-Profile": "cprofile"})
+    assert response.status_code == 200 and "x-profile-id" not in response.headers
+
+
+def test_ensure_schema_is_versioned(tmp_path):
+    """Inicialização só aplica DDL quando a versão do esquema muda."""
+    from backend.database import SCHEMA_VERSION, SchemaVersionError, ensure_schema
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    assert ensure_schema(engine) == 0
+    assert ensure_schema(engine) == SCHEMA_VERSION
+    with engine.connect() as conn:
+        tables = conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'").scalars().all()
+    assert {"room", "patient", "user", "appointment"} <= set(tables)
+
+    # Banco antigo: índice novo ausente e índice obsoleto presente
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DROP INDEX ix_appointment_supervisor_start")
+        conn.exec_driver_sql("CREATE INDEX ix_appointment_supervisor_id ON appointment (supervisor_id)")
+        conn.exec_driver_sql("ALTER TABLE room DROP COLUMN version")
+        conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION - 1}")
+    assert ensure_schema(engine) == SCHEMA_VERSION - 1
+    with engine.connect() as conn:
+        indexes = conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").scalars().all()
+    assert "ix_appointment_supervisor_start" in indexes
+    assert "ix_appointment_supervisor_id" not in indexes
+    with engine.connect() as conn:
+        columns = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(room)")]
+    assert "version" in columns
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+    with pytest.raises(SchemaVersionError):
+        ensure_schema(engine)
+    engine.dispose()
+
+
+def test_request_id_and_bounded_log_queue(client):
+    """X-Request-ID é ecoado; a fila de logs descarta além da capacidade."""
+    import json
+    import logging
+    import queue
+    from backend.logger import BoundedQueueHandler, JsonFormatter, request_id_var
+
+    response = client.get("/api/rooms", headers={"X-Request-ID": "req-123"})
+    assert response.headers["x-request-id"] == "req-123"
+    assert len(client.get("/api/rooms").headers["x-request-id"]) == 32
+
+    handler = BoundedQueueHandler(queue.Queue(maxsize=1), block_seconds=0)
+    log = logging.getLogger("test.bounded_queue")
+    log.addHandler(handler)
+    log.propagate = False
+    token = request_id_var.set("req-456")
+    try:
+        log.warning("Conflitos em %s", "Sala 1", extra={"duration_ms": 4.2})
+        log.info("descartado")
+    finally:
+        request_id_var.reset(token)
+        log.removeHandler(handler)
+    assert handler.metrics()["dropped"] == 1
+
+    record = handler.queue.get_nowait()
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Conflitos em Sala 1"
+    assert entry["request_id"] == "req-456"
+    assert entry["duration_ms"] == 4.2
+
+
+def test_search_patients_and_users(client, session):
+    """Busca FTS5: prefixo, sem acentos, telefone e sincronização por gatilhos."""
+    from backend.models import Patient
+
+    session.add_all([
+        Patient(name="João Conceição", email="joao@email.com", phone="(44) 99999-0001"),
+        Patient(name="Joana Prado", phone="(44) 98888-1234"),
+        Patient(name="Maria Joaquina", active=False),
+    ])
+    session.add(User(name="Ângela Souza", email="angela@unipar.br", hashed_password="x", role=UserRole.STUDENT))
+    session.commit()
+
+    names = lambda response: [item["name"] for item in response.json()]
+    assert names(client.get("/api/patients/search", params={"q": "joao"})) == ["João Conceição"]
+    assert set(names(client.get("/api/patients/search", params={"q": "jo"}))) == {"João Conceição", "Joana Prado"}
+    assert names(client.get("/api/patients/search", params={"q": "concei joão"})) == ["João Conceição"]
+    assert names(client.get("/api/patients/search", params={"q": "(44) 9888"})) == ["Joana Prado"]
+    assert names(client.get("/api/patients/search", params={"q": "98888-12"})) == ["Joana Prado"]
+    assert client.get("/api/patients/search", params={"q": "*)("}).json() == []
+
+    joana = session.exec(select(Patient).where(Patient.name == "Joana Prado")).one()
+    joana.name = "Joana Ribeiro"
+    session.commit()
+    assert names(client.get("/api/patients/search", params={"q": "ribei"})) == ["Joana Ribeiro"]
+    assert client.get("/api/patients/search", params={"q": "prado"}).json() == []
+
+    assert names(client.get("/api/users/search", params={"q": "angela"})) == ["Ângela Souza"]
+    assert client.get("/api/users/search", params={"q": "angela", "role": "professor"}).json() == []
+
+
+def test_search_ranks_visible_candidates(client, session, monkeypatch):
+    """Testa que a busca filtra inativos antes do corte de candidatos e ordena por relevância."""
+    from sqlalchemy import insert
+    from backend import search
+    from backend.models import Patient
+    monkeypatch.setattr(search, "RANK_CANDIDATES", 50)
+    # Inativos suficientes para ocupar o corte, e resultados fracos (só nas observações)
+    session.execute(insert(Patient), [{"name": f"Silva Inativo {i}", "active": False} for i in range(60)])
+    session.execute(insert(Patient), [{"name": f"Paciente {i}", "notes": "vizinha da silva"} for i in range(20)])
+    session.add(Patient(name="Marta Silva"))
+    session.commit()
+
+    found = client.get("/api/patients/search", params={"q": "silva", "limit": 5}).json()
+    assert len(found) == 5
+    assert found[0]["name"] == "Marta Silva"
+    assert all(patient["active"] for patient in found)
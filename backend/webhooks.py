@@ -0,0 +1,275 @@
+"""Webhooks: entrega assíncrona dos eventos de agendamento.
+
+Os eventos entram na fila `webhookdelivery` por gatilhos no banco
+(`outbox.py`), na mesma transação da alteração — a requisição de origem não
+espera nenhuma entrega. `WebhookDispatcher` roda em segundo plano e, a cada
+`WEBHOOK_INTERVAL_SECONDS`:
+
+1. reserva um lote de entregas vencidas (`WebhookRepository.claim_due`);
+2. envia o lote em paralelo com um cliente HTTP assíncrono, no máximo
+   `WEBHOOK_CONCURRENCY` requisições por vez, reaproveitando conexões;
+3. grava os resultados em um `executemany`: respostas fora de 2xx e falhas
+   de rede voltam à fila com espera exponencial e, após
+   `WEBHOOK_MAX_ATTEMPTS`, ficam como `dead` (reenviáveis pela API);
+4. apaga as entregas concluídas há mais de `WEBHOOK_RETENTION_DAYS` e conta
+   a fila para as métricas (que assim não consultam o banco).
+
+Cada entrega é um POST JSON `{"id", "event", "created_at", "data"}` com os
+cabeçalhos `X-Webhook-Id` (o mesmo em novas tentativas, para o receptor
+descartar repetições), `X-Webhook-Event` e `X-Webhook-Signature:
+t=<unix>,v1=<hex>`, o HMAC-SHA256 de `"<t>." + corpo` com o segredo da
+assinatura. A entrega é ao menos uma vez: um worker que pare no meio do
+envio tem a reserva vencida após `CLAIM_SECONDS` e o lote é reenviado.
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import httpx
+from sqlmodel import Session, select
+
+from .config import get_settings
+from .database import task_engine as default_engine
+from .enums import WebhookDeliveryStatus
+from .logger import logger
+from .metrics import SCHEDULER_ROWS, SCHEDULER_RUN_LATENCY
+from .models import WebhookSubscription
+from .repository import WebhookRepository
+from .scheduler import PeriodicTask, utcnow
+
+settings = get_settings()
+
+JOB_NAME = "webhooks"
+# Duração da reserva de um lote (envio + gravação do resultado)
+CLAIM_SECONDS = 300
+MAX_RETRY_SECONDS = 3600
+OUTCOMES = ("delivered", "retried", "dead", "cancelled", "purged")
+SIGNATURE_HEADER = "X-Webhook-Signature"
+
+
+class WebhookRequest(NamedTuple):
+    """Entrega pronta para envio."""
+
+    delivery: tuple
+    url: str
+    body: bytes
+    headers: Dict[str, str]
+
+
+def sign(secret: str, timestamp: int, body: bytes) -> str:
+    """Valor de `X-Webhook-Signature` para o corpo no instante `timestamp`."""
+    digest = hmac.new(secret.encode("utf-8"), f"{timestamp}.".encode("ascii") + body, hashlib.sha256)
+    return f"t={timestamp},v1={digest.hexdigest()}"
+
+
+def build_request(delivery, subscription: WebhookSubscription, timestamp: int) -> WebhookRequest:
+    """Monta o corpo e os cabeçalhos assinados de uma entrega."""
+    body = json.dumps(
+        {
+            "id": delivery.id,
+            "event": delivery.event,
+            "created_at": delivery.created_at.isoformat(),
+            "data": json.loads(delivery.payload),
+        },
+        separators=(",", ":"),
+    ).encode("utf-8")
+    headers = {
+        "Content-Type": "application/json",
+        "User-Agent": "agenda-unipar-webhooks/1",
+        "X-Webhook-Id": str(delivery.id),
+        "X-Webhook-Event": delivery.event,
+        SIGNATURE_HEADER: sign(subscription.secret, timestamp, body),
+    }
+    return WebhookRequest(delivery, subscription.url, body, headers)
+
+
+class WebhookDispatcher(PeriodicTask):
+    """
+    Despacha a fila de webhooks em lotes, com novas tentativas.
+
+    Args:
+        engine: Engine do banco
+        interval_seconds: Intervalo entre verificações da fila
+        batch_size: Entregas reservadas por lote
+        concurrency: Requisições simultâneas
+        timeout_seconds: Tempo máximo de cada requisição
+        max_attempts: Tentativas antes de `dead`
+        retry_base_seconds: Espera após a 1ª falha (dobra a cada nova falha)
+        retention_days: Prazo das entregas concluídas
+    """
+
+    def __init__(
+        self,
+        engine,
+        interval_seconds: float,
+        batch_size: int,
+        concurrency: int,
+        timeout_seconds: float,
+        max_attempts: int,
+        retry_base_seconds: float,
+        retention_days: float,
+    ):
+        super().__init__("webhook-dispatcher", interval_seconds)
+        self.engine = engine
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.timeout_seconds = timeout_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retention = timedelta(days=retention_days)
+        self._runs = 0
+        self._queue: Dict[str, int] = {}
+        self._last_run_ms = 0.0
+        self._outcomes: Dict[str, int] = dict.fromkeys(OUTCOMES, 0)
+
+    def backoff(self, attempts: int) -> timedelta:
+        """Espera antes da próxima tentativa após `attempts` falhas."""
+        return timedelta(seconds=min(self.retry_base_seconds * 2 ** (attempts - 1), MAX_RETRY_SECONDS))
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Despacha todas as entregas vencidas, lote a lote.
+
+        Args:
+            now: Instante de referência em UTC (padrão: agora)
+
+        Returns:
+            Entregas por resultado (delivered, retried, dead, cancelled,
+            purged)
+        """
+        now = now or utcnow()
+        start = time.perf_counter()
+        outcomes = dict.fromkeys(OUTCOMES, 0)
+        with Session(self.engine) as session:
+            while True:
+                claimed = WebhookRepository.claim_due(
+                    session, now, self.batch_size, timedelta(seconds=CLAIM_SECONDS)
+                )
+                if claimed:
+                    self._dispatch(session, claimed, now, outcomes)
+                if len(claimed) < self.batch_size:
+                    break
+            outcomes["purged"] = WebhookRepository.purge(session, now - self.retention)
+            queue = WebhookRepository.count_queued(session)
+        elapsed = time.perf_counter() - start
+
+        SCHEDULER_RUN_LATENCY.labels(JOB_NAME).observe(elapsed)
+        for name, count in outcomes.items():
+            SCHEDULER_ROWS.labels(JOB_NAME, name).inc(count)
+        with self._lock:
+            self._runs += 1
+            self._last_run_ms = elapsed * 1000
+            self._queue = queue
+            for name, count in outcomes.items():
+                self._outcomes[name] += count
+        if any(outcomes.values()):
+            logger.info("Webhooks processados em %.1fms: %s", elapsed * 1000, outcomes)
+        return outcomes
+
+    def _dispatch(self, session: Session, claimed: list, now: datetime, outcomes: Dict[str, int]) -> None:
+        subscriptions = {
+            subscription.id: subscription
+            for subscription in session.exec(
+                select(WebhookSubscription).where(
+                    WebhookSubscription.id.in_({row.subscription_id for row in claimed})
+                )
+            )
+        }
+        results: List[dict] = []
+
+        def finish(delivery, outcome: str, status: WebhookDeliveryStatus, **values) -> None:
+            outcomes[outcome] += 1
+            results.append({
+                "id": delivery.id,
+                "status": status,
+                "next_attempt_at": values.get("next_attempt_at", now),
+                "last_error": values.get("last_error"),
+                "response_status": values.get("response_status"),
+                "delivered_at": values.get("delivered_at"),
+            })
+
+        timestamp = int(time.time())
+        requests: List[WebhookRequest] = []
+        for delivery in claimed:
+            subscription = subscriptions.get(delivery.subscription_id)
+            if subscription is None or not subscription.active:
+                finish(delivery, "cancelled", WebhookDeliveryStatus.CANCELLED, last_error="Assinatura desativada")
+                continue
+            requests.append(build_request(delivery, subscription, timestamp))
+
+        # Encerra a leitura antes do envio: nenhuma transação fica aberta
+        # enquanto os receptores respondem
+        session.commit()
+        for request, (response_status, error) in zip(requests, asyncio.run(self._post_all(requests))):
+            delivery = request.delivery
+            if error is None:
+                finish(
+                    delivery, "delivered", WebhookDeliveryStatus.DELIVERED,
+                    response_status=response_status, delivered_at=now,
+                )
+            elif delivery.attempts >= self.max_attempts:
+                logger.warning(
+                    "Webhook %s (%s) descartado após %s tentativas: %s",
+                    delivery.id, delivery.event, delivery.attempts, error,
+                )
+                finish(
+                    delivery, "dead", WebhookDeliveryStatus.DEAD,
+                    response_status=response_status, last_error=error,
+                )
+            else:
+                finish(
+                    delivery, "retried", WebhookDeliveryStatus.PENDING,
+                    next_attempt_at=now + self.backoff(delivery.attempts),
+                    response_status=response_status, last_error=error,
+                )
+        WebhookRepository.finish(session, results)
+
+    async def _post_all(self, requests: Sequence[WebhookRequest]) -> List[Tuple[Optional[int], Optional[str]]]:
+        """Envia as entregas em paralelo (até `concurrency`); retorna (status HTTP, erro)."""
+        if not requests:
+            return []
+        slots = asyncio.Semaphore(self.concurrency)
+        async with httpx.AsyncClient(timeout=self.timeout_seconds) as client:
+
+            async def post(request: WebhookRequest) -> Tuple[Optional[int], Optional[str]]:
+                async with slots:
+                    try:
+                        response = await client.post(request.url, content=request.body, headers=request.headers)
+                    except Exception as e:
+                        # Qualquer falha (rede, URL inválida gravada antes da
+                        # validação) é desta entrega, não do lote
+                        return None, f"{type(e).__name__}: {e}"[:500]
+                if response.is_success:
+                    return response.status_code, None
+                return response.status_code, f"HTTP {response.status_code}"
+
+            return await asyncio.gather(*(post(request) for request in requests))
+
+    def metrics(self) -> dict:
+        """Retorna execuções, entregas por resultado e a fila na última execução."""
+        with self._lock:
+            return {
+                "running": self.running,
+                "runs": self._runs,
+                "errors": self._errors,
+                "last_run_ms": round(self._last_run_ms, 3),
+                "pending": self._queue.get("pending", 0) + self._queue.get("sending", 0),
+                "dead_letters": self._queue.get("dead", 0),
+                **self._outcomes,
+            }
+
+
+webhook_dispatcher = WebhookDispatcher(
+    default_engine,
+    interval_seconds=settings.WEBHOOK_INTERVAL_SECONDS,
+    batch_size=settings.WEBHOOK_BATCH_SIZE,
+    concurrency=settings.WEBHOOK_CONCURRENCY,
+    timeout_seconds=settings.WEBHOOK_TIMEOUT_SECONDS,
+    max_attempts=settings.WEBHOOK_MAX_ATTEMPTS,
+    retry_base_seconds=settings.WEBHOOK_RETRY_BASE_SECONDS,
+    retention_days=settings.WEBHOOK_RETENTION_DAYS,
+)
@@ -1,4 +1,7 @@
-const API_BASE_URL = 'http://localhost:8000';
+// Servido pelo backend (/app), a página traz <meta name="api-base-url" content="">
+// e a API é chamada na mesma origem; aberto por outro servidor de arquivos
+// (ex.: python -m http.server 3000), usa o backend local.
+const API_BASE_URL = document.querySelector('meta[name="api-base-url"]')?.content ?? 'http://localhost:8000';
 const API_TIMEOUT = 10000; // 10 segundos
 
 const app = {
@@ -421,12 +424,14 @@ const app = {
       supervisor_id: Number(supervisor_id),
       notes: entries.notes || null,
     };
+    const body = JSON.stringify(payload);
     try {
       const response = await fetch(`${API_BASE_URL}/api/appointments`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(payload),
+        headers: { 'Content-Type': 'application/json', 'Idempotency-Key': this.idempotencyKey(e.target, body) },
+        body,
       });
+      this.settleIdempotencyKey(e.target, response);
       const respText = await response.text();
       let respJson = null;
       try { respJson = JSON.parse(respText); } catch {}
@@ -469,12 +474,14 @@ const app = {
       data.notes = null;
     }
 
+    const body = JSON.stringify(data);
     try {
       const response = await fetch(`${API_BASE_URL}/api/patients`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(data),
+        headers: { 'Content-Type': 'application/json', 'Idempotency-Key': this.idempotencyKey(e.target, body) },
+        body,
       });
+      this.settleIdempotencyKey(e.target, response);
       if (response.ok) {
         this.showAlert('Paciente criado com sucesso!', 'success');
         e.target.reset();
@@ -709,6 +716,25 @@ const app = {
     }
   },
 
+  idempotencyKey(form, body) {
+    // Uma chave por envio do formulário: reaproveitada ao tentar de novo o
+    // mesmo conteúdo (ex.: após falha de rede), nova se o conteúdo mudou
+    if (!form._idempotency || form._idempotency.body !== body) {
+      const key = window.crypto?.randomUUID
+        ? window.crypto.randomUUID()
+        : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+      form._idempotency = { body, key };
+    }
+    return form._idempotency.key;
+  },
+
+  settleIdempotencyKey(form, response) {
+    // Resposta definitiva: o próximo envio é uma nova operação. Erros 5xx e
+    // respostas com Retry-After (429, 409 "em andamento") não são guardados
+    // pelo servidor e mantêm a chave para a nova tentativa
+    if (response.status < 500 && !response.headers.has('Retry-After')) delete form._idempotency;
+  },
+
   showAlert(message, type = 'info') {
     const alertContainer = document.getElementById('alertContainer');
     if (!alertContainer) return;
@@ -0,0 +1,139 @@
+"""Microbenchmark da camada CORS: pilha antiga vs. middleware ASGI puro.
+
+Chama a aplicação ASGI diretamente (sem rede nem TestClient) para medir só o
+custo dos middlewares. A pilha antiga (CORSMiddleware do Starlette +
+BaseHTTPMiddleware) é reproduzida aqui apenas para comparação.
+
+Uso:
+    python scripts/bench_cors.py [--requests 20000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.cors import CORSMiddleware as StarletteCORSMiddleware
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from backend.cors import CORSMiddleware
+
+ORIGIN = "http://localhost:3000"
+ALLOWED_ORIGINS = [ORIGIN, "http://127.0.0.1:3000", "http://localhost:8000", "http://127.0.0.1:8000"]
+
+
+async def endpoint(request):
+    return JSONResponse({"status": "ok"})
+
+
+class LegacyCORSFixerMiddleware(BaseHTTPMiddleware):
+    """Cópia do middleware removido de main.py."""
+
+    async def dispatch(self, request, call_next):
+        if request.method == "OPTIONS":
+            origin = request.headers.get("origin")
+            headers = {}
+            if origin and origin in ALLOWED_ORIGINS:
+                headers = {
+                    "Access-Control-Allow-Origin": origin,
+                    "Access-Control-Allow-Methods": "GET,POST,PUT,DELETE,OPTIONS,HEAD",
+                    "Access-Control-Allow-Headers": "Content-Type, Authorization, X-Requested-With, Accept",
+                    "Access-Control-Allow-Credentials": "true",
+                }
+            return Response(status_code=200, headers=headers)
+
+        response = await call_next(request)
+        origin = request.headers.get("origin")
+        if origin and origin in ALLOWED_ORIGINS:
+            response.headers["Access-Control-Allow-Origin"] = origin
+            response.headers["Access-Control-Allow-Credentials"] = "true"
+        return response
+
+
+def build_legacy_app():
+    app = Starlette(routes=[Route("/ping", endpoint)])
+    app.add_middleware(
+        StarletteCORSMiddleware,
+        allow_origins=ALLOWED_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(LegacyCORSFixerMiddleware)
+    return app
+
+
+def build_new_app():
+    app = Starlette(routes=[Route("/ping", endpoint)])
+    app.add_middleware(CORSMiddleware, allow_origins=ALLOWED_ORIGINS)
+    return app
+
+
+def make_scope(method: str) -> dict:
+    headers = [(b"host", b"localhost"), (b"origin", ORIGIN.encode())]
+    if method == "OPTIONS":
+        headers.append((b"access-control-request-method", b"POST"))
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": "/ping",
+        "raw_path": b"/ping",
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("127.0.0.1", 50000),
+        "server": ("localhost", 8000),
+    }
+
+
+async def run_requests(app, method: str, count: int) -> list:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    timings = []
+    for _ in range(count):
+        scope = make_scope(method)
+        start = time.perf_counter()
+        await app(scope, receive, send)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, timings: list) -> float:
+    timings = sorted(timings)
+    mean_us = statistics.mean(timings) * 1e6
+    p99_us = timings[int(len(timings) * 0.99) - 1] * 1e6
+    print(f"  {label:<10} média {mean_us:8.1f} µs   p99 {p99_us:8.1f} µs")
+    return mean_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    apps = {"antes": build_legacy_app(), "depois": build_new_app()}
+    for method in ("GET", "OPTIONS"):
+        print(f"\n{method} /ping ({args.requests} requisições)")
+        means = {}
+        for label, app in apps.items():
+            asyncio.run(run_requests(app, method, 200))  # aquecimento
+            means[label] = report(label, asyncio.run(run_requests(app, method, args.requests)))
+        print(f"  ganho      {means['antes'] / means['depois']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Microbenchmark de `get_current_user` com e sem o cache de principals.
+
+Uso:
+    python scripts/bench_principal_cache.py [--requests 5000]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from backend.enums import UserRole
+from backend.models import User
+from backend.security import create_access_token, get_current_user, principal_cache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add(User(name="Bench", email="bench@test.com", hashed_password="x", role=UserRole.STUDENT))
+        session.commit()
+
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=create_access_token({"sub": "bench@test.com"})
+    )
+
+    results = {}
+    for label, enabled in (("sem cache", False), ("com cache", True)):
+        principal_cache.clear()
+        ttl = principal_cache.ttl_seconds
+        if not enabled:
+            principal_cache.ttl_seconds = 0
+        start = time.perf_counter()
+        for _ in range(args.requests):
+            # Uma sessão por requisição, como em get_session
+            with Session(engine) as session:
+                get_current_user(credentials, session)
+        results[label] = (time.perf_counter() - start) / args.requests * 1e6
+        principal_cache.ttl_seconds = ttl
+        print(f"{label:<10} {results[label]:8.1f} µs/requisição")
+
+    saved = results["sem cache"] - results["com cache"]
+    print(f"economia   {saved:8.1f} µs/requisição ({results['sem cache'] / results['com cache']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Teste de carga: latência de leitura durante uma rajada de logins.
+
+Sobe o backend (uvicorn, banco em memória com o seed padrão), mede a latência
+de `GET /api/rooms` em repouso e depois durante uma rajada de logins
+concorrentes (troca de turno). Com `--compare` repete o teste com a
+criptografia executada na thread da requisição (PASSWORD_HASH_WORKERS=0)
+para comparação.
+
+Uso:
+    python scripts/load_login_storm.py [--logins 32] [--duration 10] [--compare]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+LOGIN = {"email": "admin@unipar.br", "password": "admin123"}
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "AGENDA_USE_IN_MEMORY_DB": "1",
+        "PASSWORD_HASH_WORKERS": str(workers),
+        "LOG_LEVEL": "WARNING",
+        # A tempestade mede o pool de hash, não o limite por IP de /api/auth
+        "RATE_LIMIT_ENABLED": "false",
+    })
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("Servidor não respondeu ao /health")
+
+
+def measure_reads(base_url: str, duration: float) -> list:
+    latencies = []
+    with httpx.Client(base_url=base_url, timeout=30) as client:
+        end = time.time() + duration
+        while time.time() < end:
+            start = time.perf_counter()
+            client.get("/api/rooms")
+            latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.02)
+    return latencies
+
+
+def login_storm(base_url: str, clients: int, stop: threading.Event, results: dict) -> list:
+    lock = threading.Lock()
+
+    def worker():
+        with httpx.Client(base_url=base_url, timeout=60) as client:
+            while not stop.is_set():
+                response = client.post("/api/auth/login", json=LOGIN)
+                with lock:
+                    results[response.status_code] = results.get(response.status_code, 0) + 1
+                if response.status_code == 503:
+                    # Cliente bem-comportado respeita o Retry-After
+                    stop.wait(float(response.headers.get("retry-after", "1")))
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def summarize(latencies: list) -> str:
+    ordered = sorted(latencies)
+    p = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    return (
+        f"n={len(ordered):4d}  p50={statistics.median(ordered):7.1f}ms  "
+        f"p95={p(0.95):7.1f}ms  p99={p(0.99):7.1f}ms"
+    )
+
+
+def run(port: int, workers: int, logins: int, duration: float) -> None:
+    label = f"{workers} processos" if workers else "na thread da requisição"
+    print(f"\n=== Criptografia {label} ===")
+    proc = start_server(port, workers)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        print(f"  leituras em repouso   {summarize(measure_reads(base_url, duration))}")
+
+        stop = threading.Event()
+        results: dict = {}
+        threads = login_storm(base_url, logins, stop, results)
+        time.sleep(0.5)
+        during = measure_reads(base_url, duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        print(f"  leituras na rajada    {summarize(during)}")
+        print(f"  logins por status     {dict(sorted(results.items()))}")
+        print(f"  métricas do hashing   {httpx.get(base_url + '/health').json().get('password_hashing')}")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2, help="PASSWORD_HASH_WORKERS do teste principal")
+    parser.add_argument("--logins", type=int, default=32, help="Clientes fazendo login em paralelo")
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos de cada fase")
+    parser.add_argument("--compare", action="store_true", help="Repetir com criptografia inline")
+    args = parser.parse_args()
+
+    if args.compare:
+        run(args.port, 0, args.logins, args.duration)
+    run(args.port, args.workers, args.logins, args.duration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""Teste de carga com o tráfego típico da clínica.
+
+Reproduz, em paralelo e durante `--duration` segundos:
+
+- painéis abertos (`--tabs`): cada aba recarrega agendamentos, pacientes,
+  salas e usuários a cada `--poll-interval` segundos, como o frontend;
+- rajadas de agendamentos: `--booking-burst` criações simultâneas a cada
+  `--booking-every` segundos (conflitos viram 400, como na recepção real);
+- troca de turno: `--shift-logins` logins simultâneos a cada `--shift-every`
+  segundos;
+- exportações: `--exporters` downloads em CSV do mês corrente a cada
+  `--export-every` segundos.
+
+Sem `--url`, sobe um uvicorn local (opcionalmente em um banco gerado por
+`backend.synthetic_data` com `--prepare`). O relatório em JSON traz, por
+rota (template, não o caminho bruto), p50/p95/p99, vazão, taxa de erros
+(5xx e falhas de conexão) e de rejeições (4xx), além do commit testado;
+`--compare` mostra a variação em relação a um relatório anterior.
+
+Uso:
+    python scripts/load_test.py --tabs 50 --duration 60 --output carga.json
+    python scripts/load_test.py --db /tmp/carga.db --prepare clinic --compare carga.json
+    python scripts/load_test.py --url http://127.0.0.1:8000 --tabs 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+DASHBOARD = ("/api/appointments", "/api/patients", "/api/rooms", "/api/users")
+
+
+def start_server(port: int, db: Optional[str], workers: int, rate_limit: bool) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({"LOG_LEVEL": "WARNING", "RATE_LIMIT_ENABLED": "true" if rate_limit else "false"})
+    if db:
+        env["AGENDA_DB_FILE"] = os.path.abspath(db)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError("Servidor não respondeu ao /health")
+
+
+def prepare_database(db: str, preset: str, seed: int) -> None:
+    subprocess.run(
+        [sys.executable, "-m", "backend.synthetic_data", "--preset", preset, "--seed", str(seed),
+         "--reset", "--database-url", f"sqlite:///{os.path.abspath(db)}"],
+        cwd=ROOT,
+        check=True,
+    )
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Percentil por interpolação linear (lista já ordenada)."""
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+class Recorder:
+    """Latências e status por rota."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def request(self, client: httpx.AsyncClient, label: str, method: str, url: str, **kwargs):
+        """Executa a requisição (lendo o corpo inteiro) e registra o resultado."""
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        self.latencies[label].append((time.perf_counter() - start) * 1000)
+        self.statuses[label][status] += 1
+        return response
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for label in sorted(self.latencies):
+            endpoints[label] = summarize(self.latencies[label], self.statuses[label], elapsed)
+        every = [value for values in self.latencies.values() for value in values]
+        merged: Dict[str, int] = defaultdict(int)
+        for statuses in self.statuses.values():
+            for status, count in statuses.items():
+                merged[status] += count
+        return {"endpoints": endpoints, "total": summarize(every, merged, elapsed)}
+
+
+def summarize(latencies: List[float], statuses: Dict[str, int], elapsed: float) -> dict:
+    ordered = sorted(latencies)
+    count = len(ordered)
+    errors = sum(n for status, n in statuses.items() if not status.isdigit() or status >= "500")
+    rejected = sum(n for status, n in statuses.items() if status.isdigit() and "400" <= status < "500")
+    return {
+        "requests": count,
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50), 2),
+        "p95_ms": round(percentile(ordered, 0.95), 2),
+        "p99_ms": round(percentile(ordered, 0.99), 2),
+        "max_ms": round(ordered[-1], 2) if ordered else 0.0,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "rejected_rate": round(rejected / count, 4) if count else 0.0,
+        "status": dict(sorted(statuses.items())),
+    }
+
+
+async def every(interval: float, deadline: float, offset: float, action) -> None:
+    """Executa `action` em intervalos fixos (como setInterval) até o prazo."""
+    next_run = time.monotonic() + offset
+    while next_run < deadline:
+        await asyncio.sleep(max(0.0, next_run - time.monotonic()))
+        await action()
+        next_run += interval
+
+
+async def dashboard_tab(client, recorder: Recorder, args, deadline: float, rng: random.Random) -> None:
+    async def poll():
+        await asyncio.gather(*(recorder.request(client, f"GET {path}", "GET", path) for path in DASHBOARD))
+    await every(args.poll_interval, deadline, rng.uniform(0, args.poll_interval), poll)
+
+
+async def booking_bursts(client, recorder: Recorder, args, deadline: float, rng: random.Random, catalog) -> None:
+    rooms, patients, students, professors = catalog
+    if not (rooms and patients and students and professors):
+        print("Sem salas/pacientes/usuários suficientes: rajadas de agendamento desativadas", file=sys.stderr)
+        return
+    today = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+    def payload() -> dict:
+        start = today + timedelta(days=rng.randint(1, 28))
+        start = start.replace(hour=rng.randint(8, 17))
+        return {
+            "start_dt": start.isoformat(),
+            "end_dt": (start + timedelta(hours=1)).isoformat(),
+            "room_id": rng.choice(rooms),
+            "patient_id": rng.choice(patients),
+            "student_id": rng.choice(students),
+            "supervisor_id": rng.choice(professors),
+        }
+
+    async def burst():
+        await asyncio.gather(*(
+            recorder.request(client, "POST /api/appointments", "POST", "/api/appointments", json=payload())
+            for _ in range(args.booking_burst)
+        ))
+    await every(args.booking_every, deadline, args.booking_every / 2, burst)
+
+
+async def shift_changes(client, recorder: Recorder, args, deadline: float, rng: random.Random, emails) -> None:
+    if not emails:
+        print("Sem estagiários cadastrados: logins desativados", file=sys.stderr)
+        return
+
+    async def shift():
+        await asyncio.gather(*(
+            recorder.request(client, "POST /api/auth/login", "POST", "/api/auth/login",
+                             json={"email": rng.choice(emails), "password": args.password})
+            for _ in range(args.shift_logins)
+        ))
+    await every(args.shift_every, deadline, args.shift_every, shift)
+
+
+async def exports(client, recorder: Recorder, args, deadline: float) -> None:
+    now = datetime.now()
+    first = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    params = {"format": "csv", "start": first.isoformat(), "end": (first + timedelta(days=32)).replace(day=1).isoformat()}
+
+    async def export():
+        await asyncio.gather(*(
+            recorder.request(client, "GET /api/appointments/export", "GET", "/api/appointments/export", params=params)
+            for _ in range(args.exporters)
+        ))
+    await every(args.export_every, deadline, args.export_every / 3, export)
+
+
+async def load_catalog(client: httpx.AsyncClient):
+    """IDs usados nos agendamentos e emails usados nos logins."""
+    async def ids(path: str) -> list:
+        response = await client.get(path, params={"limit": 100})
+        response.raise_for_status()
+        return response.json()
+
+    rooms, patients, students, professors = await asyncio.gather(
+        ids("/api/rooms"), ids("/api/patients"), ids("/api/users/students"), ids("/api/users/professors"),
+    )
+    catalog = tuple([item["id"] for item in items] for items in (rooms, patients, students, professors))
+    return catalog, [student["email"] for student in students]
+
+
+async def run(args, base_url: str) -> dict:
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        catalog, emails = await load_catalog(client)
+        recorder = Recorder()
+        started = time.monotonic()
+        deadline = started + args.duration
+        tasks = [dashboard_tab(client, recorder, args, deadline, random.Random(rng.random())) for _ in range(args.tabs)]
+        if args.booking_burst:
+            tasks.append(booking_bursts(client, recorder, args, deadline, random.Random(rng.random()), catalog))
+        if args.shift_logins:
+            tasks.append(shift_changes(client, recorder, args, deadline, random.Random(rng.random()), emails))
+        if args.exporters:
+            tasks.append(exports(client, recorder, args, deadline))
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started
+    return recorder.report(elapsed)
+
+
+def print_table(report: dict, baseline: Optional[dict]) -> None:
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    previous = {}
+    if baseline:
+        previous = dict(baseline["endpoints"], TOTAL=baseline["total"])
+    print(f"{'rota':36s} {'req':>6s} {'rps':>7s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'erros':>6s}", file=sys.stderr)
+    for label, stats in rows:
+        line = (
+            f"{label:36s} {stats['requests']:6d} {stats['throughput_rps']:7.1f} {stats['p50_ms']:8.1f} "
+            f"{stats['p95_ms']:8.1f} {stats['p99_ms']:8.1f} {stats['error_rate']:6.1%}"
+        )
+        old = previous.get(label)
+        if old and old["p95_ms"]:
+            line += f"   p95 {(stats['p95_ms'] / old['p95_ms'] - 1):+.0%}"
+        print(line, file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Servidor já em execução (senão, sobe um uvicorn local)")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--server-workers", type=int, default=1, help="Workers do uvicorn local")
+    parser.add_argument("--db", help="Arquivo SQLite do servidor local (AGENDA_DB_FILE)")
+    parser.add_argument("--prepare", metavar="PRESET", help="Recria --db com backend.synthetic_data")
+    parser.add_argument("--rate-limit", action="store_true", help="Mantém a limitação de taxa no servidor local")
+    parser.add_argument("--duration", type=float, default=60.0)
+    parser.add_argument("--tabs", type=int, default=20, help="Abas do painel abertas")
+    parser.add_argument("--poll-interval", type=float, default=10.0)
+    parser.add_argument("--booking-burst", type=int, default=10, help="Agendamentos por rajada (0 desativa)")
+    parser.add_argument("--booking-every", type=float, default=15.0)
+    parser.add_argument("--shift-logins", type=int, default=20, help="Logins por troca de turno (0 desativa)")
+    parser.add_argument("--shift-every", type=float, default=30.0)
+    parser.add_argument("--password", default="senha123", help="Senha dos estagiários usados nos logins")
+    parser.add_argument("--exporters", type=int, default=1, help="Exportações simultâneas (0 desativa)")
+    parser.add_argument("--export-every", type=float, default=20.0)
+    parser.add_argument("--connections", type=int, default=100, help="Conexões HTTP simultâneas")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo do relatório JSON (padrão: stdout)")
+    parser.add_argument("--compare", help="Relatório anterior para comparação")
+    args = parser.parse_args()
+
+    if args.prepare:
+        if not args.db or args.url:
+            parser.error("--prepare exige --db e um servidor local")
+        prepare_database(args.db, args.prepare, args.seed)
+
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    proc = None
+    base_url = args.url
+    if not base_url:
+        proc = start_server(args.port, args.db, args.server_workers, args.rate_limit)
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        report = asyncio.run(run(args, base_url))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    report = {
+        "commit": git_commit(),
+        "started_at": started_at,
+        "config": config,
+        **report,
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_table(report, baseline)
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Executa os benchmarks dos caminhos críticos e compara com a linha de base.
+
+Linhas de base dependem da máquina e por isso não são versionadas: ficam em
+`backend/benchmarks/.data/baselines/<escala>.json` (ou em `--baseline`, ex.:
+um artefato baixado do CI) e são gravadas com `--save` no ambiente onde a
+comparação roda, a partir de uma árvore limpa.
+
+Sem `--save`, a execução falha se algum benchmark piorar além do ruído: a
+mediana subiu mais que `--threshold` por cento *e* as faixas interquartis das
+duas execuções não se sobrepõem (o primeiro quartil atual passou do terceiro
+quartil da linha de base). Variações dentro da dispersão normal da máquina
+são apenas relatadas.
+
+Uso:
+    python scripts/run_benchmarks.py [--scale 10k|100k|1m] [--threshold 30] [--baseline ARQ] [--save]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import List
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+BENCH_DIR = os.path.join(ROOT, "backend", "benchmarks")
+DATA_DIR = os.path.join(BENCH_DIR, ".data")
+BASELINE_DIR = os.path.join(DATA_DIR, "baselines")
+
+
+def _stats(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return {bench["name"]: bench["stats"] for bench in json.load(f)["benchmarks"]}
+
+
+def compare(baseline_path: str, current_path: str, threshold: float) -> List[str]:
+    """
+    Compara duas execuções e imprime a variação de cada benchmark.
+
+    Args:
+        baseline_path: JSON da linha de base (pytest-benchmark)
+        current_path: JSON da execução atual
+        threshold: Piora máxima da mediana (%)
+
+    Returns:
+        Benchmarks que pioraram além do limite e do ruído
+    """
+    baseline = _stats(baseline_path)
+    regressions = []
+    print(f"\n{'benchmark':<48} {'base (ms)':>10} {'atual (ms)':>11} {'var.':>8}")
+    for name, current in sorted(_stats(current_path).items()):
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<48} {'-':>10} {current['median'] * 1000:>11.3f} {'novo':>8}")
+            continue
+        change = (current["median"] / base["median"] - 1) * 100
+        status = ""
+        if change > threshold:
+            # Faixas interquartis sobrepostas: a diferença cabe no ruído
+            if current["q1"] > base["q3"]:
+                status = "  PIOROU"
+                regressions.append(name)
+            else:
+                status = "  (ruído)"
+        print(f"{name:<48} {base['median'] * 1000:>10.3f} {current['median'] * 1000:>11.3f} {change:>+7.1f}%{status}")
+    return regressions
+
+
+def _dirty_tree() -> bool:
+    try:
+        result = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return False
+    return bool(result.stdout.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", default="10k", choices=("10k", "100k", "1m"))
+    parser.add_argument("--threshold", type=float, default=30.0, help="Piora máxima da mediana (%%)")
+    parser.add_argument("--baseline", help="Arquivo da linha de base (padrão: .data/baselines/<escala>.json)")
+    parser.add_argument("--save", action="store_true", help="Regrava a linha de base da escala")
+    args, extra = parser.parse_known_args()
+
+    os.environ["BENCH_SCALE"] = args.scale
+    baseline = args.baseline or os.path.join(BASELINE_DIR, f"{args.scale}.json")
+    if args.save:
+        if _dirty_tree():
+            print("Aviso: árvore com alterações não commitadas; a linha de base não corresponde a um commit.")
+        output = baseline
+    else:
+        output = os.path.join(DATA_DIR, f"current-{args.scale}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    os.chdir(ROOT)
+    code = pytest.main([BENCH_DIR, "-q", "--benchmark-sort=name", f"--benchmark-json={output}", *extra])
+    if code != 0 or args.save:
+        sys.exit(code)
+    if not os.path.exists(baseline):
+        print(f"Sem linha de base em {baseline}; apenas medindo (use --save para gravar).")
+        sys.exit(0)
+
+    regressions = compare(baseline, output, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) pioraram mais que {args.threshold:g}% além do ruído: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -71,7 +71,7 @@ def recreate_and_seed():
         return False
 
 def start_services():
-    """Iniciar backend (uvicorn) e frontend (http.server) e retornar os processos."""
+    """Iniciar backend (uvicorn), que também serve o frontend, e retornar o processo."""
     # Executar uvicorn a partir da raiz do projeto e referenciar o módulo como
     # `backend.main:app` para evitar problemas com imports relativos.
     backend_cwd = Path(__file__).parent
@@ -85,21 +85,11 @@ def start_services():
     time.sleep(1)
     print(f"  ✓ Backend iniciado (PID: {backend_proc.pid})")
     print(f"    📍 http://localhost:8000")
-    print(f"    📚 Docs: http://localhost:8000/docs\n")
+    print(f"    📚 Docs: http://localhost:8000/docs")
+    # O frontend é servido pelo próprio backend (arquivos pré-comprimidos)
+    print(f"    🎨 Frontend: http://localhost:8000/app/\n")
 
-    # Iniciar Frontend
-    print("  ⏳ Iniciando frontend (http.server porta 3000)...")
-    frontend_cwd = Path(__file__).parent / "frontend"
-    frontend_proc = subprocess.Popen(
-        [sys.executable, "-m", "http.server", "3000", "--directory", str(frontend_cwd)],
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL,
-    )
-    time.sleep(1)
-    print(f"  ✓ Frontend iniciado (PID: {frontend_proc.pid})")
-    print(f"    📍 http://localhost:3000\n")
-
-    return backend_proc, frontend_proc
+    return backend_proc
 
 def main():
     """Função principal: recriar/semear DB e iniciar serviços."""
@@ -109,11 +99,11 @@ def main():
             print("\n  ❌ Falha ao inicializar banco de dados!")
             sys.exit(1)
 
-        backend_proc, frontend_proc = start_services()
+        backend_proc = start_services()
 
         print("\n  ✅ SISTEMA INICIADO COM SUCESSO!")
         print("  🌐 URLs:")
-        print("    • Frontend: http://localhost:3000")
+        print("    • Frontend: http://localhost:8000/app/")
         print("    • Backend:  http://localhost:8000")
         print("    • API Docs: http://localhost:8000/docs")
         print("\n  ℹ️  Pressione Ctrl+C para parar os serviços")
@@ -121,19 +111,16 @@ def main():
         try:
             while True:
                 time.sleep(1)
-                if backend_proc.poll() is not None or frontend_proc.poll() is not None:
+                if backend_proc.poll() is not None:
                     print("\n⚠️  Processo encerrado. Saindo...")
                     break
         except KeyboardInterrupt:
             print("\n  🛑 Parando serviços...")
             backend_proc.terminate()
-            frontend_proc.terminate()
             try:
                 backend_proc.wait(timeout=5)
-                frontend_proc.wait(timeout=5)
             except subprocess.TimeoutExpired:
                 backend_proc.kill()
-                frontend_proc.kill()
             print("  ✓ Serviços parados")
 
     except Exception as e: